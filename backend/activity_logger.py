@@ -1,4 +1,4 @@
-from flask import request
+from flask import request, has_request_context
 from models import db, ActivityLog, User
 
 
@@ -13,7 +13,7 @@ def log_activity(user_id, action, entity_type, entity_id=None, details=''):
         entity_type=entity_type,
         entity_id=entity_id,
         details=details,
-        ip_address=request.remote_addr or '',
+        ip_address=(request.remote_addr or '') if has_request_context() else '',
     )
     db.session.add(entry)
     db.session.commit()
@@ -2,6 +2,8 @@ import os
 import json
 import base64
 import io
+from instrumentation import timed_ai
+from meter_types import registry
 
 ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY', '')
 
@@ -51,10 +53,12 @@ def _parse_json_response(text):
     return json.loads(text[start:end])
 
 
+@timed_ai
 def scan_meter_photo(image_bytes):
     client = _get_client()
     b64 = base64.standard_b64encode(image_bytes).decode('utf-8')
     media_type = _detect_media_type(image_bytes)
+    meter_types = ', '.join(f'{key} ({m["label"]})' for key, m in registry().meter_types.items())
 
     response = client.messages.create(
         model='claude-sonnet-4-5-20250929',
@@ -75,7 +79,8 @@ def scan_meter_photo(image_bytes):
                     'text': (
                         'Lies den Zählerstand von diesem Zählerfoto ab. '
                         'Antworte ausschließlich mit einem JSON-Objekt im folgenden Format:\n'
-                        '{"reading_value": <Zahlenwert als Number>, "meter_type": "<water|electricity_day|electricity_night oder null>", "date": "<YYYY-MM-DD oder null>"}\n'
+                        '{"reading_value": <Zahlenwert als Number>, "meter_type": "<Zählertyp oder null>", "date": "<YYYY-MM-DD oder null>"}\n'
+                        f'Mögliche Zählertypen: {meter_types}. '
                         'Wenn du den Zählertyp nicht erkennen kannst, setze meter_type auf null. '
                         'Wenn du das Datum nicht erkennen kannst, setze date auf null. '
                         'Antworte NUR mit dem JSON, kein weiterer Text.'
@@ -96,6 +101,7 @@ def scan_meter_photo(image_bytes):
     return result
 
 
+@timed_ai
 def scan_invoice(image_bytes, file_type='image'):
     client = _get_client()
     b64 = base64.standard_b64encode(image_bytes).decode('utf-8')
@@ -149,6 +155,7 @@ def scan_invoice(image_bytes, file_type='image'):
     return _parse_json_response(response.content[0].text)
 
 
+@timed_ai
 def scan_contract(image_bytes, file_type='image'):
     client = _get_client()
     b64 = base64.standard_b64encode(image_bytes).decode('utf-8')
@@ -198,6 +205,7 @@ def scan_contract(image_bytes, file_type='image'):
     return _parse_json_response(response.content[0].text)
 
 
+@timed_ai
 def scan_business_card(image_bytes):
     client = _get_client()
     b64 = base64.standard_b64encode(image_bytes).decode('utf-8')
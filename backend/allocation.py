@@ -0,0 +1,172 @@
+import math
+from array import array
+from models import db, Unit, UnitConsumption, AllocationRule
+
+# Splits the costs of an annual statement across the units of a property. Costs are
+# grouped into pools (one per tariff type and one per cost category of recurring
+# costs and expenses); an AllocationRule per pool names the key: area, equal per unit,
+# fixed shares, or sub-meter consumption. For heating and hot water the HeizkostenV
+# bills 50-70 % by consumption and the rest by area, so a consumption rule carries
+# consumption_percent. Each distinct key is normalised once into a weight vector over
+# all units; every pool is then one scalar times a vector, rounded to cents with the
+# largest remainder so the unit shares add up to the pool exactly.
+
+METHODS = ('area', 'units', 'fixed', 'consumption')
+DEFAULT_POOL = '*'  # rule for pools without an own rule
+OTHER = 'Sonstiges'  # pool of costs without a category
+METHOD_LABELS = {'area': 'Fläche', 'units': 'Einheiten', 'fixed': 'Festanteile', 'consumption': 'Verbrauch'}
+
+
+def cost_pools(statement, labels):
+    """[(pool, label, amount)] of an annual statement (see statements.build_statement)."""
+    amounts = {}
+    names = {}
+
+    def add(pool, label, amount):
+        amounts[pool] = amounts.get(pool, 0.0) + (amount or 0.0)
+        names.setdefault(pool, label)
+
+    for key, cost in statement['costs'].items():
+        add(key, labels.get(key, key), cost['total_cost'])
+    for d in statement['recurring_costs']['details']:
+        category = d.get('category') or OTHER  # snapshots before categories were recorded
+        add(category, category, d['total'])
+    for e in statement['expenses']['details']:
+        category = e['category'] or OTHER
+        add(category, category, e['gross_amount'])
+    return [(pool, names[pool], round(amount, 2)) for pool, amount in amounts.items()]
+
+
+def split_cents(amount, weights):
+    """amount split by weights (summing to 1) in whole cents that add up to amount."""
+    cents = round(amount * 100)
+    raw = [cents * w for w in weights]
+    shares = array('q', (math.floor(x) for x in raw))
+    rest = cents - sum(shares)
+    if rest:
+        for i in sorted(range(len(raw)), key=lambda i: shares[i] - raw[i])[:rest]:
+            shares[i] += 1
+    return shares
+
+
+class Allocator:
+    """Weight vectors over the units of one property, built once per key and shared by all pools."""
+
+    def __init__(self, units, consumption):
+        self.units = units
+        self.consumption = consumption  # {meter_type: {unit_id: value}}
+        self._weights = {}
+        self._mixes = {}
+
+    def weights(self, basis):
+        """Normalised weights for 'area', 'units', 'fixed' or ('consumption', meter_type); None if not defined."""
+        if basis not in self._weights:
+            if basis == 'units':
+                raw = [1.0] * len(self.units)
+            elif basis == 'area':
+                raw = [u['area'] or 0.0 for u in self.units]
+            elif basis == 'fixed':
+                raw = [u['fixed_share'] for u in self.units]
+            else:
+                values = self.consumption.get(basis[1], {})
+                raw = [values.get(u['id']) for u in self.units]
+            total = 0.0 if None in raw else sum(raw)
+            self._weights[basis] = array('d', (x / total for x in raw)) if total > 0 else None
+        return self._weights[basis]
+
+    def mix(self, rule):
+        """(weights, method applied, warning or None) for a rule; falls back to area, then units."""
+        key = (rule['method'], rule.get('meter_type'), rule.get('consumption_percent'))
+        if key not in self._mixes:
+            self._mixes[key] = self._mix(*key)
+        return self._mixes[key]
+
+    def _mix(self, method, meter_type, percent):
+        warning = None
+        if method == 'consumption':
+            used = self.weights(('consumption', meter_type))
+            fraction = 1.0 if percent is None else percent / 100
+            area = self.weights('area')
+            if used is None:
+                warning = f'Verbrauchswerte {meter_type} fehlen oder sind leer'
+            elif fraction < 1 and area is None:
+                warning = 'Flächen fehlen für den Grundkostenanteil'
+            else:
+                if fraction < 1:
+                    used = array('d', (fraction * c + (1 - fraction) * a for c, a in zip(used, area)))
+                return used, method, None
+        elif method in METHODS:
+            weights = self.weights(method)
+            if weights is not None:
+                return weights, method, None
+            warning = f'{METHOD_LABELS[method]} fehlen'
+        for fallback in ('area', 'units'):
+            weights = self.weights(fallback)
+            if weights is not None:
+                return weights, fallback, warning and f'{warning}, verteilt nach {METHOD_LABELS[fallback]}'
+
+
+def allocate(statement, inputs, labels):
+    """Per-unit shares of all cost pools of a statement; None without units.
+
+    inputs is one property's entry of load_allocation_inputs(), labels maps tariff types
+    to display names (meter_types.registry().labels()).
+    """
+    units = inputs['units']
+    if not units:
+        return None
+    rules = inputs['rules']
+    default = rules.get(DEFAULT_POOL) or {'method': 'area'}
+    allocator = Allocator(units, inputs['consumption'])
+    totals = array('q', bytes(8 * len(units)))
+    pools, columns, warnings = [], [], []
+    for pool, label, amount in cost_pools(statement, labels):
+        rule = rules.get(pool) or default
+        weights, method, warning = allocator.mix(rule)
+        shares = split_cents(amount, weights)
+        for i, cents in enumerate(shares):
+            totals[i] += cents
+        columns.append((pool, shares))
+        pools.append({
+            'pool': pool,
+            'label': label,
+            'amount': amount,
+            'method': method,
+            'meter_type': rule.get('meter_type') if method == 'consumption' else None,
+            'consumption_percent': rule.get('consumption_percent') if method == 'consumption' else None,
+        })
+        if warning:
+            warnings.append(f'{label}: {warning}')
+    return {
+        'year': statement['year'],
+        'property_id': statement['property_id'],
+        'total': round(sum(totals) / 100, 2),
+        'pools': pools,
+        'units': [{
+            'id': u['id'],
+            'name': u['name'],
+            'area': u['area'],
+            'fixed_share': u['fixed_share'],
+            'costs': {pool: shares[i] / 100 for pool, shares in columns},
+            'total': totals[i] / 100,
+        } for i, u in enumerate(units)],
+        'warnings': warnings,
+    }
+
+
+def load_allocation_inputs(property_ids, year):
+    """Units, rules and sub-meter consumption of the year per property, in three queries."""
+    result = {pid: {'units': [], 'rules': {}, 'consumption': {}} for pid in property_ids}
+    unit_property = {}
+    for uid, pid, name, area, fixed_share in db.session.query(
+        Unit.id, Unit.property_id, Unit.name, Unit.area, Unit.fixed_share,
+    ).filter(Unit.property_id.in_(property_ids)).order_by(Unit.property_id, Unit.name, Unit.id):
+        result[pid]['units'].append({'id': uid, 'name': name, 'area': area, 'fixed_share': fixed_share})
+        unit_property[uid] = pid
+    for rule in AllocationRule.query.filter(AllocationRule.property_id.in_(property_ids)):
+        result[rule.property_id]['rules'][rule.pool] = rule.to_dict()
+    for uid, meter_type, value in db.session.query(
+        UnitConsumption.unit_id, UnitConsumption.meter_type, UnitConsumption.value,
+    ).join(Unit).filter(Unit.property_id.in_(property_ids), UnitConsumption.year == year):
+        result[unit_property[uid]]['consumption'].setdefault(meter_type, {})[uid] = value
+    return result
@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import OrderedDict
+from models import db, Expense, Property, Contact
+from write_hooks import on_commit
+from live_updates import on_change
+
+# Expense cube: SUM/COUNT grouped by any combination of dimensions, computed in SQL
+# and returned column-wise. Results are cached per process; writes to expenses in
+# this process clear the cache on commit, writes from other workers through the
+# change feed (live_updates.on_change) within a second.
+
+CACHE_TTL = 60
+CACHE_SIZE = 128
+
+_year = db.extract('year', Expense.invoice_date)
+_month = db.extract('month', Expense.invoice_date)
+_quarter = db.case((_month <= 3, 1), (_month <= 6, 2), (_month <= 9, 3), else_=4)
+
+# dimension -> (output column, group-by expressions, formatter)
+DIMENSIONS = {
+    'property': ('property_id', [Expense.property_id], lambda v: v[0]),
+    'category': ('category', [Expense.category], lambda v: v[0] or ''),
+    'vendor': ('vendor', [Expense.vendor], lambda v: v[0]),
+    'contact': ('contact_id', [Expense.contact_id], lambda v: v[0]),
+    'year': ('year', [_year], lambda v: int(v[0])),
+    'quarter': ('quarter', [_year, _quarter], lambda v: f'{int(v[0])}-Q{int(v[1])}'),
+    'month': ('month', [_year, _month], lambda v: f'{int(v[0])}-{int(v[1]):02d}'),
+}
+MEASURES = [
+    ('count', db.func.count(Expense.id)),
+    ('net', db.func.sum(Expense.net_amount)),
+    ('vat', db.func.sum(Expense.vat_amount)),
+    ('gross', db.func.sum(Expense.gross_amount)),
+]
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_generation = 0
+
+
+def expense_cube(dimensions, property_ids=None, start=None, end=None, category=None, contact_id=None):
+    """Columnar aggregation of expenses; property_ids=None means all properties."""
+    unknown = [d for d in dimensions if d not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f'Unbekannte Dimension: {", ".join(unknown)}')
+    dimensions = list(dict.fromkeys(dimensions))
+    key = (
+        tuple(dimensions), tuple(sorted(property_ids)) if property_ids is not None else None,
+        start, end, category, contact_id,
+    )
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit and now - hit[0] < CACHE_TTL:
+            _cache.move_to_end(key)
+            return hit[1]
+        generation = _generation
+
+    result = _compute(dimensions, property_ids, start, end, category, contact_id)
+    with _cache_lock:
+        if generation != _generation:
+            return result  # expenses changed while computing
+        _cache[key] = (now, result)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def _compute(dimensions, property_ids, start, end, category, contact_id):
+    group_by, spans = [], []
+    for d in dimensions:
+        exprs = DIMENSIONS[d][1]
+        spans.append((len(group_by), len(group_by) + len(exprs)))
+        group_by.extend(exprs)
+
+    query = db.session.query(*group_by, *[m for _, m in MEASURES])
+    if property_ids is not None:
+        query = query.filter(Expense.property_id.in_(property_ids))
+    if start:
+        query = query.filter(Expense.invoice_date >= start)
+    if end:
+        query = query.filter(Expense.invoice_date <= end)
+    if category is not None:
+        query = query.filter(Expense.category == category)
+    if contact_id:
+        query = query.filter(Expense.contact_id == contact_id)
+    if group_by:
+        query = query.group_by(*group_by).order_by(*group_by)
+    rows = query.all()
+
+    columns = {DIMENSIONS[d][0]: [] for d in dimensions}
+    columns.update({name: [] for name, _ in MEASURES})
+    for row in rows:
+        if not row[len(group_by)]:
+            continue  # no expenses at all (ungrouped query)
+        for d, (a, b) in zip(dimensions, spans):
+            name, _, fmt = DIMENSIONS[d]
+            columns[name].append(fmt(row[a:b]))
+        for i, (name, _) in enumerate(MEASURES):
+            value = row[len(group_by) + i] or 0
+            columns[name].append(value if name == 'count' else round(value, 2))
+
+    result = {
+        'dimensions': [DIMENSIONS[d][0] for d in dimensions],
+        'measures': [name for name, _ in MEASURES],
+        'rows': len(columns['count']),
+        'columns': columns,
+        'totals': {name: (sum(columns[name]) if name == 'count' else round(sum(columns[name]), 2))
+                   for name, _ in MEASURES},
+    }
+    labels = {}
+    if 'property' in dimensions:
+        ids = set(columns['property_id'])
+        labels['property_id'] = {str(pid): name for pid, name in
+                                 db.session.query(Property.id, Property.name).filter(Property.id.in_(ids))}
+    if 'contact' in dimensions:
+        ids = {cid for cid in columns['contact_id'] if cid}
+        labels['contact_id'] = {str(cid): name for cid, name in
+                                db.session.query(Contact.id, Contact.name).filter(Contact.id.in_(ids))}
+    if labels:
+        result['labels'] = labels
+    return result
+
+
+def clear_cache():
+    global _generation
+    with _cache_lock:
+        _generation += 1
+        _cache.clear()
+
+
+on_commit(Expense, clear_cache)
+on_change(Expense, clear_cache)
@@ -0,0 +1,155 @@
+from datetime import date
+from statistics import median
+from models import db, Property, Meter, MeterReading
+from consumption import load_series
+
+# Plausibility checks for meter readings. check_reading() looks at a few neighbours
+# of a new or changed reading through ix_meter_reading_property_type_date (two
+# LIMIT queries, O(log n)) and flags counters running backwards and daily rates far
+# above the usual rate of the series, e.g. a missing decimal point. Only readings of
+# the same physical meter are compared; a counter with a rollover_limit may wrap.
+# scan_readings() runs the same rules over the consumption series of all properties.
+
+RATE_FACTOR = 5      # daily rate above RATE_FACTOR x median rate is an outlier
+WINDOW = 6           # neighbours on each side for the median rate of check_reading()
+MIN_INTERVALS = 2    # fewer intervals with a known rate: no rate check
+SCAN_CHUNK = 200     # properties per load_series() call in scan_readings()
+
+
+def _reading(rid, reading_date, value):
+    return {'id': rid, 'reading_date': reading_date.isoformat(), 'reading_value': value}
+
+
+def _segment(property_id, meter_type, reading_date):
+    """(from, until, rollover limit) of the counter running at reading_date; None means open."""
+    lo = hi = None
+    meters = db.session.query(Meter.installed_on, Meter.removed_on, Meter.rollover_limit).filter(
+        Meter.property_id == property_id, Meter.meter_type == meter_type,
+    )
+    for installed, removed, limit in meters:
+        if installed <= reading_date and (removed is None or reading_date < removed):
+            return installed, removed, limit
+        if removed is not None and removed <= reading_date:
+            lo = max(lo or removed, removed)
+        if installed > reading_date:
+            hi = min(hi or installed, installed)
+    return lo, hi, None
+
+
+def _neighbors(property_id, meter_type, reading_date, exclude_id, segment, before):
+    lo, hi, _ = segment
+    q = db.session.query(MeterReading.id, MeterReading.reading_date, MeterReading.reading_value).filter(
+        MeterReading.property_id == property_id, MeterReading.meter_type == meter_type,
+    )
+    if exclude_id is not None:
+        q = q.filter(MeterReading.id != exclude_id)
+    if lo is not None:
+        q = q.filter(MeterReading.reading_date >= lo)
+    if hi is not None:
+        q = q.filter(MeterReading.reading_date < hi)
+    if before:
+        q = q.filter(MeterReading.reading_date <= reading_date).order_by(
+            MeterReading.reading_date.desc(), MeterReading.id.desc())
+    else:
+        q = q.filter(MeterReading.reading_date > reading_date).order_by(MeterReading.reading_date, MeterReading.id)
+    return q.limit(WINDOW).all()
+
+
+def _delta(a, b, limit):
+    delta = b - a
+    return delta + limit if delta < 0 and limit else delta
+
+
+def _rates(series, limit=None):
+    """Daily rates between consecutive (id, date, value) rows in date order."""
+    return [_delta(a[2], b[2], limit) / (b[1] - a[1]).days for a, b in zip(series, series[1:]) if b[1] > a[1]]
+
+
+def _baseline(rates):
+    rates = [r for r in rates if r >= 0]
+    return median(rates) if len(rates) >= MIN_INTERVALS else None
+
+
+def _rate_outlier(rate, baseline):
+    return baseline is not None and baseline > 0 and rate > RATE_FACTOR * baseline
+
+
+def check_reading(property_id, meter_type, reading_date, value, exclude_id=None):
+    """Anomalies of a reading against its series; exclude_id is the reading being updated."""
+    if isinstance(reading_date, str):
+        reading_date = date.fromisoformat(reading_date)
+    value = float(value)
+    segment = _segment(property_id, meter_type, reading_date)
+    limit = segment[2]
+    before = _neighbors(property_id, meter_type, reading_date, exclude_id, segment, before=True)
+    after = _neighbors(property_id, meter_type, reading_date, exclude_id, segment, before=False)
+    series = before[::-1] + after
+    anomalies = []
+    if before:
+        prev = before[0]
+        if value < prev[2] and not limit:
+            anomalies.append({
+                'kind': 'decrease',
+                'message': f'Zählerstand ist kleiner als am {prev[1].isoformat()} ({prev[2]})',
+                'reading': _reading(*prev),
+            })
+        elif reading_date > prev[1]:
+            rate = _delta(prev[2], value, limit) / (reading_date - prev[1]).days
+            baseline = _baseline(_rates(series, limit))
+            if _rate_outlier(rate, baseline):
+                anomalies.append({
+                    'kind': 'rate',
+                    'message': f'Verbrauch von {rate:.2f} pro Tag seit {prev[1].isoformat()}, '
+                               f'üblich sind {baseline:.2f}',
+                    'reading': _reading(*prev),
+                    'daily_rate': round(rate, 4),
+                    'baseline_rate': round(baseline, 4),
+                })
+    if after and value > after[0][2] and not limit:
+        nxt = after[0]
+        anomalies.append({
+            'kind': 'exceeds_next',
+            'message': f'Zählerstand ist größer als am {nxt[1].isoformat()} ({nxt[2]})',
+            'reading': _reading(*nxt),
+        })
+    return anomalies
+
+
+def _point(reading):
+    return {'id': reading['id'], 'reading_date': reading['reading_date'], 'reading_value': reading['reading_value']}
+
+
+def scan_readings(property_ids=None):
+    """All anomalies in the reading history; property_ids=None means all properties."""
+    if property_ids is None:
+        property_ids = [pid for (pid,) in db.session.query(Property.id).order_by(Property.id)]
+    result = []
+    for i in range(0, len(property_ids), SCAN_CHUNK):
+        for pid, by_type in load_series(property_ids[i:i + SCAN_CHUNK]).items():
+            for meter_type, series in sorted(by_type.items()):
+                # (index, delta, daily rate) of consecutive points of the same meter; rollovers are already added
+                pairs = []
+                for k in range(1, len(series.days)):
+                    days = series.days[k] - series.days[k - 1]
+                    if series.segments[k] != series.segments[k - 1]:
+                        continue
+                    delta = series.cumulative[k] - series.cumulative[k - 1]
+                    pairs.append((k, delta, delta / days if days > 0 else None))
+                baseline = _baseline([rate for _, _, rate in pairs if rate is not None])
+                for k, delta, rate in pairs:
+                    if delta < 0:
+                        kind = 'decrease'
+                    elif rate is not None and _rate_outlier(rate, baseline):
+                        kind = 'rate'
+                    else:
+                        continue
+                    result.append({
+                        'property_id': pid,
+                        'meter_type': meter_type,
+                        'kind': kind,
+                        'reading': _point(series.readings[k]),
+                        'previous': _point(series.readings[k - 1]),
+                        'daily_rate': round(rate, 4) if rate is not None else None,
+                        'baseline_rate': round(baseline, 4) if baseline is not None else None,
+                    })
+    return result
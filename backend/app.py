@@ -1,10 +1,11 @@
 import os
 from datetime import timedelta
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from werkzeug.security import generate_password_hash
 from models import db, User
+from static_files import StaticFiles
 
 def create_app():
     app = Flask(__name__, static_folder='../frontend/build', static_url_path='/')
@@ -13,6 +14,9 @@ def create_app():
     app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET', 'dev-secret-change-in-production')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
     app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max upload
+    # Optional file handoff to a front proxy
+    app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true')
+    app.config['UPLOADS_ACCEL_REDIRECT'] = os.environ.get('UPLOADS_ACCEL_REDIRECT', '')
 
     CORS(app, resources={r"/api/*": {"origins": "*"}})
     JWTManager(app)
@@ -30,6 +34,14 @@ def create_app():
     from routes.uploads import uploads_bp
     from routes.backup import backup_bp
     from routes.contacts import contacts_bp
+    from routes.upload_sessions import upload_sessions_bp
+    from routes.search import search_bp
+    from routes.events import events_bp
+    from routes.sync import sync_bp
+    from routes.metrics import metrics_bp
+    from routes.statements import statements_bp
+    from routes.meter_types import meter_types_bp
+    from routes.units import units_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(properties_bp)
@@ -43,9 +55,58 @@ def create_app():
     app.register_blueprint(uploads_bp)
     app.register_blueprint(backup_bp)
     app.register_blueprint(contacts_bp)
+    app.register_blueprint(upload_sessions_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(events_bp)
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(statements_bp)
+    app.register_blueprint(meter_types_bp)
+    app.register_blueprint(units_bp)
+
+    from live_updates import feed
+    from instrumentation import instrumentation
+    from compression import compression
+    feed.init_app(app)
+    instrumentation.init_app(app)
+    compression.init_app(app)  # runs before instrumentation's after_request, so its time is included
+
+    from cli import register_cli
+    register_cli(app)
 
     with app.app_context():
         db.create_all()
+        # create_all() skips existing tables, so add indexes declared later explicitly
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+        # ... and columns added to existing models (must be nullable or have a server default)
+        inspector = db.inspect(db.engine)
+        quote = db.engine.dialect.identifier_preparer.quote
+        with db.engine.begin() as conn:
+            for table in db.metadata.sorted_tables:
+                existing = {c['name'] for c in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+                    ddl = (f'ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} '
+                           f'{column.type.compile(db.engine.dialect)}')
+                    if column.server_default is not None:
+                        ddl += f" DEFAULT '{column.server_default.arg}'"
+                    if not column.nullable:
+                        ddl += ' NOT NULL'
+                    conn.exec_driver_sql(ddl)
+
+        from contact_search import init_contact_search
+        from contact_matching import init_contact_keys
+        from search_index import init_search_index
+        from meter_types import init_meter_types
+        from statements import purge_orphans
+        init_contact_search()
+        init_contact_keys()
+        init_search_index()
+        init_meter_types()
+        purge_orphans()
         if not User.query.filter_by(username='admin').first():
             admin = User(
                 username='admin',
@@ -59,13 +120,15 @@ def create_app():
         from routes.uploads import init_upload_dirs
         init_upload_dirs()
 
+    frontend = StaticFiles(app.static_folder, reload=app.debug)
+
     @app.route('/')
     @app.route('/<path:path>')
     def serve_frontend(path=''):
-        static = app.static_folder
-        if path and os.path.exists(os.path.join(static, path)):
-            return send_from_directory(static, path)
-        return send_from_directory(static, 'index.html')
+        return frontend.serve(path)
+
+    # Flask's own static route shares the '/<path>' rule and would shadow the SPA fallback
+    app.view_functions['static'] = lambda filename: serve_frontend(filename)
 
     return app
 
@@ -0,0 +1,100 @@
+"""Cost allocation across units: allocation.allocate() and GET /api/reports/annual/<pid>/allocation.
+
+Generates one property per --units value (see datagen.py for its meters, tariffs and
+costs), gives it that many units with random areas, fixed shares and sub-meter
+consumption for heat cost allocators and water, and a HeizkostenV rule (70 %
+consumption, 30 % area) for the energy costs. Times the engine alone on the loaded
+statement and the endpoint through the Flask test client.
+
+Usage:
+    python benchmarks/bench_allocation.py --units 50,200,1000 --repeat 20
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--units', default='50,200,1000', help='comma-separated units per property')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    sizes = sorted({int(n) for n in args.units.split(',') if n.strip()})
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    os.environ['UPLOAD_DIR'] = os.path.join(tmp, 'uploads')
+    from app import create_app
+    from models import db, Property, MeterType, Unit, UnitConsumption, AllocationRule
+    from datagen import generate, LAST_YEAR
+    from allocation import allocate, load_allocation_inputs
+    from statements import build_statement, load_inputs
+    from meter_types import registry
+
+    rnd = random.Random(args.seed)
+    app = create_app()
+    with app.app_context():
+        generate(len(sizes), 1)
+        db.session.add(MeterType(key='heat', label='Heizkostenverteiler', unit='Einheiten', category='Heizung'))
+        property_ids = [pid for (pid,) in db.session.query(Property.id).order_by(Property.id)]
+        for pid, size in zip(property_ids, sizes):
+            units = [Unit(property_id=pid, name=f'WE {i + 1:04d}', area=round(rnd.uniform(25, 140), 1),
+                          fixed_share=rnd.randint(5, 40)) for i in range(size)]
+            db.session.add_all(units)
+            db.session.flush()
+            for u in units:
+                db.session.add(UnitConsumption(unit_id=u.id, year=LAST_YEAR, meter_type='water',
+                                               value=round(rnd.uniform(10, 120), 1)))
+                db.session.add(UnitConsumption(unit_id=u.id, year=LAST_YEAR, meter_type='heat',
+                                               value=round(rnd.uniform(0, 900), 1)))
+            db.session.add_all([
+                AllocationRule(property_id=pid, pool='Energie', method='consumption', meter_type='heat',
+                               consumption_percent=70),
+                AllocationRule(property_id=pid, pool='water', method='consumption', meter_type='water',
+                               consumption_percent=100),
+                AllocationRule(property_id=pid, pool='Versicherung', method='fixed'),
+                AllocationRule(property_id=pid, pool='*', method='area'),
+            ])
+        db.session.commit()
+
+    client = app.test_client()
+    token = client.post('/api/login', json={'username': 'admin', 'password': 'admin'}).json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    results = {}
+    with app.app_context():
+        labels = registry().labels()
+        for pid, size in zip(property_ids, sizes):
+            statement = build_statement(pid, LAST_YEAR, load_inputs([pid], LAST_YEAR)[pid])
+            inputs = load_allocation_inputs([pid], LAST_YEAR)[pid]
+            result = allocate(statement, inputs, labels)
+            url = f'/api/reports/annual/{pid}/allocation?year={LAST_YEAR}'
+            results[size] = {
+                'pools': len(result['pools']),
+                'engine_ms': _ms(lambda: allocate(statement, inputs, labels), args.repeat),
+                'load_inputs_ms': _ms(lambda: load_allocation_inputs([pid], LAST_YEAR), args.repeat),
+                'endpoint_ms': _ms(lambda: client.get(url, headers=headers), args.repeat),
+                'balanced': round(result['total'] - sum(p['amount'] for p in result['pools']), 2) == 0,
+            }
+
+    print(json.dumps({'cpus': os.cpu_count(), 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
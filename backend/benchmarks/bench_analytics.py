@@ -0,0 +1,98 @@
+"""Expense cube (grouped SQL) vs. loading Expense objects and summing in Python.
+
+Usage:
+    python benchmarks/bench_analytics.py --expenses 1000000 --properties 50
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ['Wartung', 'Reparatur', 'Versicherung', 'Energie', 'Reinigung', 'Verwaltung', None]
+
+
+def timed(func):
+    t0 = time.perf_counter()
+    result = func()
+    return result, round((time.perf_counter() - t0) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--expenses', type=int, default=1000000)
+    parser.add_argument('--properties', type=int, default=50)
+    parser.add_argument('--vendors', type=int, default=2000)
+    args = parser.parse_args()
+    rnd = random.Random(11)
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    from app import create_app
+    from models import db, Property, Expense
+    from analytics import expense_cube, clear_cache
+
+    app = create_app()
+    with app.app_context():
+        db.session.execute(db.insert(Property), [{'name': f'Objekt {i}'} for i in range(args.properties)])
+        start = date(2015, 1, 1)
+        for offset in range(0, args.expenses, 50000):
+            rows = []
+            for _ in range(min(50000, args.expenses - offset)):
+                net = round(rnd.uniform(5, 5000), 2)
+                vat = round(net * 0.19, 2)
+                rows.append({
+                    'property_id': rnd.randrange(1, args.properties + 1),
+                    'vendor': f'Lieferant {rnd.randrange(args.vendors)}',
+                    'invoice_date': start + timedelta(days=rnd.randrange(3650)),
+                    'net_amount': net, 'vat_rate': 19.0, 'vat_amount': vat, 'gross_amount': round(net + vat, 2),
+                    'category': rnd.choice(CATEGORIES),
+                })
+            db.session.execute(db.insert(Expense), rows)
+        db.session.commit()
+
+        def python_side(dims, year=None):
+            # What the reports do today: load ORM objects, aggregate in Python
+            query = Expense.query
+            if year:
+                query = query.filter(Expense.invoice_date >= date(year, 1, 1), Expense.invoice_date <= date(year, 12, 31))
+            sums = defaultdict(float)
+            for e in query.all():
+                key = tuple(e.category if d == 'category' else e.property_id if d == 'property'
+                            else e.vendor if d == 'vendor' else e.invoice_date.strftime('%Y-%m') for d in dims)
+                sums[key] += e.gross_amount or 0
+            db.session.expunge_all()
+            return sums
+
+        results = {}
+        for label, dims, year in [
+            ('category_by_month', ['category', 'month'], None),
+            ('property_by_year', ['property', 'year'], None),
+            ('vendor_in_2020', ['vendor'], 2020),
+        ]:
+            kwargs = {'start': date(year, 1, 1), 'end': date(year, 12, 31)} if year else {}
+            clear_cache()
+            cube, cold_ms = timed(lambda: expense_cube(dims, **kwargs))
+            _, cached_ms = timed(lambda: expense_cube(dims, **kwargs))
+            py_dims = ['property' if d == 'property' else 'month' if d in ('month', 'year') else d for d in dims]
+            sums, python_ms = timed(lambda: python_side(py_dims, year))
+            assert abs(sum(sums.values()) - cube['totals']['gross']) < 1, 'totals differ'
+            results[label] = {
+                'groups': cube['rows'],
+                'python_ms': python_ms,
+                'cube_sql_ms': cold_ms,
+                'cube_cached_ms': cached_ms,
+                'speedup_sql': round(python_ms / cold_ms, 1),
+            }
+
+    print(json.dumps({'expenses': args.expenses, **results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Response compression: bytes on the wire and CPU time per encoding and level.
+
+Fetches typical API responses from a generated data set (see datagen.py), then
+compresses each body with gzip and brotli at several levels. Also times the full
+request with and without Accept-Encoding, i.e. what the compression middleware
+adds per request.
+
+Usage:
+    python benchmarks/bench_compression.py --properties 20 --years 3
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SETTINGS = [('gzip', 1), ('gzip', 6), ('gzip', 9), ('br', 1), ('br', 4), ('br', 5), ('br', 9), ('br', 11)]
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - t0)
+    return result, min(times)
+
+
+def encode(data, encoding, level):
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(data, quality=level)
+    c = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return c.compress(data) + c.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--properties', type=int, default=20)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    os.environ['UPLOAD_DIR'] = os.path.join(tmp, 'uploads')
+    from app import create_app
+    from datagen import generate, LAST_YEAR
+
+    app = create_app()
+    with app.app_context():
+        generate(args.properties, args.years)
+    client = app.test_client()
+    token = client.post('/api/login', json={'username': 'admin', 'password': 'admin'}).json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    paths = {
+        'expense_list': '/api/properties/1/expenses',
+        'meter_list': '/api/properties/1/meters',
+        'annual_report': f'/api/reports/annual/1?year={LAST_YEAR}',
+        'csv_export': f'/api/reports/export/1?type=expenses&start={LAST_YEAR - args.years + 1}-01-01&end={LAST_YEAR}-12-31',
+        'activity_log': '/api/activity-log?limit=1000',
+        'backup': '/api/backup',
+    }
+
+    results = {}
+    for name, path in paths.items():
+        body = client.get(path, headers={**headers, 'Accept-Encoding': 'identity'}).get_data()
+        row = {'bytes': len(body), 'encodings': {}}
+        for encoding, level in SETTINGS:
+            compressed, seconds = best_of(lambda: encode(body, encoding, level), args.repeat)
+            row['encodings'][f'{encoding}-{level}'] = {
+                'bytes': len(compressed),
+                'ratio': round(len(body) / len(compressed), 1),
+                'cpu_ms': round(seconds * 1000, 2),
+                'mb_per_sec': round(len(body) / seconds / 1e6, 1),
+            }
+        # End to end through the middleware with its configured levels
+        for label, accept in (('identity', 'identity'), ('gzip', 'gzip'), ('br', 'br, gzip')):
+            response, seconds = best_of(lambda: client.get(path, headers={**headers, 'Accept-Encoding': accept}),
+                                        args.repeat)
+            row[f'request_ms_{label}'] = round(seconds * 1000, 2)
+            row[f'wire_bytes_{label}'] = len(response.get_data())
+        results[name] = row
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Latency of the contact typeahead endpoint (FTS5) vs. the old ILIKE scan.
+
+Usage:
+    python benchmarks/bench_contact_search.py --contacts 100000 --queries 1000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIRST = ['Anna', 'Bernd', 'Claudia', 'Dieter', 'Eva', 'Frank', 'Gisela', 'Hans', 'Ingrid', 'Jürgen',
+         'Karin', 'Lukas', 'Monika', 'Norbert', 'Olga', 'Peter', 'Renate', 'Stefan', 'Tanja', 'Uwe']
+LAST = ['Müller', 'Schmidt', 'Schneider', 'Fischer', 'Weber', 'Meyer', 'Wagner', 'Becker', 'Schulz',
+        'Hoffmann', 'Schäfer', 'Koch', 'Bauer', 'Richter', 'Klein', 'Wolf', 'Schröder', 'Neumann']
+TRADES = ['Sanitär', 'Elektro', 'Dachdecker', 'Heizungsbau', 'Gartenpflege', 'Hausmeisterservice',
+          'Schornsteinfeger', 'Malerbetrieb', 'Stadtwerke', 'Versicherung']
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--contacts', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+    rnd = random.Random(7)
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    from app import create_app
+    from models import db, Contact
+    from contact_search import search_contacts
+
+    app = create_app()
+    with app.app_context():
+        rows = []
+        for i in range(args.contacts):
+            first, last = rnd.choice(FIRST), rnd.choice(LAST)
+            rows.append({
+                'name': f'{first} {last}',
+                'company': f'{last} {rnd.choice(TRADES)} GmbH {i}',
+                'email': f'{first.lower()}.{i}@example.de',
+                'phone': f'0{rnd.randrange(100, 999)} {rnd.randrange(100000, 9999999)}',
+            })
+        db.session.execute(db.insert(Contact), rows)
+        db.session.commit()
+
+        queries = []
+        for _ in range(args.queries):
+            word = rnd.choice(LAST + TRADES + FIRST)
+            queries.append(word[:rnd.randrange(2, len(word) + 1)])
+        queries += ['Muller', 'Schmitd', 'Hofmann', 'Stadtwerke Sanitär']
+
+        client = app.test_client()
+        token = client.post('/api/login', json={'username': 'admin', 'password': 'admin'}).json['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        results = {}
+        for name, run in [
+            ('search_contacts', lambda q: search_contacts(q, limit=10)),
+            ('typeahead_endpoint', lambda q: client.get('/api/contacts/typeahead', query_string={'q': q}, headers=headers)),
+        ]:
+            latencies = []
+            for q in queries:
+                t0 = time.perf_counter()
+                run(q)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            results[name] = {
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'max_ms': round(max(latencies), 2),
+            }
+
+        # Previous implementation, for comparison (fewer queries, it is slow)
+        latencies = []
+        for q in queries[:50]:
+            like = f'%{q}%'
+            t0 = time.perf_counter()
+            Contact.query.filter(db.or_(
+                Contact.name.ilike(like), Contact.company.ilike(like),
+                Contact.email.ilike(like), Contact.phone.ilike(like),
+            )).order_by(Contact.name).all()
+            latencies.append((time.perf_counter() - t0) * 1000)
+        results['ilike_scan'] = {
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'max_ms': round(max(latencies), 2),
+        }
+        results['examples'] = {q: [c.name + ' / ' + c.company for c in search_contacts(q, limit=3)]
+                               for q in ['Muller', 'Schmitd', 'stadtw gmbh']}
+
+    print(json.dumps({'contacts': args.contacts, 'queries': len(queries), **results}, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
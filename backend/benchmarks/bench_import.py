@@ -0,0 +1,87 @@
+"""Throughput of the bulk expense import vs. one ORM insert + commit per row (the API path).
+
+Usage:
+    python benchmarks/bench_import.py --rows 80000 --baseline-rows 2000
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_csv(n, vendors, seed=42):
+    rnd = random.Random(seed)
+    out = io.StringIO()
+    out.write('vendor;invoice_date;invoice_number;net_amount;vat_rate;description;category\n')
+    start = date(2015, 1, 1)
+    for i in range(n):
+        d = start + timedelta(days=rnd.randrange(3650))
+        net = f'{rnd.uniform(5, 5000):.2f}'.replace('.', ',')
+        out.write(f'{rnd.choice(vendors)};{d.isoformat()};R-{i};{net};{rnd.choice([19, 7, 0])};Leistung {i};Wartung\n')
+    return out.getvalue().encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=80000)
+    parser.add_argument('--baseline-rows', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--contacts', type=int, default=500)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    from app import create_app
+    from models import db, Property, Contact, Expense
+    from importers import iter_records, import_expenses
+
+    app = create_app()
+    with app.app_context():
+        prop = Property(name='Benchmark')
+        db.session.add(prop)
+        vendors = [f'Lieferant {i} GmbH' for i in range(args.contacts)]
+        db.session.add_all(Contact(name=v) for v in vendors)
+        db.session.commit()
+        pid = prop.id
+
+        # Baseline: what create_expense does per request (contact lookup, VAT, insert, commit)
+        rows = list(iter_records(io.BytesIO(make_csv(args.baseline_rows, vendors, seed=1)), 'csv'))
+        t0 = time.perf_counter()
+        for r in rows:
+            net = float(r['net_amount'].replace(',', '.'))
+            rate = float(r['vat_rate'])
+            contact = Contact.query.filter(db.func.lower(Contact.name) == r['vendor'].lower()).first()
+            vat = round(net * rate / 100, 2)
+            db.session.add(Expense(
+                property_id=pid, contact_id=contact.id if contact else None, vendor=r['vendor'],
+                invoice_date=date.fromisoformat(r['invoice_date']), invoice_number=r['invoice_number'],
+                net_amount=net, vat_rate=rate, vat_amount=vat, gross_amount=round(net + vat, 2),
+                description=r['description'], category=r['category'],
+            ))
+            db.session.commit()
+        baseline = time.perf_counter() - t0
+
+        data = make_csv(args.rows, vendors)
+        report = import_expenses(iter_records(io.BytesIO(data), 'csv'), property_id=pid, batch_size=args.batch_size)
+        result = report.to_dict()
+
+    print(json.dumps({
+        'baseline_rows': args.baseline_rows,
+        'baseline_rows_per_sec': round(args.baseline_rows / baseline, 1),
+        'bulk_rows': result['rows'],
+        'bulk_inserted': result['inserted'],
+        'bulk_seconds': result['seconds'],
+        'bulk_rows_per_sec': result['rows_per_sec'],
+        'speedup': round(result['rows_per_sec'] / (args.baseline_rows / baseline), 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Live update fan-out: many SSE clients, one writer committing meter readings.
+
+Starts the app on a threaded local server, connects --clients streams spread over
+users with access to one property each (plus admins that see everything), commits
+--changes readings and measures commit-to-delivery latency.
+
+Usage:
+    python benchmarks/bench_live_updates.py --clients 500 --properties 10 --changes 200 --rate 50
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class Client(threading.Thread):
+    def __init__(self, port, ticket):
+        super().__init__(daemon=True)
+        self.port = port
+        self.ticket = ticket
+        self.received = {}  # event id -> receive time
+        self.ready = threading.Event()
+
+    def run(self):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        conn.request('GET', f'/api/events?ticket={self.ticket}')
+        resp = conn.getresponse()
+        self.ready.set()
+        while True:
+            line = resp.fp.readline()  # raw chunked stream; only the 'id:' lines matter
+            if not line:
+                return
+            if line.startswith(b'id: '):
+                self.received[int(line[4:])] = time.perf_counter()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--properties', type=int, default=10)
+    parser.add_argument('--admins', type=int, default=50, help='clients that see all properties')
+    parser.add_argument('--changes', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=50, help='commits per second')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    from werkzeug.serving import make_server
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from routes.events import issue_ticket
+    from models import db, User, Property, MeterReading, ChangeEvent
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = create_app()
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    server.socket.listen(args.clients)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with app.app_context():
+        properties = [Property(name=f'Objekt {i}') for i in range(args.properties)]
+        db.session.add_all(properties)
+        users = []
+        for i, prop in enumerate(properties):
+            user = User(username=f'user{i}', password_hash=generate_password_hash('x'), role='user')
+            user.properties.append(prop)
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        admin = User.query.filter_by(username='admin').first()
+        property_ids = [p.id for p in properties]
+        # Ticket per client, same as the frontend's POST /api/events/ticket
+        audiences = []
+        for i in range(args.clients):
+            user = admin if i < args.admins else users[i % len(users)]
+            ticket = issue_ticket(user.id, expires=timedelta(minutes=5))
+            audiences.append((None if user is admin else user.properties[0].id, ticket))
+
+    clients = []
+    t0 = time.perf_counter()
+    for _, ticket in audiences:
+        client = Client(port, ticket)
+        client.start()
+        clients.append(client)
+    for client in clients:
+        client.ready.wait(60)
+    connect_seconds = time.perf_counter() - t0
+    time.sleep(1)
+
+    committed = {}  # event id -> (commit time, property id)
+    with app.app_context():
+        interval = 1 / args.rate
+        start = time.perf_counter()
+        for i in range(args.changes):
+            pid = property_ids[i % len(property_ids)]
+            db.session.add(MeterReading(property_id=pid, meter_type='water', reading_value=i,
+                                        reading_date=date(2024, 1, 1) + timedelta(days=i)))
+            db.session.commit()
+            t = time.perf_counter()
+            event_id = db.session.query(db.func.max(ChangeEvent.id)).scalar()
+            committed[event_id] = (t, pid)
+            delay = start + (i + 1) * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        write_seconds = time.perf_counter() - start
+
+    # Wait for the fan-out to drain
+    expected = sum(1 for pid, _ in audiences for _, ev_pid in committed.values() if pid is None or pid == ev_pid)
+    deadline = time.perf_counter() + 30
+    while time.perf_counter() < deadline:
+        if sum(len(c.received) for c in clients) >= expected:
+            break
+        time.sleep(0.1)
+
+    latencies = []
+    leaked = 0
+    for (pid, _), client in zip(audiences, clients):
+        for event_id, received_at in client.received.items():
+            if event_id not in committed:
+                continue
+            commit_time, ev_pid = committed[event_id]
+            if pid is not None and pid != ev_pid:
+                leaked += 1
+            latencies.append((received_at - commit_time) * 1000)
+    server.shutdown()
+
+    print(json.dumps({
+        'clients': args.clients,
+        'admins': args.admins,
+        'changes': args.changes,
+        'connect_seconds': round(connect_seconds, 2),
+        'commits_per_sec': round(args.changes / write_seconds, 1),
+        'expected_deliveries': expected,
+        'delivered': len(latencies),
+        'acl_violations': leaked,
+        'latency_p50_ms': round(percentile(latencies, 50), 1),
+        'latency_p95_ms': round(percentile(latencies, 95), 1),
+        'latency_p99_ms': round(percentile(latencies, 99), 1),
+        'latency_max_ms': round(max(latencies, default=0), 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
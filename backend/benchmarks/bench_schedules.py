@@ -0,0 +1,128 @@
+"""Recurring cost totals: per-call RecurringCost scan (old) vs. cached schedules with prefix sums.
+
+Workload: monthly comparison (12 ranges) plus the annual total for every
+property and year.
+
+Usage:
+    python benchmarks/bench_schedules.py --properties 200 --costs 40 --years 10
+"""
+import argparse
+import calendar
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def old_recurring_total(RecurringCost, db, property_id, start_date, end_date):
+    # Previous utils.get_recurring_costs_total (whole months, one query per call)
+    costs = (
+        RecurringCost.query
+        .filter_by(property_id=property_id)
+        .filter(RecurringCost.start_date <= end_date)
+        .filter(db.or_(RecurringCost.end_date >= start_date, RecurringCost.end_date.is_(None)))
+        .all()
+    )
+    total = 0.0
+    for c in costs:
+        eff_start = max(c.start_date, start_date)
+        eff_end = min(c.end_date, end_date) if c.end_date else end_date
+        months = max(1, (eff_end.year - eff_start.year) * 12 + eff_end.month - eff_start.month + 1)
+        total += c.monthly_amount * months
+    return round(total, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--properties', type=int, default=200)
+    parser.add_argument('--costs', type=int, default=40, help='recurring costs per property')
+    parser.add_argument('--years', type=int, default=10)
+    args = parser.parse_args()
+    rnd = random.Random(5)
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    from app import create_app
+    from models import db, Property, RecurringCost
+    from schedules import property_schedule, clear_cache
+    from utils import get_recurring_costs_total
+
+    first_year = 2015
+    app = create_app()
+    with app.app_context():
+        db.session.execute(db.insert(Property), [{'name': f'Objekt {i}'} for i in range(args.properties)])
+        rows = []
+        span = args.years * 365
+        for pid in range(1, args.properties + 1):
+            for _ in range(args.costs):
+                start = date(first_year, 1, 1) + timedelta(days=rnd.randrange(span))
+                end = None if rnd.random() < 0.5 else start + timedelta(days=rnd.randrange(30, span))
+                rows.append({
+                    'property_id': pid, 'description': 'Vertrag', 'monthly_amount': round(rnd.uniform(10, 800), 2),
+                    'start_date': start, 'end_date': end,
+                    'billing_interval': rnd.choice(['monthly', 'quarterly', 'yearly']),
+                })
+        db.session.execute(db.insert(RecurringCost), rows)
+        db.session.commit()
+
+        years = range(first_year, first_year + args.years)
+        pids = range(1, args.properties + 1)
+
+        def month_ranges(year):
+            return [(date(year, m, 1), date(year, m, calendar.monthrange(year, m)[1])) for m in range(1, 13)]
+
+        t0 = time.perf_counter()
+        for pid in pids:
+            for year in years:
+                for a, b in month_ranges(year):
+                    old_recurring_total(RecurringCost, db, pid, a, b)
+                old_recurring_total(RecurringCost, db, pid, date(year, 1, 1), date(year, 12, 31))
+            db.session.expunge_all()
+        old_seconds = time.perf_counter() - t0
+
+        def new_pass():
+            for pid in pids:
+                schedule = property_schedule(pid)
+                for year in years:
+                    schedule.monthly(year)
+                    get_recurring_costs_total(pid, date(year, 1, 1), date(year, 12, 31))
+
+        clear_cache()
+        t0 = time.perf_counter()
+        new_pass()
+        cold_seconds = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        new_pass()
+        warm_seconds = time.perf_counter() - t0
+
+        # Arbitrary day-level ranges over the whole span (cached schedules)
+        queries = []
+        for _ in range(10000):
+            a = date(first_year, 1, 1) + timedelta(days=rnd.randrange(span))
+            queries.append((rnd.choice(pids), a, a + timedelta(days=rnd.randrange(1, span))))
+        t0 = time.perf_counter()
+        for pid, a, b in queries:
+            property_schedule(pid).total(a, b)
+        range_us = (time.perf_counter() - t0) / len(queries) * 1e6
+
+    evaluations = args.properties * args.years * 13
+    print(json.dumps({
+        'properties': args.properties,
+        'recurring_costs': len(rows),
+        'years': args.years,
+        'range_evaluations': evaluations,
+        'old_seconds': round(old_seconds, 2),
+        'schedule_cold_seconds': round(cold_seconds, 2),
+        'schedule_cached_seconds': round(warm_seconds, 3),
+        'speedup_cold': round(old_seconds / cold_seconds, 1),
+        'random_range_us': round(range_us, 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Global search over a synthetic corpus (default 1M documents).
+
+Usage:
+    python benchmarks/bench_search.py --rows 1000000 --properties 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VENDORS = ['Klempner', 'Sanitär', 'Elektro', 'Dachdecker', 'Heizungsbau', 'Gartenpflege', 'Hausmeister',
+           'Schornsteinfeger', 'Malerbetrieb', 'Stadtwerke', 'Versicherung', 'Aufzugswartung']
+CITIES = ['Berlin', 'München', 'Hamburg', 'Köln', 'Leipzig', 'Dresden', 'Bremen', 'Stuttgart']
+WORDS = ['Reparatur', 'Wartung', 'Austausch', 'Rohrbruch', 'Keller', 'Dach', 'Fenster', 'Heizung',
+         'Leitung', 'Notdienst', 'Prüfung', 'Reinigung', 'Treppenhaus', 'Zähler', 'Ablesung', 'Pumpe']
+QUERIES = ['klempner', 'rohrbr', 'heizung wartung', 'stadtwerke münchen', 'notdienst keller',
+           'zähler', 're', 'RE-2023', 'dachdecker dach', 'aufzug']
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--properties', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    rnd = random.Random(3)
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    from app import create_app
+    from models import db, Property, Expense, RecurringCost, MeterReading
+    from search_index import search, rebuild_search_index
+
+    app = create_app()
+    with app.app_context():
+        db.session.execute(db.insert(Property), [{'name': f'Objekt {i}'} for i in range(args.properties)])
+        db.session.commit()
+
+        n_exp = int(args.rows * 0.6)
+        n_rc = int(args.rows * 0.1)
+        n_mr = args.rows - n_exp - n_rc
+        start = date(2015, 1, 1)
+
+        def text(k):
+            return ' '.join(rnd.choice(WORDS) for _ in range(k))
+
+        t0 = time.perf_counter()
+        for model, n, make in [
+            (Expense, n_exp, lambda i: {
+                'property_id': rnd.randrange(1, args.properties + 1),
+                'vendor': f'{rnd.choice(VENDORS)} {rnd.choice(CITIES)} GmbH',
+                'invoice_date': start + timedelta(days=rnd.randrange(3650)),
+                'invoice_number': f'RE-{2015 + i % 10}-{i}', 'net_amount': 100.0,
+                'description': text(6),
+            }),
+            (RecurringCost, n_rc, lambda i: {
+                'property_id': rnd.randrange(1, args.properties + 1), 'description': text(3),
+                'vendor': f'{rnd.choice(VENDORS)} {rnd.choice(CITIES)}', 'monthly_amount': 50.0,
+                'start_date': start + timedelta(days=rnd.randrange(3650)),
+            }),
+            (MeterReading, n_mr, lambda i: {
+                'property_id': rnd.randrange(1, args.properties + 1), 'meter_type': 'water',
+                'reading_value': float(i), 'reading_date': start + timedelta(days=i % 3650),
+                'notes': text(4),
+            }),
+        ]:
+            for offset in range(0, n, 50000):
+                db.session.execute(db.insert(model), [make(i) for i in range(offset, min(n, offset + 50000))])
+                db.session.commit()
+        load_seconds = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        indexed = rebuild_search_index()
+        rebuild_seconds = time.perf_counter() - t0
+
+        scoped = list(range(1, min(args.properties, 10) + 1))
+        results = {}
+        for label, kwargs in [('admin', {}), ('scoped_10_properties', {'property_ids': scoped}),
+                              ('year_filter', {'year': 2023})]:
+            latencies = []
+            for _ in range(args.repeat):
+                for q in QUERIES:
+                    t0 = time.perf_counter()
+                    search(q, **kwargs)
+                    latencies.append((time.perf_counter() - t0) * 1000)
+            results[label] = {
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'max_ms': round(max(latencies), 2),
+            }
+        no_facets = []
+        for q in QUERIES:
+            t0 = time.perf_counter()
+            search(q, facets=False)
+            no_facets.append((time.perf_counter() - t0) * 1000)
+        results['admin_without_facets'] = {'p50_ms': round(percentile(no_facets, 50), 2),
+                                           'max_ms': round(max(no_facets), 2)}
+
+    print(json.dumps({
+        'documents': indexed,
+        'load_with_triggers_seconds': round(load_seconds, 1),
+        'rebuild_seconds': round(rebuild_seconds, 1),
+        **results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""List serialization: ORM objects + to_dict() vs. column projections (serializers.py).
+
+Fills one property with --rows meter readings and --rows expenses (70 % with a
+contact, 20 % with an attachment), then times building the list for both ways and
+the full GET request. Also checks that both produce the same JSON bytes.
+
+Usage:
+    python benchmarks/bench_serialization.py --rows 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - t0)
+    return result, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--contacts', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    rnd = random.Random(5)
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    os.environ['UPLOAD_DIR'] = os.path.join(tmp, 'uploads')
+    from flask import json as flask_json
+    from app import create_app
+    from models import db, Property, MeterReading, Expense, Contact, FileAttachment
+    import serializers
+
+    app = create_app()
+    with app.app_context():
+        db.session.add(Property(name='Objekt'))
+        db.session.execute(db.insert(Contact), [{'name': f'Lieferant {i}'} for i in range(args.contacts)])
+        start = date(2000, 1, 1)
+        db.session.execute(db.insert(MeterReading), [{
+            'property_id': 1, 'meter_type': rnd.choice(['water', 'electricity_day', 'electricity_night']),
+            'reading_value': round(i * 1.7, 2), 'reading_date': start + timedelta(days=i // 3), 'notes': '',
+        } for i in range(args.rows)])
+        db.session.execute(db.insert(Expense), [{
+            'property_id': 1, 'contact_id': rnd.randint(1, args.contacts) if rnd.random() < 0.7 else None,
+            'vendor': f'Lieferant {rnd.randrange(args.contacts)}', 'invoice_date': start + timedelta(days=i // 10),
+            'invoice_number': f'RE-{i}', 'net_amount': round(rnd.uniform(5, 5000), 2), 'vat_rate': 19.0,
+            'vat_amount': 1.0, 'gross_amount': 2.0, 'description': 'Wartung', 'category': 'Wartung',
+        } for i in range(args.rows)])
+        db.session.execute(db.insert(FileAttachment), [{
+            'entity_type': 'expense', 'entity_id': i, 'original_filename': 'r.pdf', 'stored_filename': f'{i}.pdf',
+            'file_type': 'pdf',
+        } for i in range(1, args.rows + 1) if rnd.random() < 0.2])
+        db.session.commit()
+
+        def orm_readings():
+            readings = MeterReading.query.filter_by(property_id=1).order_by(MeterReading.reading_date.desc()).all()
+            result = [r.to_dict() for r in readings]
+            db.session.expunge_all()
+            return result
+
+        def orm_expenses():
+            # Previous list_expenses: lazy contact load and one count query per row
+            result = []
+            for e in Expense.query.filter_by(property_id=1).order_by(Expense.invoice_date.desc()).all():
+                d = e.to_dict()
+                d['attachment_count'] = FileAttachment.query.filter_by(entity_type='expense', entity_id=e.id).count()
+                result.append(d)
+            db.session.expunge_all()
+            return result
+
+        def projected_readings():
+            return serializers.meter_readings(MeterReading.property_id == 1,
+                                              order_by=[MeterReading.reading_date.desc()])
+
+        def projected_expenses():
+            return serializers.expenses(Expense.property_id == 1, order_by=[Expense.invoice_date.desc()],
+                                        attachments=serializers.attachment_counts('expense', property_id=1))
+
+        results = {}
+        for name, old, new in [('meter_readings', orm_readings, projected_readings),
+                               ('expenses', orm_expenses, projected_expenses)]:
+            old_rows, old_seconds = best_of(old, 1)
+            new_rows, new_seconds = best_of(new, args.repeat)
+            identical = flask_json.dumps(old_rows) == flask_json.dumps(new_rows)
+            results[name] = {
+                'rows': len(new_rows),
+                'to_dict_rows_per_sec': round(len(old_rows) / old_seconds),
+                'projection_rows_per_sec': round(len(new_rows) / new_seconds),
+                'speedup': round(old_seconds / new_seconds, 1),
+                'identical_json': identical,
+            }
+
+    client = app.test_client()
+    token = client.post('/api/login', json={'username': 'admin', 'password': 'admin'}).json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    for name, path in [('meter_readings', '/api/properties/1/meters'), ('expenses', '/api/properties/1/expenses')]:
+        response, seconds = best_of(lambda: client.get(path, headers=headers), args.repeat)
+        results[name]['endpoint_ms'] = round(seconds * 1000, 1)
+        results[name]['endpoint_bytes'] = len(response.data)
+
+    print(json.dumps({'rows': args.rows, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Annual statements: one GET /api/reports/annual per property vs. batch jobs.
+
+Generates --properties properties (see datagen.py), times the per-request path
+(JSON only, as the UI does it today) and statements.run_job() with JSON, CSV and
+PDF per property for each --workers value. Reports properties per minute.
+
+Usage:
+    python benchmarks/bench_statements.py --properties 200 --workers 1,2,4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--properties', type=int, default=200)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--workers', default=f'1,{os.cpu_count() or 1}', help='comma-separated pool sizes')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    os.environ['UPLOAD_DIR'] = os.path.join(tmp, 'uploads')
+    from app import create_app
+    from models import db, Property
+    from datagen import generate, LAST_YEAR
+    from statements import create_job, run_job
+
+    app = create_app()
+    with app.app_context():
+        generate(args.properties, args.years)
+        property_ids = [pid for (pid,) in db.session.query(Property.id).order_by(Property.id)]
+
+    client = app.test_client()
+    token = client.post('/api/login', json={'username': 'admin', 'password': 'admin'}).json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    t0 = time.perf_counter()
+    for pid in property_ids:
+        client.get(f'/api/reports/annual/{pid}?year={LAST_YEAR}', headers=headers)
+    per_request = time.perf_counter() - t0
+    results = {'per_request': {'seconds': round(per_request, 2),
+                               'properties_per_minute': round(len(property_ids) / per_request * 60)}}
+
+    with app.app_context():
+        for workers in sorted({int(w) for w in args.workers.split(',') if w.strip()}):
+            job = create_job(LAST_YEAR, property_ids, 1)
+            t0 = time.perf_counter()
+            job = run_job(job.id, workers=workers)
+            seconds = time.perf_counter() - t0
+            results[f'job_workers_{workers}'] = {
+                'seconds': round(seconds, 2),
+                'properties_per_minute': round(job.done / seconds * 60),
+                'done': job.done,
+                'failed': job.failed,
+            }
+
+    print(json.dumps({'properties': len(property_ids), 'cpus': os.cpu_count(), 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
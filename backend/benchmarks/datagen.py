@@ -0,0 +1,215 @@
+"""Deterministic synthetic data: properties with meter series, tariffs, expenses with
+attachments, recurring costs, contacts, users and activity log.
+
+The same arguments always produce the same rows and files, so timings of
+different commits are comparable. Call generate() inside an app context, or fill a
+database from the command line:
+
+    DATABASE_URL=sqlite:////tmp/demo.db UPLOAD_DIR=/tmp/demo-uploads \\
+        python benchmarks/datagen.py --properties 50 --years 3
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LAST_YEAR = 2024  # fixed, so data does not depend on the current date
+BATCH = 5000
+
+# meter type -> (monthly consumption, seasonal amplitude, start value range)
+METERS = {
+    'water': (9.0, 0.15, (100, 2000)),
+    'electricity_day': (240.0, 0.25, (1000, 40000)),
+    'electricity_night': (110.0, 0.3, (500, 20000)),
+}
+# tariff type -> (price per unit, monthly base cost)
+TARIFFS = {
+    'water': (2.1, 8.0),
+    'wastewater': (2.6, 0.0),
+    'electricity_day': (0.32, 12.5),
+    'electricity_night': (0.24, 0.0),
+}
+CATEGORIES = ['Reparatur', 'Wartung', 'Reinigung', 'Garten', 'Versicherung', 'Verwaltung', 'Material', 'Energie']
+RECURRING = [
+    ('Gebäudeversicherung', 'Versicherung', (40, 120), 'yearly'),
+    ('Hausmeisterservice', 'Verwaltung', (150, 400), 'monthly'),
+    ('Treppenhausreinigung', 'Reinigung', (80, 200), 'monthly'),
+    ('Aufzugwartung', 'Wartung', (60, 150), 'quarterly'),
+    ('Gartenpflege', 'Garten', (50, 180), 'quarterly'),
+    ('Müllabfuhr', 'Energie', (30, 90), 'quarterly'),
+    ('Grundsteuer', 'Verwaltung', (50, 200), 'quarterly'),
+    ('Internet Gemeinschaftsanschluss', 'Energie', (20, 60), 'monthly'),
+]
+VENDOR_WORDS = ['Müller', 'Schmidt', 'Schneider', 'Fischer', 'Weber', 'Meyer', 'Wagner', 'Becker', 'Schulz',
+                'Hoffmann', 'Koch', 'Richter', 'Klein', 'Wolf', 'Schröder', 'Neumann', 'Braun', 'Zimmermann']
+VENDOR_TRADES = ['Sanitär', 'Elektro', 'Dachdeckerei', 'Malerbetrieb', 'Gebäudereinigung', 'Gartenbau',
+                 'Heizungsbau', 'Schlüsseldienst', 'Hausverwaltung', 'Energie']
+LEGAL_FORMS = ['GmbH', 'GmbH & Co. KG', 'e.K.', 'AG', '']
+STREETS = ['Hauptstraße', 'Bahnhofstraße', 'Gartenweg', 'Lindenallee', 'Schulstraße', 'Am Markt', 'Bergstraße']
+CITIES = ['Berlin', 'Hamburg', 'München', 'Köln', 'Leipzig', 'Dresden', 'Freiburg']
+
+
+def _attachment_bytes(rnd, size):
+    # Minimal PDF header plus deterministic filler; enough for storage and backup paths
+    return b'%PDF-1.4\n%' + rnd.randbytes(size) + b'\n%%EOF\n'
+
+
+def generate(properties=10, years=3, seed=42, users=None, contacts=None, expenses_per_month=4,
+             attachment_ratio=0.2, attachment_size=8 * 1024):
+    """Insert a deterministic data set; returns row counts. Needs an app context and an empty database."""
+    from models import (db, User, Property, MeterReading, Tariff, Expense, RecurringCost, Contact,
+                        FileAttachment, ActivityLog, user_property)
+    from thumbnails import UPLOAD_BASE
+    from contact_matching import init_contact_keys
+    from werkzeug.security import generate_password_hash
+
+    rnd = random.Random(seed)
+    first_year = LAST_YEAR - years + 1
+    start, end = date(first_year, 1, 1), date(LAST_YEAR, 12, 31)
+    users = users if users is not None else max(1, properties // 5)
+    contacts = contacts if contacts is not None else 20 + properties
+    counts = {}
+
+    def insert(model, rows):
+        for i in range(0, len(rows), BATCH):
+            db.session.execute(db.insert(model), rows[i:i + BATCH])
+        db.session.commit()
+        counts[model.__tablename__] = counts.get(model.__tablename__, 0) + len(rows)
+
+    insert(Property, [{
+        'name': f'Objekt {i + 1:04d} {rnd.choice(STREETS)}',
+        'address': f'{rnd.choice(STREETS)} {rnd.randint(1, 120)}, {rnd.randint(10000, 99999)} {rnd.choice(CITIES)}',
+        'description': f'{rnd.randint(2, 24)} Wohneinheiten',
+        'created_at': datetime(first_year, 1, 1),
+    } for i in range(properties)])
+    property_ids = [pid for (pid,) in db.session.query(Property.id).order_by(Property.id)]
+
+    password = generate_password_hash('benchmark')
+    insert(User, [{'username': f'verwalter{i + 1}', 'password_hash': password, 'role': 'user',
+                   'created_at': datetime(first_year, 1, 1)} for i in range(users)])
+    user_ids = [uid for (uid,) in db.session.query(User.id).filter(User.role == 'user').order_by(User.id)]
+    assignments = [{'user_id': user_ids[i % len(user_ids)], 'property_id': pid} for i, pid in enumerate(property_ids)]
+    db.session.execute(user_property.insert(), assignments)
+    db.session.commit()
+
+    contact_rows = []
+    for i in range(contacts):
+        name = f'{rnd.choice(VENDOR_TRADES)} {rnd.choice(VENDOR_WORDS)} {rnd.choice(LEGAL_FORMS)}'.strip()
+        contact_rows.append({
+            'name': f'{name} {i + 1}' if i >= len(VENDOR_WORDS) * 2 else name,
+            'address': f'{rnd.choice(STREETS)} {rnd.randint(1, 80)}, {rnd.choice(CITIES)}',
+            'phone': f'0{rnd.randint(30, 999)} {rnd.randint(100000, 9999999)}',
+            'email': f'info{i + 1}@example.com',
+            'created_at': datetime(first_year, 1, 1),
+        })
+    insert(Contact, contact_rows)
+    contact_list = db.session.query(Contact.id, Contact.name).order_by(Contact.id).all()
+    init_contact_keys()
+
+    readings = []
+    tariffs = []
+    for pid in property_ids:
+        for meter_type, (monthly, amplitude, (lo, hi)) in METERS.items():
+            value = float(rnd.randint(lo, hi))
+            d = start + timedelta(days=rnd.randint(0, 10))
+            while d <= end:
+                readings.append({'property_id': pid, 'meter_type': meter_type, 'reading_value': round(value, 2),
+                                 'reading_date': d, 'notes': ''})
+                step = rnd.randint(25, 35)
+                season = 1 + amplitude * math.cos((d.month - 1) / 12 * 2 * math.pi)
+                value += monthly * season * step / 30 * rnd.uniform(0.8, 1.2)
+                d += timedelta(days=step)
+        for tariff_type, (price, base) in TARIFFS.items():
+            for year in range(first_year, LAST_YEAR + 1):
+                factor = 1 + 0.04 * (year - first_year) + rnd.uniform(-0.02, 0.02)
+                tariffs.append({'property_id': pid, 'tariff_type': tariff_type,
+                                'price_per_unit': round(price * factor, 4),
+                                'base_cost_monthly': round(base * factor, 2),
+                                'valid_from': date(year, 1, 1),
+                                'valid_to': date(year, 12, 31) if year < LAST_YEAR else None})
+    insert(MeterReading, readings)
+    insert(Tariff, tariffs)
+
+    expenses = []
+    recurring = []
+    for pid in property_ids:
+        months = years * 12
+        for m in range(months):
+            year, month = first_year + m // 12, m % 12 + 1
+            for _ in range(max(0, int(rnd.gauss(expenses_per_month, 1.5)))):
+                cid, vendor = rnd.choice(contact_list)
+                net = round(rnd.lognormvariate(5, 1), 2)
+                vat_rate = rnd.choice([19.0, 19.0, 19.0, 7.0, 0.0])
+                vat = round(net * vat_rate / 100, 2)
+                expenses.append({
+                    'property_id': pid, 'contact_id': cid if rnd.random() < 0.7 else None, 'vendor': vendor,
+                    'invoice_date': date(year, month, rnd.randint(1, 28)),
+                    'invoice_number': f'RE-{year}-{rnd.randint(1000, 99999)}',
+                    'net_amount': net, 'vat_rate': vat_rate, 'vat_amount': vat, 'gross_amount': round(net + vat, 2),
+                    'description': f'{rnd.choice(CATEGORIES)} {rnd.choice(["Treppenhaus", "Keller", "Dach", "Heizung", "Fassade", "Außenanlage"])}',
+                    'category': rnd.choice(CATEGORIES),
+                })
+        for description, category, (lo, hi), interval in rnd.sample(RECURRING, rnd.randint(4, len(RECURRING))):
+            cid, vendor = rnd.choice(contact_list)
+            amount = round(rnd.uniform(lo, hi), 2)
+            cost_start = date(first_year + rnd.randint(0, max(0, years - 1)), rnd.randint(1, 12), 1)
+            cost_end = None if rnd.random() < 0.7 else cost_start + timedelta(days=rnd.randint(180, 900))
+            recurring.append({
+                'property_id': pid, 'contact_id': cid, 'description': description, 'vendor': vendor,
+                'monthly_amount': amount, 'vat_rate': 19.0, 'net_amount': round(amount / 1.19, 2),
+                'gross_amount': amount, 'start_date': cost_start, 'end_date': cost_end,
+                'category': category, 'billing_interval': interval,
+            })
+    insert(Expense, expenses)
+    insert(RecurringCost, recurring)
+
+    # Attachments: files under UPLOAD_DIR plus their rows
+    folder = os.path.join(UPLOAD_BASE, 'expenses')
+    os.makedirs(folder, exist_ok=True)
+    expense_ids = [eid for (eid,) in db.session.query(Expense.id).order_by(Expense.id)]
+    attachments = []
+    for eid in expense_ids:
+        if rnd.random() >= attachment_ratio:
+            continue
+        stored = f'bench_{seed}_{eid:08d}.pdf'
+        with open(os.path.join(folder, stored), 'wb') as f:
+            f.write(_attachment_bytes(rnd, attachment_size))
+        attachments.append({'entity_type': 'expense', 'entity_id': eid, 'original_filename': f'Rechnung_{eid}.pdf',
+                            'stored_filename': stored, 'file_type': 'pdf', 'uploaded_at': datetime(LAST_YEAR, 12, 31)})
+    insert(FileAttachment, attachments)
+
+    # Activity log roughly as the UI writes it: one entry per created record
+    usernames = dict(db.session.query(User.id, User.username))
+    log = []
+    for kind, n in (('meter_reading', len(readings)), ('expense', len(expenses)), ('recurring_cost', len(recurring))):
+        for i in range(n):
+            uid = rnd.choice(user_ids)
+            log.append({'user_id': uid, 'username': usernames[uid], 'action': 'create', 'entity_type': kind,
+                        'entity_id': i + 1, 'details': f'{kind} erstellt', 'ip_address': '127.0.0.1',
+                        'timestamp': datetime(first_year, 1, 1) + timedelta(minutes=rnd.randint(0, years * 525600))})
+    insert(ActivityLog, log)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--properties', type=int, default=10)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    from app import create_app
+    from models import Property
+    app = create_app()
+    with app.app_context():
+        if Property.query.first():
+            sys.exit('Datenbank ist nicht leer')
+        print(json.dumps(generate(args.properties, args.years, args.seed), indent=2))
+
+
+if __name__ == '__main__':
+    main()
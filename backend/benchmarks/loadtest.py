@@ -0,0 +1,130 @@
+"""Simple HTTP load test for the report and list endpoints.
+
+Usage:
+    python benchmarks/loadtest.py --url http://localhost:5000 --concurrency 16 --duration 20
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+
+def request_json(url, token=None, data=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    body = json.dumps(data).encode('utf-8') if data is not None else None
+    req = urllib.request.Request(url, data=body, headers=headers)
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        return json.loads(resp.read())
+
+
+def login(base_url, username, password):
+    return request_json(f'{base_url}/api/login', data={'username': username, 'password': password})['access_token']
+
+
+def build_targets(base_url, token, year):
+    properties = request_json(f'{base_url}/api/properties', token)
+    targets = {
+        'properties': ['/api/properties'],
+        'dashboard': ['/api/reports/dashboard'],
+        'contacts': ['/api/contacts'],
+    }
+    for p in properties:
+        pid = p['id']
+        targets.setdefault('meters', []).append(f'/api/properties/{pid}/meters')
+        targets.setdefault('expenses', []).append(f'/api/properties/{pid}/expenses')
+        targets.setdefault('recurring_costs', []).append(f'/api/properties/{pid}/recurring-costs')
+        targets.setdefault('consumption', []).append(f'/api/reports/consumption/{pid}')
+        targets.setdefault('costs', []).append(f'/api/reports/costs/{pid}')
+        targets.setdefault('forecast', []).append(f'/api/reports/forecast/{pid}?year={year}')
+        targets.setdefault('monthly', []).append(f'/api/reports/monthly/{pid}?year={year}')
+        targets.setdefault('annual', []).append(f'/api/reports/annual/{pid}?year={year}')
+    return targets
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def run_endpoint(base_url, token, paths, concurrency, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    headers = {'Authorization': f'Bearer {token}'}
+
+    def worker(offset):
+        i = offset
+        local = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            req = urllib.request.Request(base_url + paths[i % len(paths)], headers=headers)
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=60) as resp:
+                    resp.read()
+            except (urllib.error.URLError, OSError):
+                local_errors += 1
+                continue
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for n in range(concurrency):
+            pool.submit(worker, n)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test for Hausverwaltung API')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per endpoint')
+    parser.add_argument('--year', type=int, default=date.today().year)
+    parser.add_argument('--only', nargs='*', help='Restrict to these endpoint names')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/')
+    token = login(base_url, args.username, args.password)
+    targets = build_targets(base_url, token, args.year)
+    if args.only:
+        targets = {k: v for k, v in targets.items() if k in args.only}
+
+    results = {}
+    for name, paths in targets.items():
+        results[name] = run_endpoint(base_url, token, paths, args.concurrency, args.duration)
+        if not args.json:
+            r = results[name]
+            print(f"{name:<16} {r['rps']:>8} req/s  p50 {r['p50_ms']:>7} ms  p95 {r['p95_ms']:>7} ms  "
+                  f"p99 {r['p99_ms']:>7} ms  errors {r['errors']}")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Endpoint benchmark suite on generated data (see datagen.py) at several scales.
+
+Times the report endpoints, the list endpoints, CSV export, backup and restore
+in-process through the Flask test client. Each scale runs in its own process with a
+fresh database and upload directory. Results are printed as JSON and can be saved
+as a baseline and compared against later:
+
+    python benchmarks/suite.py --scales 10,50 --save-baseline baseline.json
+    python benchmarks/suite.py --scales 10,50 --baseline baseline.json --tolerance 1.25
+
+With --baseline the exit code is 1 if any endpoint got slower than the tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+SAMPLE_PROPERTIES = 5  # per-property endpoints run for this many properties
+MIN_ABSOLUTE_MS = 2.0  # regressions below this many ms are noise
+
+
+def _targets(properties, year):
+    """name -> list of paths (one request per path and repetition)."""
+    pids = [properties[i * len(properties) // SAMPLE_PROPERTIES] for i in range(min(SAMPLE_PROPERTIES, len(properties)))]
+    per = lambda fmt: [fmt.format(pid=pid, year=year) for pid in pids]
+    return {
+        'reports.dashboard': ['/api/reports/dashboard'],
+        'reports.consumption': per('/api/reports/consumption/{pid}?start={year}-01-01&end={year}-12-31'),
+        'reports.costs': per('/api/reports/costs/{pid}?start={year}-01-01&end={year}-12-31'),
+        'reports.forecast': per('/api/reports/forecast/{pid}?year={year}'),
+        'reports.annual': per('/api/reports/annual/{pid}?year={year}'),
+        'reports.monthly': per('/api/reports/monthly/{pid}?year={year}'),
+        'reports.cube': ['/api/reports/expenses/cube?dims=property,year', '/api/reports/expenses/cube?dims=category,month'],
+        'export.expenses': per('/api/reports/export/{pid}?type=expenses&start={year}-01-01&end={year}-12-31'),
+        'export.meters': per('/api/reports/export/{pid}?type=meters&start={year}-01-01&end={year}-12-31'),
+        'export.recurring': per('/api/reports/export/{pid}?type=recurring&start={year}-01-01&end={year}-12-31'),
+        'list.properties': ['/api/properties'],
+        'list.meters': per('/api/properties/{pid}/meters'),
+        'list.tariffs': per('/api/properties/{pid}/tariffs'),
+        'list.expenses': per('/api/properties/{pid}/expenses'),
+        'list.recurring_costs': per('/api/properties/{pid}/recurring-costs'),
+        'list.contacts': ['/api/contacts'],
+        'list.users': ['/api/users'],
+        'list.activity_log': ['/api/activity-log'],
+    }
+
+
+def _stats(samples):
+    samples = sorted(samples)
+    return {
+        'median_ms': round(statistics.median(samples), 2),
+        'p95_ms': round(samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))], 2),
+        'min_ms': round(samples[0], 2),
+        'runs': len(samples),
+    }
+
+
+def run_scale(properties, years, seed, repeat):
+    """Generate data and time all endpoints; runs inside the worker process."""
+    from app import create_app
+    from models import db, Property
+    from datagen import generate, LAST_YEAR
+
+    database_url = os.environ['DATABASE_URL']
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        t0 = time.perf_counter()
+        counts = generate(properties, years, seed)
+        generate_seconds = time.perf_counter() - t0
+        property_ids = [pid for (pid,) in db.session.query(Property.id).order_by(Property.id)]
+    token = client.post('/api/login', json={'username': 'admin', 'password': 'admin'}).json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    def timed(method, path, **kwargs):
+        start = time.perf_counter()
+        response = client.open(path, method=method, headers=headers, **kwargs)
+        body = response.get_data()
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method} {path}: {response.status_code} {body[:200]!r}')
+        return elapsed, body
+
+    results = {}
+    for name, paths in _targets(property_ids, LAST_YEAR).items():
+        for path in paths:
+            timed('GET', path)  # warm-up (caches, SQLite page cache)
+        samples = [timed('GET', path)[0] for _ in range(repeat) for path in paths]
+        results[name] = _stats(samples)
+
+    samples = []
+    for _ in range(max(1, repeat // 2)):
+        elapsed, backup = timed('GET', '/api/backup')
+        samples.append(elapsed)
+    results['backup.create'] = {**_stats(samples), 'bytes': len(backup)}
+
+    # Restore into a new, empty database, as after a server move
+    samples = []
+    for i in range(max(1, repeat // 2)):
+        os.environ['DATABASE_URL'] = f'{database_url}.restore{i}'
+        target = create_app().test_client()
+        login = target.post('/api/login', json={'username': 'admin', 'password': 'admin'}).json['access_token']
+        start = time.perf_counter()
+        response = target.post('/api/restore', data=backup, content_type='application/json',
+                               headers={'Authorization': f'Bearer {login}'})
+        samples.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f'restore: {response.status_code} {response.get_data()[:200]!r}')
+    results['backup.restore'] = _stats(samples)
+
+    return {'properties': properties, 'rows': counts, 'generate_seconds': round(generate_seconds, 2),
+            'endpoints': results}
+
+
+def _worker(args):
+    tmp = tempfile.mkdtemp(prefix='hv-bench-')
+    try:
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        os.environ['UPLOAD_DIR'] = os.path.join(tmp, 'uploads')
+        os.environ.setdefault('SLOW_QUERY_MS', '1000000')
+        result = run_scale(args.properties, args.years, args.seed, args.repeat)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print(json.dumps(result))
+
+
+def compare(current, baseline, tolerance):
+    """Endpoints whose median got slower than tolerance x baseline (and by at least MIN_ABSOLUTE_MS)."""
+    regressions, rows = [], []
+    for scale, result in current['scales'].items():
+        base = baseline.get('scales', {}).get(scale)
+        if not base:
+            continue
+        for name, stats in result['endpoints'].items():
+            old = base['endpoints'].get(name)
+            if not old:
+                continue
+            ratio = stats['median_ms'] / old['median_ms'] if old['median_ms'] else 1.0
+            row = {'scale': int(scale), 'endpoint': name, 'baseline_ms': old['median_ms'],
+                   'current_ms': stats['median_ms'], 'ratio': round(ratio, 2)}
+            rows.append(row)
+            if ratio > tolerance and stats['median_ms'] - old['median_ms'] >= MIN_ABSOLUTE_MS:
+                regressions.append(row)
+    return rows, regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', default='10,50', help='comma-separated property counts')
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write results to this file as well')
+    parser.add_argument('--save-baseline', help='store results as baseline file')
+    parser.add_argument('--baseline', help='compare against this baseline file')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='allowed slowdown factor')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--properties', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(args)
+        return
+
+    results = {
+        'meta': {
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'years': args.years,
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'scales': {},
+    }
+    for scale in [int(s) for s in args.scales.split(',') if s.strip()]:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', '--properties', str(scale),
+             '--years', str(args.years), '--seed', str(args.seed), '--repeat', str(args.repeat)],
+            cwd=BACKEND, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stderr)
+            sys.exit(f'Benchmark für {scale} Immobilien fehlgeschlagen')
+        results['scales'][str(scale)] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(results, baseline, args.tolerance)
+        results['comparison'] = {'baseline_revision': baseline.get('meta', {}).get('revision'),
+                                 'tolerance': args.tolerance, 'endpoints': rows, 'regressions': regressions}
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                f.write(output + '\n')
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
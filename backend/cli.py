@@ -0,0 +1,117 @@
+import json
+import click
+from models import User
+from activity_logger import log_activity
+
+
+def _run_import(import_func, entity_type, label, path, property_id, fmt, username, batch_size):
+    from importers import detect_format, iter_records
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f'Benutzer {username} nicht gefunden')
+    with open(path, 'rb') as f:
+        report = import_func(
+            iter_records(f, detect_format(path, explicit=fmt)),
+            property_id=property_id, batch_size=batch_size,
+        )
+    result = report.to_dict()
+    log_activity(user.id, 'import', entity_type, property_id,
+                 f'{result["inserted"]} {label} importiert ({result["duplicates"]} Duplikate, {result["errors"]} Fehler)')
+    click.echo(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+def import_options(func):
+    func = click.argument('path', type=click.Path(exists=True, dir_okay=False))(func)
+    func = click.option('--property-id', type=int, help='Immobilie für Zeilen ohne property_id')(func)
+    func = click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson', 'json']),
+                        help='Standard: anhand der Dateiendung')(func)
+    func = click.option('--user', 'username', default='admin', show_default=True,
+                        help='Benutzer für das Aktivitätslog')(func)
+    func = click.option('--batch-size', type=int, default=5000, show_default=True)(func)
+    return func
+
+
+def register_cli(app):
+    # Usage: flask --app wsgi <command> ...
+
+    @app.cli.command('import-meters')
+    @import_options
+    def import_meters(path, property_id, fmt, username, batch_size):
+        """Zählerstände aus CSV/NDJSON importieren."""
+        from importers import import_meter_readings
+        _run_import(import_meter_readings, 'meter_reading', 'Zählerstände',
+                    path, property_id, fmt, username, batch_size)
+
+    @app.cli.command('import-expenses')
+    @import_options
+    def import_expenses(path, property_id, fmt, username, batch_size):
+        """Ausgaben aus CSV/NDJSON/JSON importieren."""
+        from importers import import_expenses as run
+        _run_import(run, 'expense', 'Ausgaben', path, property_id, fmt, username, batch_size)
+
+    @app.cli.command('import-recurring-costs')
+    @import_options
+    def import_recurring_costs(path, property_id, fmt, username, batch_size):
+        """Laufende Kosten aus CSV/NDJSON/JSON importieren."""
+        from importers import import_recurring_costs as run
+        _run_import(run, 'recurring_cost', 'lfd. Kosten', path, property_id, fmt, username, batch_size)
+
+    @app.cli.command('rebuild-contact-search')
+    def rebuild_contact_search_cmd():
+        """Volltextindex der Kontakte neu aufbauen."""
+        from contact_search import rebuild_contact_search
+        rebuild_contact_search()
+        click.echo('Kontaktindex neu aufgebaut')
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_cmd():
+        """Globalen Suchindex (Ausgaben, lfd. Kosten, Zählernotizen) neu aufbauen."""
+        from search_index import rebuild_search_index
+        count = rebuild_search_index()
+        click.echo(f'Suchindex neu aufgebaut: {count} Einträge')
+
+    @app.cli.command('annual-statements')
+    @click.option('--year', type=int, required=True)
+    @click.option('--property-id', 'property_ids', type=int, multiple=True, help='Standard: alle Immobilien')
+    @click.option('--workers', type=int, default=None, help='Prozesse (Standard: STATEMENT_WORKERS bzw. CPU-Kerne)')
+    @click.option('--user', 'username', default='admin', show_default=True,
+                  help='Benutzer für das Aktivitätslog')
+    def annual_statements(year, property_ids, workers, username):
+        """Jahresabrechnungen für alle (oder ausgewählte) Immobilien erzeugen."""
+        from models import db, Property
+        from statements import create_job, run_job, WORKERS
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            raise click.ClickException(f'Benutzer {username} nicht gefunden')
+        ids = sorted(property_ids) or [pid for (pid,) in db.session.query(Property.id).order_by(Property.id)]
+        job = create_job(year, ids, user.id)
+        log_activity(user.id, 'create', 'statement_job', job.id,
+                     f'Jahresabrechnungen {year} für {len(ids)} Immobilien gestartet')
+        job = run_job(job.id, workers=workers or WORKERS,
+                      progress=lambda j: click.echo(f'{j.done + j.failed}/{j.total}', err=True))
+        click.echo(json.dumps(job.to_dict(), indent=2, ensure_ascii=False))
+
+    @app.cli.command('dedupe-contacts')
+    @click.option('--threshold', type=float, default=None, help='Mindestähnlichkeit (Standard 0.9)')
+    @click.option('--apply', is_flag=True, help='Duplikate zusammenführen statt nur anzeigen')
+    @click.option('--user', 'username', default='admin', show_default=True,
+                  help='Benutzer für das Aktivitätslog')
+    def dedupe_contacts(threshold, apply, username):
+        """Doppelte Kontakte finden und zusammenführen (ältester Kontakt bleibt)."""
+        from models import Contact
+        from contact_matching import find_duplicates, merge_contacts, MATCH_THRESHOLD
+        user = User.query.filter_by(username=username).first()
+        if apply and not user:
+            raise click.ClickException(f'Benutzer {username} nicht gefunden')
+        groups = find_duplicates(threshold=threshold or MATCH_THRESHOLD)
+        for ids in groups:
+            contacts = Contact.query.filter(Contact.id.in_(ids)).order_by(Contact.id).all()
+            click.echo(' | '.join(f'#{c.id} {c.name}' for c in contacts))
+            if apply:
+                keep, duplicates = contacts[0], contacts[1:]
+                names = ', '.join(d.name for d in duplicates)
+                merge_contacts(keep, duplicates)
+                log_activity(user.id, 'merge', 'contact', keep.id,
+                             f'Kontakte zusammengeführt in {keep.name}: {names}')
+        merged = sum(len(ids) - 1 for ids in groups)
+        click.echo(f'{len(groups)} Gruppen, {merged} Duplikate' + (' zusammengeführt' if apply else ''))
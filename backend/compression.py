@@ -0,0 +1,103 @@
+import functools
+import os
+import zlib
+from flask import request
+
+# Response compression for the API (JSON lists and reports, CSV export, backup,
+# metrics). Brotli when the client accepts it and the optional brotli package is
+# installed, gzip otherwise. Static files are precompressed (static_files) and
+# uploads are sent as files (mostly JPEG/PDF), so both pass through unchanged, as
+# do event streams, which must reach the client message by message.
+
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', '6'))  # gzip 1-9, 0 turns compression off
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))  # 0-11
+MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))  # smaller bodies gain less than the header costs
+COMPRESSIBLE = {'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'}
+
+
+@functools.lru_cache(maxsize=None)
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def compressible(mimetype):
+    if mimetype == 'text/event-stream':
+        return False
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE
+
+
+def choose_encoding(accept_encodings):
+    """'br', 'gzip' or None for a werkzeug Accept header; brotli wins a tie."""
+    best, best_q = None, 0
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and _brotli() is None:
+            continue
+        q = accept_encodings[encoding]
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compressor(encoding):
+    """(compress, finish) functions of an incremental compressor."""
+    if encoding == 'br':
+        c = _brotli().Compressor(quality=BROTLI_QUALITY)
+        return c.process, c.finish
+    c = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    return c.compress, c.flush
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return _brotli().compress(data, quality=BROTLI_QUALITY)
+    process, finish = compressor(encoding)
+    return process(data) + finish()
+
+
+def _stream(chunks, encoding):
+    process, finish = compressor(encoding)
+    try:
+        for chunk in chunks:
+            data = process(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+class Compression:
+    def init_app(self, app):
+        app.after_request(self._after_request)
+
+    def _after_request(self, response):
+        if (COMPRESS_LEVEL <= 0 or response.direct_passthrough or not compressible(response.mimetype)
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = _stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < MIN_SIZE:
+                return response
+            response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)  # the bytes differ from the uncompressed variant
+        return response
+
+
+compression = Compression()
@@ -0,0 +1,196 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from itertools import groupby
+from models import db, Meter, MeterReading
+from write_hooks import on_commit
+from live_updates import on_change
+import serializers
+
+# Consumption across meter replacements and counter rollovers. A reading belongs to
+# the Meter of its type installed at its date (or to an implicit counter where no
+# meter is recorded). One ordered pass over readings plus the installation and
+# removal values of the meters sums the differences per meter, adding rollover_limit
+# when a counter wraps, into a cumulative series (dates and totals as arrays).
+# Consumption between any two dates is then two bisections, linear interpolation
+# where a date falls between readings, and a subtraction.
+
+CACHE_TTL = 60
+
+
+class ConsumptionSeries:
+    """Cumulative consumption of one meter type of a property, in date order."""
+
+    def __init__(self, points):
+        # points: (reading dict, segment key, rollover limit), already in date order
+        self.days = array('l')  # date ordinals
+        self.cumulative = array('d')
+        self.segments = []
+        self.readings = []
+        total = 0.0
+        last_segment = last_value = None
+        for reading, segment, limit in points:
+            value = reading['reading_value']
+            if segment == last_segment and last_value is not None:
+                delta = value - last_value
+                if delta < 0 and limit:
+                    delta += limit
+                total += delta
+            last_segment, last_value = segment, value
+            self.days.append(date.fromisoformat(reading['reading_date']).toordinal())
+            self.cumulative.append(total)
+            self.segments.append(segment)
+            self.readings.append(reading)
+
+    def at(self, day):
+        """Cumulative consumption at a date, linear between points; None outside the points."""
+        day = day.toordinal()
+        if not self.days or day < self.days[0] or day > self.days[-1]:
+            return None
+        j = bisect_right(self.days, day)
+        i = j - 1
+        if self.days[i] == day:
+            return self.cumulative[i]
+        return self.cumulative[i] + (self.cumulative[j] - self.cumulative[i]) * (
+            (day - self.days[i]) / (self.days[j] - self.days[i]))
+
+    def between(self, start, end):
+        """(from, to, consumption) for [start, end] clipped to the points, or None without overlap."""
+        if len(self.days) < 2:
+            return None
+        a = max(start.toordinal(), self.days[0])
+        b = min(end.toordinal(), self.days[-1])
+        if b <= a:
+            return None
+        a, b = date.fromordinal(a), date.fromordinal(b)
+        return a, b, self.at(b) - self.at(a)
+
+    def consumption(self, start, end):
+        """Consumption from start to end, interpolated where they fall between readings."""
+        span = self.between(start, end)
+        if span is None:
+            return None
+        a, b, consumption = span
+        days = (b - a).days
+        # The readings the interpolation starts from and ends at
+        i = bisect_right(self.days, a.toordinal()) - 1
+        j = bisect_left(self.days, b.toordinal())
+        return {
+            'total': round(consumption, 2),
+            'days': days,
+            'daily_avg': round(consumption / days, 4),
+            'start_date': a.isoformat(),
+            'end_date': b.isoformat(),
+            'start_reading': self.readings[i],
+            'end_reading': self.readings[j],
+            'interpolated': self.days[i] != a.toordinal() or self.days[j] != b.toordinal(),
+            'meter_changes': len(set(self.segments[i:j + 1])) - 1,
+        }
+
+    def readings_between(self, start, end):
+        return self.readings[bisect_left(self.days, start.toordinal()):bisect_right(self.days, end.toordinal())]
+
+    def monthly(self, year):
+        """Consumption per calendar month of a year; None for months without readings around them."""
+        bounds = [date(year, m, 1) for m in range(1, 13)] + [date(year + 1, 1, 1)]
+        result = []
+        for a, b in zip(bounds, bounds[1:]):
+            span = self.between(a, b)
+            result.append(round(span[2], 2) if span else None)
+        return result
+
+
+def _meter_point(meter, value, day, note):
+    return {
+        'id': None,
+        'property_id': meter['property_id'],
+        'meter_type': meter['meter_type'],
+        'reading_value': value,
+        'reading_date': day,
+        'notes': f'{note} {meter["serial_number"] or ""}'.strip(),
+        'meter_id': meter['id'],
+    }
+
+
+def _points(meters, readings):
+    """(reading, segment, rollover limit) of one meter type, ordered by date."""
+    starts = [m['installed_on'] for m in meters]
+    keyed = []
+    for m in meters:
+        # At a replacement day the old meter's final value comes first, then the new initial value
+        if m['removed_on'] and m['final_value'] is not None:
+            keyed.append(((m['removed_on'], 0), _meter_point(m, m['final_value'], m['removed_on'], 'Ausbau'),
+                          m['id'], m['rollover_limit']))
+        if m['initial_value'] is not None:
+            keyed.append(((m['installed_on'], 1), _meter_point(m, m['initial_value'], m['installed_on'], 'Einbau'),
+                          m['id'], m['rollover_limit']))
+    for r in readings:
+        day = r['reading_date']
+        k = bisect_right(starts, day) - 1
+        if k >= 0 and (meters[k]['removed_on'] is None or day < meters[k]['removed_on']):
+            meter_id = segment = meters[k]['id']
+            limit = meters[k]['rollover_limit']
+        else:
+            meter_id, segment, limit = None, ('gap', k), None  # no meter recorded: one continuous counter
+        keyed.append(((day, 2), {**r, 'meter_id': meter_id}, segment, limit))
+    keyed.sort(key=lambda p: p[0])  # stable: readings keep their (date, id) order
+    return [(reading, segment, limit) for _, reading, segment, limit in keyed]
+
+
+def load_series(property_ids):
+    """{property_id: {meter_type: ConsumptionSeries}} over the full reading history."""
+    meters = {}
+    for m in db.session.query(
+        Meter.id, Meter.property_id, Meter.meter_type, Meter.serial_number, Meter.installed_on, Meter.removed_on,
+        Meter.initial_value, Meter.final_value, Meter.rollover_limit,
+    ).filter(Meter.property_id.in_(property_ids)).order_by(Meter.installed_on, Meter.id):
+        m = m._asdict()
+        for key in ('installed_on', 'removed_on'):
+            m[key] = m[key].isoformat() if m[key] else None
+        meters.setdefault((m['property_id'], m['meter_type']), []).append(m)
+
+    readings = serializers.meter_readings(MeterReading.property_id.in_(property_ids), order_by=[
+        MeterReading.property_id, MeterReading.meter_type, MeterReading.reading_date, MeterReading.id,
+    ])
+    result = {pid: {} for pid in property_ids}
+    for (pid, meter_type), group in groupby(readings, key=lambda r: (r['property_id'], r['meter_type'])):
+        result[pid][meter_type] = ConsumptionSeries(_points(meters.get((pid, meter_type), []), list(group)))
+    for (pid, meter_type), ms in meters.items():
+        if meter_type not in result[pid]:
+            result[pid][meter_type] = ConsumptionSeries(_points(ms, []))
+    return result
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+_generation = 0
+
+
+def property_series(property_id):
+    """Cached consumption series of all meter types of a property."""
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(property_id)
+        if hit and now - hit[0] < CACHE_TTL:
+            return hit[1]
+        generation = _generation
+    series = load_series([property_id])[property_id]
+    with _cache_lock:
+        if generation == _generation:
+            _cache[property_id] = (now, series)
+    return series
+
+
+def clear_cache():
+    global _generation
+    with _cache_lock:
+        _generation += 1
+        _cache.clear()
+
+
+on_commit(MeterReading, clear_cache)
+on_commit(Meter, clear_cache)
+on_change(MeterReading, clear_cache)
+on_change(Meter, clear_cache)
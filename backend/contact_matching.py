@@ -0,0 +1,228 @@
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from sqlalchemy import event
+from models import db, Contact, ContactKey, Expense, RecurringCost
+
+# Vendor name -> contact resolution. Every contact has a ContactKey row with its
+# normalized name (exact lookups) and a short blocking key; fuzzy matching only
+# compares names within the same block.
+
+MATCH_THRESHOLD = 0.9
+BLOCK_LENGTH = 4
+UMLAUTS = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+# Dropped from the end of a name ("GmbH & Co. KG", "e.K.", "(haftungsbeschränkt)")
+LEGAL_FORMS = {
+    'gmbh', 'mbh', 'ggmbh', 'ag', 'kg', 'kgaa', 'ohg', 'gbr', 'ug', 'haftungsbeschraenkt', 'ek', 'ekfr',
+    'ev', 'eg', 'se', 'partg', 'partgmbb', 'co', 'und', 'ltd', 'limited', 'inc', 'llc', 'bv', 'sarl',
+}
+# Dropped from the start of a name ("Firma Meier", "Die Stadtwerke")
+LEADING_WORDS = {'firma', 'fa', 'die', 'der', 'das', 'the'}
+MERGE_FIELDS = ['company', 'address', 'phone', 'email', 'website', 'tax_id']
+
+
+def normalize_name(name):
+    """Lowercase, umlauts and diacritics folded, punctuation and legal form removed."""
+    s = (name or '').lower().translate(UMLAUTS)
+    s = ''.join(ch for ch in unicodedata.normalize('NFKD', s) if not unicodedata.combining(ch))
+    tokens = re.findall(r'[a-z0-9]+', s.replace('.', ''))
+    end = len(tokens)
+    while end > 1 and tokens[end - 1] in LEGAL_FORMS:
+        end -= 1
+    start = 0
+    while start < end - 1 and tokens[start] in LEADING_WORDS:
+        start += 1
+    return ' '.join(tokens[start:end])
+
+
+def blocking_key(normalized):
+    return normalized[:BLOCK_LENGTH]
+
+
+def _similarity(a, b):
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    # Cheap upper bounds first; most candidates in a block are far apart
+    if matcher.real_quick_ratio() < MATCH_THRESHOLD or matcher.quick_ratio() < MATCH_THRESHOLD:
+        return 0.0
+    return matcher.ratio()
+
+
+def _best_match(normalized, candidates, threshold):
+    """Best (contact_id, score) among (normalized, contact_id) candidates, or None."""
+    best = None
+    for other, cid in candidates:
+        score = _similarity(normalized, other)
+        if score >= threshold and (best is None or score > best[1]):
+            best = (cid, score)
+    return best
+
+
+def resolve_contact(name, fuzzy=True, threshold=MATCH_THRESHOLD):
+    """Contact whose name matches name after normalization, else the closest within its block."""
+    normalized = normalize_name(name)
+    if not normalized:
+        return None
+    key = (
+        ContactKey.query.filter_by(normalized=normalized)
+        .order_by(ContactKey.contact_id)
+        .first()
+    )
+    if key:
+        return db.session.get(Contact, key.contact_id)
+    if not fuzzy:
+        return None
+    candidates = db.session.query(ContactKey.normalized, ContactKey.contact_id).filter(
+        ContactKey.block == blocking_key(normalized)
+    ).order_by(ContactKey.contact_id)
+    best = _best_match(normalized, candidates, threshold)
+    return db.session.get(Contact, best[0]) if best else None
+
+
+class ContactMatcher:
+    """All contact keys in memory, for resolving many vendor names in one go (imports)."""
+
+    def __init__(self, keys, threshold=MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.by_name = {}
+        self.by_block = defaultdict(list)
+        for cid, normalized, block in keys:
+            self.by_name.setdefault(normalized, cid)
+            self.by_block[block].append((normalized, cid))
+        self._cache = {}
+
+    @classmethod
+    def load(cls, threshold=MATCH_THRESHOLD):
+        keys = db.session.query(ContactKey.contact_id, ContactKey.normalized, ContactKey.block).order_by(
+            ContactKey.contact_id
+        )
+        return cls(keys, threshold)
+
+    def match(self, name, fuzzy=True):
+        """Contact id for name, or None."""
+        normalized = normalize_name(name)
+        if not normalized:
+            return None
+        if normalized in self.by_name or not fuzzy:
+            return self.by_name.get(normalized)
+        if normalized not in self._cache:
+            best = _best_match(normalized, self.by_block.get(blocking_key(normalized), ()), self.threshold)
+            self._cache[normalized] = best[0] if best else None
+        return self._cache[normalized]
+
+
+def find_duplicates(threshold=MATCH_THRESHOLD):
+    """Groups of contact ids (ascending) whose names match each other."""
+    keys = db.session.query(ContactKey.contact_id, ContactKey.normalized, ContactKey.block).all()
+    parent = {}
+
+    def root(cid):
+        while parent[cid] != cid:
+            parent[cid] = parent[parent[cid]]
+            cid = parent[cid]
+        return cid
+
+    def union(a, b):
+        ra, rb = root(a), root(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    by_name = defaultdict(list)
+    for cid, normalized, _ in keys:
+        parent[cid] = cid
+        if normalized:
+            by_name[normalized].append(cid)
+    for ids in by_name.values():
+        for cid in ids[1:]:
+            union(ids[0], cid)
+    # Fuzzy pass compares one representative per distinct name within each block
+    blocks = defaultdict(list)
+    for normalized, ids in by_name.items():
+        blocks[blocking_key(normalized)].append((normalized, ids[0]))
+    for names in blocks.values():
+        for i, (a, cid_a) in enumerate(names):
+            for b, cid_b in names[i + 1:]:
+                if _similarity(a, b) >= threshold:
+                    union(cid_a, cid_b)
+
+    groups = defaultdict(list)
+    for cid in parent:
+        groups[root(cid)].append(cid)
+    return sorted(sorted(ids) for ids in groups.values() if len(ids) > 1)
+
+
+def merge_contacts(keep, duplicates):
+    """Repoint expenses and recurring costs to keep, copy over missing fields, delete the duplicates."""
+    from routes.contacts import UPLOAD_DIR
+    from thumbnails import remove_derivatives
+    ids = [d.id for d in duplicates if d.id != keep.id]
+    if not ids:
+        return keep
+    Expense.query.filter(Expense.contact_id.in_(ids)).update({'contact_id': keep.id}, synchronize_session=False)
+    RecurringCost.query.filter(RecurringCost.contact_id.in_(ids)).update(
+        {'contact_id': keep.id}, synchronize_session=False
+    )
+    orphaned_photos = []
+    for d in duplicates:
+        if d.id == keep.id:
+            continue
+        for field in MERGE_FIELDS:
+            if not getattr(keep, field) and getattr(d, field):
+                setattr(keep, field, getattr(d, field))
+        if d.notes and d.notes not in (keep.notes or ''):
+            keep.notes = f'{keep.notes}\n{d.notes}' if keep.notes else d.notes
+        if d.photo_filename:
+            if keep.photo_filename:
+                orphaned_photos.append(d.photo_filename)
+            else:
+                keep.photo_filename = d.photo_filename
+        db.session.delete(d)
+    db.session.commit()
+    for filename in orphaned_photos:
+        filepath = os.path.join(UPLOAD_DIR, filename)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        remove_derivatives('contacts', filename)
+    return keep
+
+
+def init_contact_keys():
+    """Add keys for contacts inserted without the ORM (bulk inserts) and drop stale ones."""
+    missing = (
+        db.session.query(Contact.id, Contact.name)
+        .outerjoin(ContactKey, ContactKey.contact_id == Contact.id)
+        .filter(ContactKey.contact_id.is_(None))
+        .all()
+    )
+    if missing:
+        db.session.execute(db.insert(ContactKey), [_key_row(cid, name) for cid, name in missing])
+    ContactKey.query.filter(~ContactKey.contact_id.in_(db.session.query(Contact.id))).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+
+
+def _key_row(contact_id, name):
+    normalized = normalize_name(name)
+    return {'contact_id': contact_id, 'normalized': normalized, 'block': blocking_key(normalized)}
+
+
+@event.listens_for(Contact, 'after_insert')
+def _contact_inserted(mapper, connection, target):
+    connection.execute(ContactKey.__table__.insert().values(**_key_row(target.id, target.name)))
+
+
+@event.listens_for(Contact, 'after_update')
+def _contact_updated(mapper, connection, target):
+    if not db.inspect(target).attrs.name.history.has_changes():
+        return
+    table = ContactKey.__table__
+    connection.execute(table.delete().where(table.c.contact_id == target.id))
+    connection.execute(table.insert().values(**_key_row(target.id, target.name)))
+
+
+@event.listens_for(Contact, 'before_delete')
+def _contact_deleted(mapper, connection, target):
+    table = ContactKey.__table__
+    connection.execute(table.delete().where(table.c.contact_id == target.id))
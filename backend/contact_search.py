@@ -0,0 +1,161 @@
+import re
+import unicodedata
+from models import db, Contact
+
+# Contact search backed by an SQLite FTS5 shadow table kept in sync by triggers.
+# Other databases (or SQLite builds without FTS5) fall back to ILIKE.
+
+DEFAULT_LIMIT = 50
+TYPEAHEAD_LIMIT = 10
+# Only this many matches are scored; bounds the cost of very broad prefixes like "sc"
+RANK_CANDIDATES = 1000
+# bm25 column weights: name, company, email, phone
+RANK_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS contact_fts USING fts5(
+        name, company, email, phone,
+        content='contact', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS contact_fts_vocab USING fts5vocab(contact_fts, 'row')",
+    """CREATE TRIGGER IF NOT EXISTS contact_fts_ai AFTER INSERT ON contact BEGIN
+        INSERT INTO contact_fts(rowid, name, company, email, phone)
+        VALUES (new.id, new.name, new.company, new.email, new.phone);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS contact_fts_ad AFTER DELETE ON contact BEGIN
+        INSERT INTO contact_fts(contact_fts, rowid, name, company, email, phone)
+        VALUES ('delete', old.id, old.name, old.company, old.email, old.phone);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS contact_fts_au AFTER UPDATE ON contact BEGIN
+        INSERT INTO contact_fts(contact_fts, rowid, name, company, email, phone)
+        VALUES ('delete', old.id, old.name, old.company, old.email, old.phone);
+        INSERT INTO contact_fts(rowid, name, company, email, phone)
+        VALUES (new.id, new.name, new.company, new.email, new.phone);
+    END""",
+]
+
+_fts_enabled = None
+
+
+def init_contact_search():
+    """Create the FTS table and triggers (idempotent); indexes existing contacts on first run."""
+    global _fts_enabled
+    if db.engine.dialect.name != 'sqlite':
+        _fts_enabled = False
+        return
+    with db.engine.begin() as conn:
+        existed = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='contact_fts'"
+        ).first() is not None
+        try:
+            for stmt in FTS_SCHEMA:
+                conn.exec_driver_sql(stmt)
+        except Exception:
+            # SQLite compiled without FTS5
+            _fts_enabled = False
+            return
+        if not existed:
+            conn.exec_driver_sql("INSERT INTO contact_fts(contact_fts) VALUES ('rebuild')")
+    _fts_enabled = True
+
+
+def rebuild_contact_search():
+    if _fts_enabled:
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO contact_fts(contact_fts) VALUES ('rebuild')")
+
+
+def fold(token):
+    # Same folding as the unicode61 tokenizer with remove_diacritics
+    decomposed = unicodedata.normalize('NFKD', token.lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def query_tokens(q):
+    return [fold(t) for t in TOKEN_RE.findall(q)]
+
+
+def prefix_match(tokens):
+    # Every token must match as a word prefix
+    return ' AND '.join(f'"{t}"*' for t in tokens)
+
+
+def _within_one_edit(a, b):
+    """True if a and b differ by at most one insertion, deletion, substitution or transposition."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+def _corrections(conn, token):
+    """Vocabulary terms within one edit of token, looked up among terms sharing its first letter."""
+    if len(token) < 4:
+        return []
+    rows = conn.exec_driver_sql(
+        'SELECT term FROM contact_fts_vocab WHERE term >= ? AND term < ?',
+        (token[0], token[0] + '\U0010ffff'),
+    )
+    return [term for (term,) in rows if term != token and _within_one_edit(token, term)]
+
+
+def _fts_ids(tokens, limit, fuzzy):
+    weights = ', '.join(str(w) for w in RANK_WEIGHTS)
+    sql = (
+        f'SELECT rowid FROM ('
+        f'  SELECT rowid, bm25(contact_fts, {weights}) AS score FROM contact_fts'
+        f'  WHERE contact_fts MATCH ? LIMIT {RANK_CANDIDATES}'
+        f') ORDER BY score LIMIT ?'
+    )
+    with db.engine.connect() as conn:
+        ids = [r[0] for r in conn.exec_driver_sql(sql, (prefix_match(tokens), limit))]
+        if ids or not fuzzy:
+            return ids
+        # Typo tolerance: retry with vocabulary terms one edit away from each token
+        alternatives = []
+        for t in tokens:
+            options = [f'"{t}"*'] + [f'"{c}"' for c in _corrections(conn, t)]
+            alternatives.append('(' + ' OR '.join(options) + ')')
+        return [r[0] for r in conn.exec_driver_sql(sql, (' AND '.join(alternatives), limit))]
+
+
+def search_contacts(q, limit=DEFAULT_LIMIT, fuzzy=True):
+    """Ranked contacts matching q (prefix match per word, typo tolerant)."""
+    tokens = query_tokens(q)
+    if not tokens:
+        return []
+    if _fts_enabled:
+        ids = _fts_ids(tokens, limit, fuzzy)
+        if not ids:
+            return []
+        by_id = {c.id: c for c in Contact.query.filter(Contact.id.in_(ids)).all()}
+        return [by_id[i] for i in ids if i in by_id]
+
+    like = f'%{q}%'
+    return (
+        Contact.query.filter(
+            db.or_(
+                Contact.name.ilike(like),
+                Contact.company.ilike(like),
+                Contact.email.ilike(like),
+                Contact.phone.ilike(like),
+            )
+        )
+        .order_by(Contact.name)
+        .limit(limit)
+        .all()
+    )
@@ -0,0 +1,47 @@
+import os
+import multiprocessing
+import tempfile
+
+# Usage: gunicorn -c gunicorn.conf.py wsgi:app
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Each open live-update stream (SSE) holds one thread
+threads = int(os.environ.get('WEB_THREADS', '16'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Workers write metric snapshots here so /metrics can add them up (see instrumentation.py)
+os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='hausverwaltung-metrics-'))
+
+# create_app() runs once in the master (create_all, admin seed, upload dirs)
+preload_app = True
+
+# Recycle workers after N requests; jitter avoids all workers restarting at once
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', '100'))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '30'))
+# AI scans can take a while
+timeout = int(os.environ.get('WEB_TIMEOUT', '120'))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', '5'))
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # Connections inherited from the master must not be shared between processes
+    from wsgi import app
+    from models import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    from instrumentation import dump
+    dump()
+
+
+def child_exit(server, worker):
+    # Keep the counters of recycled workers, folded into one file
+    from instrumentation import archive_worker
+    archive_worker(worker.pid)
@@ -0,0 +1,331 @@
+import csv
+import io
+import json
+import time
+from datetime import date, datetime
+from models import db, MeterReading, Expense, RecurringCost
+from contact_matching import ContactMatcher
+from schedules import INTERVALS
+from meter_types import meter_type_keys
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+# Accepted column names (incl. the headers of our own CSV export) -> field
+METER_COLUMNS = {
+    'property_id': 'property_id',
+    'meter_type': 'meter_type', 'zählertyp': 'meter_type', 'type': 'meter_type',
+    'reading_value': 'reading_value', 'wert': 'reading_value', 'value': 'reading_value',
+    'reading_date': 'reading_date', 'datum': 'reading_date', 'date': 'reading_date', 'timestamp': 'reading_date',
+    'notes': 'notes', 'notizen': 'notes',
+}
+EXPENSE_COLUMNS = {
+    'property_id': 'property_id',
+    'contact_id': 'contact_id',
+    'vendor': 'vendor', 'rechnungsersteller': 'vendor',
+    'invoice_date': 'invoice_date', 'datum': 'invoice_date',
+    'invoice_number': 'invoice_number', 'rechnungsnr.': 'invoice_number', 'rechnungsnummer': 'invoice_number',
+    'net_amount': 'net_amount', 'netto': 'net_amount',
+    'vat_rate': 'vat_rate', 'ust %': 'vat_rate',
+    'description': 'description', 'beschreibung': 'description',
+    'category': 'category', 'kategorie': 'category',
+}
+RECURRING_COLUMNS = {
+    'property_id': 'property_id',
+    'contact_id': 'contact_id',
+    'description': 'description', 'beschreibung': 'description',
+    'vendor': 'vendor', 'anbieter': 'vendor',
+    'monthly_amount': 'monthly_amount', 'monatlich': 'monthly_amount',
+    'vat_rate': 'vat_rate', 'ust %': 'vat_rate',
+    'start_date': 'start_date', 'start': 'start_date',
+    'end_date': 'end_date', 'ende': 'end_date',
+    'category': 'category', 'kategorie': 'category',
+    'billing_interval': 'billing_interval', 'intervall': 'billing_interval',
+}
+
+
+def detect_format(filename='', content_type='', explicit=None):
+    if explicit:
+        return explicit.lower()
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in (content_type or ''):
+        return 'ndjson'
+    if name.endswith('.json') or 'json' in (content_type or ''):
+        return 'json'
+    return 'csv'
+
+
+def iter_records(stream, fmt):
+    """Yield dicts from a binary stream without reading it into memory (JSON arrays excepted)."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'ndjson':
+        for line in text:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None  # reported as an invalid row
+    elif fmt == 'json':
+        records = json.load(text)
+        if not isinstance(records, list):
+            raise ValueError('JSON-Array erwartet')
+        yield from records
+    else:
+        first = text.readline()
+        delimiter = ';' if first.count(';') > first.count(',') else ','
+        header = next(csv.reader([first], delimiter=delimiter))
+        yield from csv.DictReader(text, fieldnames=header, delimiter=delimiter)
+
+
+def normalize_record(record, columns):
+    if not isinstance(record, dict):
+        raise ValueError('Ungültige Zeile')
+    out = {}
+    for key, value in record.items():
+        if key is None:
+            continue
+        field = columns.get(key.strip().lower())
+        if field:
+            out[field] = value.strip() if isinstance(value, str) else value
+    return out
+
+
+def parse_date(value):
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    if '.' in value[:6]:
+        # German notation, e.g. 31.12.2024
+        return datetime.strptime(value[:10], '%d.%m.%Y').date()
+    # ISO dates and timestamps from smart-meter exports
+    return date.fromisoformat(value[:10])
+
+
+def parse_number(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip().replace(' ', '')
+    if ',' in value:
+        # German notation, e.g. 1.234,5
+        value = value.replace('.', '').replace(',', '.')
+    return float(value)
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors = []
+        self.aborted = False
+        self.started = time.perf_counter()
+
+    def error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'error': message})
+
+    def to_dict(self):
+        seconds = time.perf_counter() - self.started
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'errors': self.error_count,
+            'error_details': self.errors,
+            'aborted': self.aborted,
+            'seconds': round(seconds, 3),
+            'rows_per_sec': round(self.rows / seconds, 1) if seconds > 0 else None,
+        }
+
+
+def _read(records, report):
+    """Yield (row_no, record); a file that cannot be decoded or parsed ends the import.
+
+    Decoding and parsing happen lazily in iter_records, so a wrong encoding or a truncated
+    file only fails mid-import, after earlier batches are committed. Those rows stay, the
+    rest is reported as one error.
+    """
+    rows = iter(records)
+    row_no = 0
+    while True:
+        try:
+            record = next(rows)
+        except StopIteration:
+            return
+        except (ValueError, csv.Error) as e:  # incl. UnicodeDecodeError and JSONDecodeError
+            report.error(row_no + 1, f'Datei nicht lesbar: {e}')
+            report.aborted = True
+            return
+        row_no += 1
+        yield row_no, record
+
+
+def _flush(model, batch, report):
+    if batch:
+        db.session.execute(db.insert(model), batch)
+        db.session.commit()
+        report.inserted += len(batch)
+        batch.clear()
+
+
+def import_meter_readings(records, property_id=None, allowed_property_ids=None, batch_size=BATCH_SIZE):
+    """Insert meter readings in batched transactions, skipping (property, type, date) duplicates.
+
+    property_id is used for rows without their own property_id; allowed_property_ids
+    (None = all) restricts which properties rows may target.
+    """
+    valid_types = meter_type_keys()
+    report = ImportReport()
+    existing = {}  # property_id -> set of (meter_type, reading_date)
+    batch = []
+    for row_no, record in _read(records, report):
+        report.rows += 1
+        try:
+            r = normalize_record(record, METER_COLUMNS)
+            pid = int(r.get('property_id') or property_id or 0)
+            if not pid:
+                raise ValueError('property_id fehlt')
+            if allowed_property_ids is not None and pid not in allowed_property_ids:
+                raise ValueError(f'Kein Zugriff auf Immobilie {pid}')
+            meter_type = r.get('meter_type')
+            if meter_type not in valid_types:
+                raise ValueError(f'Ungültiger Zählertyp: {meter_type}')
+            value = parse_number(r['reading_value'])
+            reading_date = parse_date(r['reading_date'])
+        except (KeyError, ValueError, TypeError) as e:
+            report.error(row_no, str(e) if not isinstance(e, KeyError) else f'Feld fehlt: {e.args[0]}')
+            continue
+
+        keys = existing.get(pid)
+        if keys is None:
+            keys = existing[pid] = {
+                tuple(k) for k in
+                db.session.query(MeterReading.meter_type, MeterReading.reading_date)
+                .filter(MeterReading.property_id == pid)
+            }
+        key = (meter_type, reading_date)
+        if key in keys:
+            report.duplicates += 1
+            continue
+        keys.add(key)
+        batch.append({
+            'property_id': pid,
+            'meter_type': meter_type,
+            'reading_value': value,
+            'reading_date': reading_date,
+            'notes': r.get('notes') or '',
+        })
+        if len(batch) >= batch_size:
+            _flush(MeterReading, batch, report)
+    _flush(MeterReading, batch, report)
+    return report
+
+
+def _resolve_property(r, property_id, allowed_property_ids):
+    pid = int(r.get('property_id') or property_id or 0)
+    if not pid:
+        raise ValueError('property_id fehlt')
+    if allowed_property_ids is not None and pid not in allowed_property_ids:
+        raise ValueError(f'Kein Zugriff auf Immobilie {pid}')
+    return pid
+
+
+def _resolve_contacts(rows, matcher):
+    for r in rows:
+        if not r['contact_id']:
+            r['contact_id'] = matcher.match(r['vendor'])
+
+
+def compute_expense_vat(rows):
+    """Fill vat_amount/gross_amount for a whole batch, column by column (same rounding as create_expense)."""
+    nets = [r['net_amount'] for r in rows]
+    vats = [round(n * v / 100, 2) for n, v in zip(nets, [r['vat_rate'] for r in rows])]
+    grosses = [round(n + v, 2) for n, v in zip(nets, vats)]
+    for r, vat, gross in zip(rows, vats, grosses):
+        r['vat_amount'] = vat
+        r['gross_amount'] = gross
+
+
+def compute_recurring_net(rows):
+    """Fill net_amount/gross_amount for a whole batch (same rounding as create_recurring)."""
+    monthly = [r['monthly_amount'] for r in rows]
+    nets = [round(m / (1 + v / 100), 2) for m, v in zip(monthly, [r['vat_rate'] for r in rows])]
+    for r, net, gross in zip(rows, nets, monthly):
+        r['net_amount'] = net
+        r['gross_amount'] = gross
+
+
+def _parse_expense(r, pid):
+    if not r.get('vendor'):
+        raise ValueError('Feld fehlt: vendor')
+    return {
+        'property_id': pid,
+        'contact_id': int(r['contact_id']) if r.get('contact_id') else None,
+        'vendor': r['vendor'],
+        'invoice_date': parse_date(r['invoice_date']),
+        'invoice_number': r.get('invoice_number') or '',
+        'net_amount': parse_number(r['net_amount']),
+        'vat_rate': parse_number(r['vat_rate']) if r.get('vat_rate') not in (None, '') else 19.0,
+        'description': r.get('description') or '',
+        'category': r.get('category') or '',
+    }
+
+
+def _parse_recurring(r, pid):
+    if not r.get('description'):
+        raise ValueError('Feld fehlt: description')
+    interval = (r.get('billing_interval') or 'monthly').strip().lower()
+    if interval not in INTERVALS:
+        raise ValueError(f'Ungültiges Intervall: {interval}')
+    return {
+        'property_id': pid,
+        'contact_id': int(r['contact_id']) if r.get('contact_id') else None,
+        'description': r['description'],
+        'vendor': r.get('vendor') or '',
+        'monthly_amount': parse_number(r['monthly_amount']),
+        'vat_rate': parse_number(r['vat_rate']) if r.get('vat_rate') not in (None, '') else 19.0,
+        'start_date': parse_date(r['start_date']),
+        'end_date': parse_date(r['end_date']) if r.get('end_date') else None,
+        'category': r.get('category') or '',
+        'billing_interval': interval,
+    }
+
+
+def _import_rows(model, columns, parse_row, compute, records, property_id, allowed_property_ids, batch_size):
+    report = ImportReport()
+    matcher = ContactMatcher.load()
+    batch = []
+
+    def flush():
+        if batch:
+            compute(batch)
+            _resolve_contacts(batch, matcher)
+            _flush(model, batch, report)
+
+    for row_no, record in _read(records, report):
+        report.rows += 1
+        try:
+            r = normalize_record(record, columns)
+            batch.append(parse_row(r, _resolve_property(r, property_id, allowed_property_ids)))
+        except (KeyError, ValueError, TypeError) as e:
+            report.error(row_no, str(e) if not isinstance(e, KeyError) else f'Feld fehlt: {e.args[0]}')
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return report
+
+
+def import_expenses(records, property_id=None, allowed_property_ids=None, batch_size=BATCH_SIZE):
+    """Insert expenses in batched transactions; VAT columns are computed per batch."""
+    return _import_rows(Expense, EXPENSE_COLUMNS, _parse_expense, compute_expense_vat,
+                        records, property_id, allowed_property_ids, batch_size)
+
+
+def import_recurring_costs(records, property_id=None, allowed_property_ids=None, batch_size=BATCH_SIZE):
+    """Insert recurring costs in batched transactions; net amounts are computed per batch."""
+    return _import_rows(RecurringCost, RECURRING_COLUMNS, _parse_recurring, compute_recurring_net,
+                        records, property_id, allowed_property_ids, batch_size)
@@ -0,0 +1,310 @@
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Request, SQL and AI-call metrics in Prometheus text format, a slow-query log and an
+# opt-in profiler for single requests (admin + 'X-Profile: 1' header).
+#
+# Every gunicorn worker keeps its own registry. With METRICS_DIR set (gunicorn.conf.py
+# does this) workers write snapshots there every few seconds and /metrics adds them
+# up, so a scrape sees the whole server no matter which worker answers it.
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+DUMP_INTERVAL = 5
+PROFILE_KEEP = 50
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+AI_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+_lock = threading.Lock()
+_metrics = {}
+
+
+class Metric:
+    def __init__(self, name, help_text, labels, buckets=None):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets  # None: counter
+        self.series = {}  # label values -> [bucket counts..., sum] or [value]
+        _metrics[name] = self
+
+    def _new(self):
+        return [0] * (len(self.buckets) + 1) + [0.0] if self.buckets else [0.0]
+
+    def observe(self, labels, value):
+        with _lock:
+            s = self.series.get(labels)
+            if s is None:
+                s = self.series[labels] = self._new()
+            if self.buckets:
+                s[bisect_left(self.buckets, value)] += 1
+            s[-1] += value
+
+    def inc(self, labels=(), value=1):
+        self.observe(labels, value)
+
+
+REQUEST_SECONDS = Metric('hv_http_request_duration_seconds', 'HTTP request latency',
+                         ('method', 'endpoint', 'status'), LATENCY_BUCKETS)
+REQUEST_QUERIES = Metric('hv_http_request_db_queries', 'SQL statements per HTTP request',
+                         ('endpoint',), QUERY_BUCKETS)
+REQUEST_DB_SECONDS = Metric('hv_http_request_db_seconds', 'SQL time per HTTP request',
+                            ('endpoint',), LATENCY_BUCKETS)
+DB_STATEMENTS = Metric('hv_db_statements_total', 'SQL statements executed', ())
+DB_SECONDS = Metric('hv_db_statement_seconds_total', 'Time spent in SQL statements', ())
+SLOW_QUERIES = Metric('hv_db_slow_queries_total', 'SQL statements slower than SLOW_QUERY_MS', ())
+AI_SECONDS = Metric('hv_ai_request_duration_seconds', 'AI scan latency', ('operation', 'outcome'), AI_BUCKETS)
+
+
+def snapshot():
+    with _lock:
+        return {m.name: {json.dumps(k): list(v) for k, v in m.series.items()} for m in _metrics.values()}
+
+
+def _merge(total, snap):
+    for name, series in snap.items():
+        target = total.setdefault(name, {})
+        for key, values in series.items():
+            if key in target:
+                target[key] = [a + b for a, b in zip(target[key], values)]
+            else:
+                target[key] = list(values)
+    return total
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write(path, data):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def dump():
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        _write(os.path.join(metrics_dir, f'{os.getpid()}.json'), snapshot())
+
+
+def archive_worker(pid):
+    """Fold the snapshot of an exited worker into archive.json (called by the gunicorn master)."""
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if not metrics_dir:
+        return
+    path = os.path.join(metrics_dir, f'{pid}.json')
+    if not os.path.exists(path):
+        return
+    archive = os.path.join(metrics_dir, 'archive.json')
+    _write(archive, _merge(_read(archive), _read(path)))
+    os.remove(path)
+
+
+def collect():
+    """Metrics of this process plus those of the other workers (and exited ones)."""
+    metrics_dir = os.environ.get('METRICS_DIR')
+    total = snapshot()
+    if not metrics_dir:
+        return total
+    own = f'{os.getpid()}.json'
+    for name in os.listdir(metrics_dir):
+        if name.endswith('.json') and name != own:
+            _merge(total, _read(os.path.join(metrics_dir, name)))
+    return total
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render(data=None):
+    data = collect() if data is None else data
+    lines = []
+    for m in _metrics.values():
+        kind = 'histogram' if m.buckets else 'counter'
+        lines.append(f'# HELP {m.name} {m.help}')
+        lines.append(f'# TYPE {m.name} {kind}')
+        for key, values in sorted(data.get(m.name, {}).items()):
+            pairs = [f'{label}="{_escape(v)}"' for label, v in zip(m.labels, json.loads(key))]
+            labels = '{' + ','.join(pairs) + '}' if pairs else ''
+            if not m.buckets:
+                lines.append(f'{m.name}{labels} {values[0]:g}')
+                continue
+            cumulative = 0
+            for bound, count in zip((*m.buckets, '+Inf'), values):
+                cumulative += count
+                le = bound if bound == '+Inf' else f'{bound:g}'
+                bucket_labels = ','.join(pairs + [f'le="{le}"'])
+                lines.append(f'{m.name}_bucket{{{bucket_labels}}} {cumulative}')
+            lines.append(f'{m.name}_sum{labels} {values[-1]:.6f}')
+            lines.append(f'{m.name}_count{labels} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+# SQL timing. Statements are attributed to the current request via flask.g.
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    DB_STATEMENTS.inc()
+    DB_SECONDS.inc(value=elapsed)
+    if has_request_context():
+        stats = g.get('db_stats')
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc()
+        if executemany and isinstance(parameters, (list, tuple)):
+            params = f'{len(parameters)} rows, first: {parameters[:3]!r}'
+        else:
+            params = repr(parameters)
+        where = f' [{request.method} {request.path}]' if has_request_context() else ''
+        logger.warning('Slow query (%.0f ms)%s: %s | params: %s',
+                       elapsed * 1000, where, ' '.join(statement.split()), params[:1000])
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    starts = context.connection.info.get('query_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def timed_ai(func):
+    """Record the latency of an ai_service call."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = func(*args, **kwargs)
+            outcome = 'ok'
+            return result
+        finally:
+            AI_SECONDS.observe((func.__name__, outcome), time.perf_counter() - start)
+    return wrapper
+
+
+def profile_dir():
+    return os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'hausverwaltung-profiles'))
+
+
+def _start_profile():
+    from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+    from models import User
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        return
+    user = User.query.get(int(identity)) if identity else None
+    if not user or user.role != 'admin':
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return  # another profiler is active in this process
+    g.profiler = profiler
+
+
+def _save_profile(profiler):
+    profiler.disable()
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    profiler.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+    files = sorted((os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.prof')),
+                   key=os.path.getmtime)
+    for path in files[:-PROFILE_KEEP]:
+        os.remove(path)
+    return profile_id
+
+
+def profile_summary(profile_id, limit=60):
+    path = os.path.join(profile_dir(), f'{profile_id}.prof')
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+class Instrumentation:
+    def __init__(self):
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _start_dumper(self):
+        # Started on the first request so it runs in the worker, not the preloading master
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._dump_loop, name='metrics-dump', daemon=True)
+                self.thread.start()
+
+    def _dump_loop(self):
+        while True:
+            time.sleep(DUMP_INTERVAL)
+            try:
+                dump()
+            except OSError:
+                logger.exception('writing metrics snapshot failed')
+
+    def _before_request(self):
+        if os.environ.get('METRICS_DIR') and self.thread is None:
+            self._start_dumper()
+        g.request_start = time.perf_counter()
+        g.db_stats = [0, 0.0]
+        if request.headers.get('X-Profile'):
+            _start_profile()
+
+    def _after_request(self, response):
+        start = g.get('request_start')
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        queries, db_seconds = g.db_stats
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe((request.method, endpoint, str(response.status_code)), elapsed)
+        REQUEST_QUERIES.observe((endpoint,), queries)
+        REQUEST_DB_SECONDS.observe((endpoint,), db_seconds)
+        response.headers['Server-Timing'] = (
+            f'app;dur={elapsed * 1000:.1f}, db;dur={db_seconds * 1000:.1f};desc="{queries} queries"'
+        )
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            response.headers['X-Profile-Id'] = _save_profile(profiler)
+        return response
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,285 @@
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import (db, ChangeEvent, Property, MeterReading, Meter, Tariff, Expense, RecurringCost, Contact,
+                    FileAttachment)
+
+# Change feed. Every commit that touches a tracked model writes ChangeEvent rows in
+# the same transaction. Each process runs one poller thread that tails the table
+# and fans events out to its SSE subscribers, so writes from any worker reach all
+# clients. Ordering by id relies on SQLite serializing write transactions.
+# The same poller invalidates in-process caches (on_change): write_hooks only runs
+# in the committing worker, the feed sees the writes of every worker.
+
+TRACKED = {
+    Property: 'property',
+    MeterReading: 'meter_reading',
+    Meter: 'meter',
+    Tariff: 'tariff',
+    Expense: 'expense',
+    RecurringCost: 'recurring_cost',
+    Contact: 'contact',
+    FileAttachment: 'attachment',
+}
+POLL_INTERVAL = 1.0
+KEEPALIVE = 15
+QUEUE_SIZE = 1000
+REPLAY_LIMIT = 1000
+RETENTION = timedelta(days=30)  # also the horizon for delta sync (sync.py)
+PRUNE_INTERVAL = 3600
+
+_listeners = defaultdict(list)  # entity type -> callbacks
+
+
+def on_change(model, callback):
+    """Call callback() in this process after changes to rows of model committed by any worker."""
+    _listeners[TRACKED[model]].append(callback)
+
+
+def _property_id(obj):
+    if isinstance(obj, Property):
+        return obj.id
+    if isinstance(obj, FileAttachment):
+        parent = Expense if obj.entity_type == 'expense' else RecurringCost
+        return db.session.query(parent.property_id).filter(parent.id == obj.entity_id).scalar()
+    # Contacts are shared between all properties
+    return getattr(obj, 'property_id', None)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect(session, flush_context):
+    pending = session.info.setdefault('change_events', {})
+    for action, objs in (('create', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objs:
+            entity_type = TRACKED.get(type(obj))
+            if not entity_type:
+                continue
+            if action == 'update' and not session.is_modified(obj, include_collections=False):
+                continue
+            key = (entity_type, obj.id)
+            if action == 'update' and key in pending:
+                continue  # created (or already updated) in this transaction
+            # Deleted rows cannot be looked up at commit time, so resolve the property now
+            pending[key] = (action, obj, _property_id(obj) if action == 'delete' else None)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_statement(orm_execute_state):
+    # Bulk insert()/update()/delete() (imports, merges): no objects, tell clients to reload
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    entity_type = TRACKED.get(mapper.class_) if mapper is not None else None
+    if not entity_type:
+        return
+    params = orm_execute_state.parameters
+    property_ids = None
+    if orm_execute_state.is_insert and params:
+        rows = params if isinstance(params, list) else [params]
+        property_ids = {r.get('property_id') for r in rows}
+    reloads = orm_execute_state.session.info.setdefault('change_reloads', set())
+    for pid in property_ids or [None]:
+        reloads.add((entity_type, pid))
+
+
+@event.listens_for(Session, 'before_commit')
+def _write_events(session):
+    session.flush()
+    pending = session.info.pop('change_events', {})
+    reloads = session.info.pop('change_reloads', set())
+    if not pending and not reloads:
+        return
+    now = datetime.utcnow()
+    rows = []
+    for (entity_type, entity_id), (action, obj, property_id) in pending.items():
+        if action == 'delete':
+            data = None
+        else:
+            property_id = _property_id(obj)
+            data = json.dumps(obj.to_dict(), default=str)
+        rows.append({'entity_type': entity_type, 'entity_id': entity_id, 'property_id': property_id,
+                     'action': action, 'data': data, 'created_at': now})
+    for entity_type, property_id in sorted(reloads, key=lambda r: (r[0], r[1] or 0)):
+        rows.append({'entity_type': entity_type, 'entity_id': None, 'property_id': property_id,
+                     'action': 'reload', 'data': None, 'created_at': now})
+    session.execute(ChangeEvent.__table__.insert(), rows)
+    session.info['change_events_written'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _committed(session):
+    if session.info.pop('change_events_written', False):
+        feed.wake.set()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _rolled_back(session):
+    session.info.pop('change_events', None)
+    session.info.pop('change_reloads', None)
+    session.info.pop('change_events_written', None)
+
+
+def _event_dict(row):
+    return {
+        'id': row.id, 'entity_type': row.entity_type, 'entity_id': row.entity_id,
+        'property_id': row.property_id, 'action': row.action,
+        'data': json.loads(row.data) if row.data else None,
+    }
+
+
+def format_sse(ev):
+    return f'id: {ev["id"]}\nevent: change\ndata: {json.dumps(ev, separators=(",", ":"))}\n\n'
+
+
+class Subscriber:
+    def __init__(self, property_ids):
+        # property_ids=None: all properties (admin)
+        self.property_ids = set(property_ids) if property_ids is not None else None
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.overflow = False
+        self.last_id = 0
+
+    def visible(self, ev):
+        return ev['property_id'] is None or self.property_ids is None or ev['property_id'] in self.property_ids
+
+    def offer(self, ev):
+        if not self.visible(ev):
+            return
+        try:
+            self.queue.put_nowait(ev)
+        except queue.Full:
+            self.overflow = True
+
+    def stream(self, replay=()):
+        """SSE frames: replayed events, then live events and keepalive comments."""
+        yield 'retry: 3000\n\n'
+        for ev in replay:
+            self.last_id = ev['id']
+            yield format_sse(ev)
+        while True:
+            try:
+                ev = self.queue.get(timeout=KEEPALIVE)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            if self.overflow:
+                # Client is too slow; drop the backlog and have it reload everything
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.overflow = False
+                yield 'event: resync\ndata: {}\n\n'
+                continue
+            if ev['id'] <= self.last_id:
+                continue  # already sent during replay
+            self.last_id = ev['id']
+            yield format_sse(ev)
+
+
+class ChangeFeed:
+    """Per-process poller that fans ChangeEvent rows out to SSE subscribers."""
+
+    def __init__(self):
+        self.app = None
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.last_id = None  # highest event id handed to subscribers
+
+    def init_app(self, app):
+        self.app = app
+        app.before_request(self._before_request)
+
+    def _before_request(self):
+        # Started lazily so it runs in the gunicorn worker, not the preloading master
+        if _listeners and (self.thread is None or not self.thread.is_alive()):
+            with self.lock:
+                self._start()
+
+    def _start(self):
+        if self.last_id is None:
+            # Poller was idle: start from the current end so nothing committed from now on is missed
+            self.last_id = db.session.query(db.func.max(ChangeEvent.id)).scalar() or 0
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+            self.thread.start()
+
+    def subscribe(self, property_ids):
+        sub = Subscriber(property_ids)
+        with self.lock:
+            self._start()
+            self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            self.subscribers.discard(sub)
+
+    def publish(self, events):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for ev in events:
+            for sub in subscribers:
+                sub.offer(ev)
+
+    def _run(self):
+        last_prune = 0
+        while True:
+            self.wake.wait(POLL_INTERVAL)
+            self.wake.clear()
+            with self.lock:
+                if not self.subscribers and not _listeners:
+                    self.last_id = None  # idle; new subscribers catch up through replay_since()
+                    continue
+                last_id = self.last_id
+            try:
+                with self.app.app_context():
+                    rows = (
+                        ChangeEvent.query.filter(ChangeEvent.id > last_id)
+                        .order_by(ChangeEvent.id).limit(REPLAY_LIMIT).all()
+                    )
+                    if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                        last_prune = time.monotonic()
+                        # Keep the newest row: SQLite would reuse ids of an emptied table
+                        newest = db.session.query(db.func.max(ChangeEvent.id)).scalar() or 0
+                        ChangeEvent.query.filter(
+                            ChangeEvent.created_at < datetime.utcnow() - RETENTION, ChangeEvent.id < newest,
+                        ).delete(synchronize_session=False)
+                        db.session.commit()
+                    events = [_event_dict(r) for r in rows]
+                    db.session.remove()
+            except Exception:
+                self.app.logger.exception('change feed poll failed')
+                time.sleep(POLL_INTERVAL)
+                continue
+            if events:
+                with self.lock:
+                    self.last_id = events[-1]['id']
+                self.publish(events)
+                for entity_type in {ev['entity_type'] for ev in events}:
+                    for callback in _listeners.get(entity_type, ()):
+                        callback()
+                if len(events) == REPLAY_LIMIT:
+                    self.wake.set()  # more rows waiting
+
+
+feed = ChangeFeed()
+
+
+def replay_since(last_id, property_ids):
+    """Events after last_id visible for property_ids, or None if they are no longer complete."""
+    oldest = db.session.query(db.func.min(ChangeEvent.id)).scalar()
+    if oldest is not None and last_id < oldest - 1:
+        return None  # pruned
+    query = ChangeEvent.query.filter(ChangeEvent.id > last_id)
+    if property_ids is not None:
+        query = query.filter(db.or_(ChangeEvent.property_id.is_(None), ChangeEvent.property_id.in_(property_ids)))
+    rows = query.order_by(ChangeEvent.id).limit(REPLAY_LIMIT + 1).all()
+    if len(rows) > REPLAY_LIMIT:
+        return None
+    return [_event_dict(r) for r in rows]
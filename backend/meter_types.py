@@ -0,0 +1,96 @@
+import threading
+import time
+from models import db, MeterType, TariffType
+from write_hooks import on_commit
+
+# Meter and tariff types live in the database instead of constants, so gas, heating
+# or hot water need no code change. Each tariff type is billed on the consumption of
+# one meter type (wastewater on water). The registry is cached per process and
+# cleared on writes; other workers pick up changes after CACHE_TTL.
+
+CACHE_TTL = 60
+
+# key, label, unit, category
+DEFAULT_METER_TYPES = [
+    ('water', 'Wasser', 'm³', 'Wasser'),
+    ('electricity_day', 'Strom (Tag)', 'kWh', 'Strom'),
+    ('electricity_night', 'Strom (Nacht)', 'kWh', 'Strom'),
+]
+# key, label, meter type
+DEFAULT_TARIFF_TYPES = [
+    ('water', 'Wasser', 'water'),
+    ('wastewater', 'Abwasser', 'water'),
+    ('electricity_day', 'Strom (Tag)', 'electricity_day'),
+    ('electricity_night', 'Strom (Nacht)', 'electricity_night'),
+]
+
+
+class Registry:
+    def __init__(self, meter_types, tariff_types):
+        self.meter_types = {m['key']: m for m in meter_types}  # in sort order
+        self.tariff_types = {t['key']: t for t in tariff_types}
+
+    def labels(self):
+        """Label per meter and tariff type key."""
+        return {**{k: t['label'] for k, t in self.tariff_types.items()},
+                **{k: m['label'] for k, m in self.meter_types.items()}}
+
+    def tariff_meters(self):
+        """Tariff type -> meter type whose consumption it bills, in sort order."""
+        return {k: t['meter_type'] for k, t in self.tariff_types.items()}
+
+    def ordered(self, by_type):
+        """Items of a dict keyed by meter type in registry order; unknown types last."""
+        rank = {k: i for i, k in enumerate(self.meter_types)}
+        return sorted(by_type.items(), key=lambda item: (rank.get(item[0], len(rank)), item[0]))
+
+
+def init_meter_types():
+    if db.session.query(MeterType.key).first() is None:
+        for i, (key, label, unit, category) in enumerate(DEFAULT_METER_TYPES):
+            db.session.add(MeterType(key=key, label=label, unit=unit, category=category, sort_order=i))
+        db.session.flush()
+        for i, (key, label, meter_type) in enumerate(DEFAULT_TARIFF_TYPES):
+            db.session.add(TariffType(key=key, label=label, meter_type=meter_type, sort_order=i))
+        db.session.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_generation = 0
+
+
+def registry():
+    global _cache
+    now = time.monotonic()
+    with _cache_lock:
+        if _cache and now - _cache[0] < CACHE_TTL:
+            return _cache[1]
+        generation = _generation
+    result = Registry(
+        [m.to_dict() for m in MeterType.query.order_by(MeterType.sort_order, MeterType.key)],
+        [t.to_dict() for t in TariffType.query.order_by(TariffType.sort_order, TariffType.key)],
+    )
+    with _cache_lock:
+        if generation == _generation:
+            _cache = (now, result)
+    return result
+
+
+def meter_type_keys():
+    return list(registry().meter_types)
+
+
+def tariff_type_keys():
+    return list(registry().tariff_types)
+
+
+def clear_cache():
+    global _cache, _generation
+    with _cache_lock:
+        _generation += 1
+        _cache = None
+
+
+on_commit(MeterType, clear_cache)
+on_commit(TariffType, clear_cache)
@@ -1,5 +1,7 @@
+import json
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, date
+from thumbnails import has_derivatives
 
 db = SQLAlchemy()
 
@@ -46,6 +48,12 @@ class Property(db.Model):
     tariffs = db.relationship('Tariff', backref='property', cascade='all, delete-orphan')
     expenses = db.relationship('Expense', backref='property', cascade='all, delete-orphan')
     recurring_costs = db.relationship('RecurringCost', backref='property', cascade='all, delete-orphan')
+    meters = db.relationship('Meter', backref='property', cascade='all, delete-orphan')
+    units = db.relationship('Unit', backref='property', cascade='all, delete-orphan')
+    allocation_rules = db.relationship('AllocationRule', backref='property', cascade='all, delete-orphan')
+    # Ids are reused after a delete; frozen statements must not outlive their property
+    closed_years = db.relationship('ClosedYear', cascade='all, delete-orphan')
+    statement_snapshots = db.relationship('StatementSnapshot', cascade='all, delete-orphan')
 
     def to_dict(self):
         return {
@@ -58,6 +66,9 @@ class Property(db.Model):
 
 
 class MeterReading(db.Model):
+    __table_args__ = (
+        db.Index('ix_meter_reading_property_type_date', 'property_id', 'meter_type', 'reading_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=False)
     meter_type = db.Column(db.String(50), nullable=False)
@@ -77,9 +88,145 @@ class MeterReading(db.Model):
         }
         if self.photo_filename:
             d['photo_url'] = f'/api/uploads/meters/{self.photo_filename}'
+            d['thumbnail_url'] = f'/api/thumbnails/meters/thumb/{self.photo_filename}'
+            d['preview_url'] = f'/api/thumbnails/meters/preview/{self.photo_filename}'
         return d
 
 
+class MeterType(db.Model):
+    # Registry of meter types, see meter_types.py
+    key = db.Column(db.String(50), primary_key=True)
+    label = db.Column(db.String(100), nullable=False)
+    unit = db.Column(db.String(20), nullable=False, default='')
+    category = db.Column(db.String(100))  # groups types on the tariff page, e.g. 'Strom'
+    sort_order = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'key': self.key,
+            'label': self.label,
+            'unit': self.unit,
+            'category': self.category or self.label,
+            'sort_order': self.sort_order,
+        }
+
+
+class TariffType(db.Model):
+    # Tariff billed on the consumption of meter_type, e.g. wastewater on water
+    key = db.Column(db.String(50), primary_key=True)
+    label = db.Column(db.String(100), nullable=False)
+    meter_type = db.Column(db.String(50), db.ForeignKey('meter_type.key'), nullable=False)
+    sort_order = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'key': self.key,
+            'label': self.label,
+            'meter_type': self.meter_type,
+            'sort_order': self.sort_order,
+        }
+
+
+class Meter(db.Model):
+    # Physical meter; readings of its type belong to it from installed_on until the day
+    # before removed_on. Consumption is summed per meter, see consumption.py
+    __table_args__ = (
+        db.Index('ix_meter_property_type_installed', 'property_id', 'meter_type', 'installed_on'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=False)
+    meter_type = db.Column(db.String(50), nullable=False)
+    serial_number = db.Column(db.String(100), default='')
+    installed_on = db.Column(db.Date, nullable=False)
+    removed_on = db.Column(db.Date, nullable=True)
+    initial_value = db.Column(db.Float, nullable=True)  # counter at installation
+    final_value = db.Column(db.Float, nullable=True)  # counter at removal
+    rollover_limit = db.Column(db.Float, nullable=True)  # counter wraps to 0 here, e.g. 100000
+    notes = db.Column(db.Text)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'property_id': self.property_id,
+            'meter_type': self.meter_type,
+            'serial_number': self.serial_number,
+            'installed_on': self.installed_on.isoformat(),
+            'removed_on': self.removed_on.isoformat() if self.removed_on else None,
+            'initial_value': self.initial_value,
+            'final_value': self.final_value,
+            'rollover_limit': self.rollover_limit,
+            'notes': self.notes,
+        }
+
+
+class Unit(db.Model):
+    # Dwelling or commercial unit of a property; costs are split across units, see allocation.py
+    id = db.Column(db.Integer, primary_key=True)
+    property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    area = db.Column(db.Float, nullable=False, default=0.0)  # m²
+    fixed_share = db.Column(db.Float, nullable=True)  # e.g. Miteigentumsanteil in 1/1000
+    notes = db.Column(db.Text)
+    consumption = db.relationship('UnitConsumption', backref='unit', cascade='all, delete-orphan')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'property_id': self.property_id,
+            'name': self.name,
+            'area': self.area,
+            'fixed_share': self.fixed_share,
+            'notes': self.notes,
+        }
+
+
+class UnitConsumption(db.Model):
+    # Annual sub-meter consumption of a unit (water meter, heat cost allocator), as read
+    # or delivered by the metering service
+    __table_args__ = (
+        db.UniqueConstraint('unit_id', 'year', 'meter_type'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    unit_id = db.Column(db.Integer, db.ForeignKey('unit.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    meter_type = db.Column(db.String(50), nullable=False)
+    value = db.Column(db.Float, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'unit_id': self.unit_id,
+            'year': self.year,
+            'meter_type': self.meter_type,
+            'value': self.value,
+        }
+
+
+class AllocationRule(db.Model):
+    # How one cost pool (tariff type or cost category, '*' for all others) is split:
+    # 'area', 'units', 'fixed' or 'consumption' of meter_type; for 'consumption',
+    # consumption_percent is billed by consumption and the rest by area (HeizkostenV)
+    __table_args__ = (
+        db.UniqueConstraint('property_id', 'pool'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=False)
+    pool = db.Column(db.String(100), nullable=False)
+    method = db.Column(db.String(20), nullable=False, default='area')
+    meter_type = db.Column(db.String(50), nullable=True)
+    consumption_percent = db.Column(db.Float, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'property_id': self.property_id,
+            'pool': self.pool,
+            'method': self.method,
+            'meter_type': self.meter_type,
+            'consumption_percent': self.consumption_percent,
+        }
+
+
 class Tariff(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=False)
@@ -129,10 +276,22 @@ class Contact(db.Model):
         }
         if self.photo_filename:
             d['photo_url'] = f'/api/uploads/contacts/{self.photo_filename}'
+            d['thumbnail_url'] = f'/api/thumbnails/contacts/thumb/{self.photo_filename}'
+            d['preview_url'] = f'/api/thumbnails/contacts/preview/{self.photo_filename}'
         return d
 
 
+class ContactKey(db.Model):
+    # Normalized contact name for vendor matching, kept in sync by contact_matching
+    contact_id = db.Column(db.Integer, db.ForeignKey('contact.id'), primary_key=True)
+    normalized = db.Column(db.String(200), nullable=False, index=True)
+    block = db.Column(db.String(20), nullable=False, index=True)
+
+
 class Expense(db.Model):
+    __table_args__ = (
+        db.Index('ix_expense_property_date', 'property_id', 'invoice_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=False)
     contact_id = db.Column(db.Integer, db.ForeignKey('contact.id'), nullable=True)
@@ -179,6 +338,7 @@ class RecurringCost(db.Model):
     start_date = db.Column(db.Date, nullable=False)
     end_date = db.Column(db.Date, nullable=True)
     category = db.Column(db.String(100))
+    billing_interval = db.Column(db.String(20), nullable=False, default='monthly', server_default='monthly')
 
     def to_dict(self):
         return {
@@ -195,10 +355,14 @@ class RecurringCost(db.Model):
             'start_date': self.start_date.isoformat(),
             'end_date': self.end_date.isoformat() if self.end_date else None,
             'category': self.category,
+            'billing_interval': self.billing_interval,
         }
 
 
 class FileAttachment(db.Model):
+    __table_args__ = (
+        db.Index('ix_file_attachment_entity', 'entity_type', 'entity_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     entity_type = db.Column(db.String(50), nullable=False)  # 'expense' or 'recurring_cost'
     entity_id = db.Column(db.Integer, nullable=False)
@@ -209,7 +373,7 @@ class FileAttachment(db.Model):
 
     def to_dict(self):
         folder = 'expenses' if self.entity_type == 'expense' else 'recurring_costs'
-        return {
+        d = {
             'id': self.id,
             'entity_type': self.entity_type,
             'entity_id': self.entity_id,
@@ -219,6 +383,155 @@ class FileAttachment(db.Model):
             'uploaded_at': self.uploaded_at.isoformat(),
             'url': f'/api/uploads/{folder}/{self.stored_filename}',
         }
+        # Any file can be attached; only images and PDFs have thumbnails
+        if has_derivatives(self.stored_filename):
+            d['thumbnail_url'] = f'/api/thumbnails/{folder}/thumb/{self.stored_filename}'
+            d['preview_url'] = f'/api/thumbnails/{folder}/preview/{self.stored_filename}'
+        return d
+
+
+class UploadSession(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    entity_type = db.Column(db.String(50), nullable=False)  # 'expense' or 'recurring_cost'
+    entity_id = db.Column(db.Integer, nullable=False)
+    original_filename = db.Column(db.String(500), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    expected_sha256 = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'original_filename': self.original_filename,
+            'total_size': self.total_size,
+            'offset': self.received,
+            'created_at': self.created_at.isoformat(),
+        }
+
+
+class EventTicket(db.Model):
+    # Single-use ticket for the event stream (EventSource cannot send headers); only the
+    # sha256 of the random ticket is stored, and it is deleted when the stream opens
+    token_hash = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class ChangeEvent(db.Model):
+    # Change feed for live updates and sync; written by live_updates in the same transaction
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer)
+    property_id = db.Column(db.Integer, index=True)
+    action = db.Column(db.String(20), nullable=False)  # 'create', 'update', 'delete' or 'reload'
+    data = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'property_id': self.property_id,
+            'action': self.action,
+            'data': json.loads(self.data) if self.data else None,
+            'created_at': self.created_at.isoformat(),
+        }
+
+
+class StatementJob(db.Model):
+    # Batch run of annual statements, see statements.py
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    property_ids = db.Column(db.Text, nullable=False)  # JSON list
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, partial, failed
+    total = db.Column(db.Integer, nullable=False, default=0)
+    done = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'year': self.year,
+            'property_ids': json.loads(self.property_ids),
+            'status': self.status,
+            'total': self.total,
+            'done': self.done,
+            'failed': self.failed,
+            'progress': round((self.done + self.failed) / self.total, 3) if self.total else 1.0,
+            'error': self.error,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class StatementSnapshot(db.Model):
+    # One generated annual statement; a new run adds the next version, older ones stay
+    __table_args__ = (
+        db.UniqueConstraint('property_id', 'year', 'version'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    job_id = db.Column(db.Integer, db.ForeignKey('statement_job.id'))
+    data = db.Column(db.Text, nullable=False)  # JSON, same as GET /api/reports/annual
+    grand_total = db.Column(db.Float)
+    csv_filename = db.Column(db.String(200))
+    pdf_filename = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self, data=False):
+        d = {
+            'id': self.id,
+            'property_id': self.property_id,
+            'year': self.year,
+            'version': self.version,
+            'job_id': self.job_id,
+            'grand_total': self.grand_total,
+            'csv_url': f'/api/statements/{self.id}/csv' if self.csv_filename else None,
+            'pdf_url': f'/api/statements/{self.id}/pdf' if self.pdf_filename else None,
+            'created_at': self.created_at.isoformat(),
+        }
+        if data:
+            d['data'] = json.loads(self.data)
+        return d
+
+
+class ClosedYear(db.Model):
+    # Closed fiscal year: GET /api/reports/annual serves the frozen snapshot instead of live data
+    __table_args__ = (
+        db.UniqueConstraint('property_id', 'year'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    snapshot_id = db.Column(db.Integer, db.ForeignKey('statement_snapshot.id'), nullable=False)
+    closed_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    closed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    snapshot = db.relationship('StatementSnapshot')
+
+    def to_dict(self):
+        return {
+            'property_id': self.property_id,
+            'year': self.year,
+            'snapshot_id': self.snapshot_id,
+            'version': self.snapshot.version,
+            'grand_total': self.snapshot.grand_total,
+            'closed_by': self.closed_by,
+            'closed_at': self.closed_at.isoformat(),
+        }
 
 
 class ActivityLog(db.Model):
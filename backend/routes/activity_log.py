@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, ActivityLog, User
+import serializers
 
 activity_log_bp = Blueprint('activity_log', __name__)
 
@@ -29,8 +30,8 @@ def list_activity():
     offset = int(request.args.get('offset', 0))
 
     total = q.count()
-    entries = q.order_by(ActivityLog.timestamp.desc()).offset(offset).limit(limit).all()
+    entries = q.order_by(ActivityLog.timestamp.desc()).offset(offset).limit(limit)
     return jsonify({
         'total': total,
-        'entries': [e.to_dict() for e in entries],
+        'entries': serializers.activity_log(entries),
     })
@@ -1,16 +1,34 @@
 import json
 import base64
+import binascii
+import hashlib
+import logging
 import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
 from flask import Blueprint, request, jsonify, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash
-from models import db, User, Property, MeterReading, Tariff, Expense, RecurringCost, ActivityLog, FileAttachment, user_property
+from models import (db, User, Property, MeterReading, Meter, Tariff, Expense, RecurringCost, ActivityLog, FileAttachment,
+                    Unit, UnitConsumption, AllocationRule, user_property)
 from activity_logger import log_activity
+from thumbnails import UPLOAD_BASE
+import serializers
 
 backup_bp = Blueprint('backup', __name__)
 
-UPLOAD_BASE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
+logger = logging.getLogger(__name__)
+
+# Attachment and photo files are read and base64-encoded, and on restore decoded,
+# checksummed and written, in a bounded thread pool: on network volumes the file I/O
+# dominates. Restore stages all files in a directory below UPLOAD_BASE before the
+# database transaction and moves the ones it used into place only after the commit,
+# so a failed restore leaves neither rows without files nor files without rows.
+IO_WORKERS = int(os.environ.get('BACKUP_IO_WORKERS', '8'))
+STAGING_DIR = os.path.join(UPLOAD_BASE, 'restore')
+ATTACHMENT_FOLDERS = {'expense': 'expenses', 'recurring_cost': 'recurring_costs'}
 
 
 def get_accessible_property_ids(user):
@@ -19,6 +37,45 @@ def get_accessible_property_ids(user):
     return [p.id for p in user.properties]
 
 
+def _read_file(path):
+    """(base64 data, sha256) of a file, or None if it is missing."""
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None
+    return base64.b64encode(raw).decode('utf-8'), hashlib.sha256(raw).hexdigest()
+
+
+def _stage_file(staging, folder, filename, data, sha256):
+    """Decode one backup file into the staging directory; returns an error message or None."""
+    if not filename or os.path.basename(filename) != filename or filename in ('.', '..'):
+        return f'{filename}: ungültiger Dateiname'
+    try:
+        raw = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        return f'{filename}: ungültige Daten'
+    if sha256 and hashlib.sha256(raw).hexdigest() != sha256:
+        return f'{filename}: Prüfsumme stimmt nicht überein'
+    target = os.path.join(staging, folder)
+    os.makedirs(target, exist_ok=True)
+    with open(os.path.join(target, filename), 'wb') as f:
+        f.write(raw)
+    return None
+
+
+def _publish_file(staging, folder, filename):
+    """Move a staged file into the upload folder; returns its name if that failed."""
+    target = os.path.join(UPLOAD_BASE, folder)
+    try:
+        os.makedirs(target, exist_ok=True)
+        os.replace(os.path.join(staging, folder, filename), os.path.join(target, filename))
+    except OSError:
+        logger.exception('Restoring %s/%s failed', folder, filename)
+        return f'{folder}/{filename}'
+    return None
+
+
 class BackupEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, (datetime, date)):
@@ -38,6 +95,8 @@ def backup_info():
     info = {
         'properties': len(prop_ids),
         'meter_readings': MeterReading.query.filter(MeterReading.property_id.in_(prop_ids)).count(),
+        'meters': Meter.query.filter(Meter.property_id.in_(prop_ids)).count(),
+        'units': Unit.query.filter(Unit.property_id.in_(prop_ids)).count(),
         'tariffs': Tariff.query.filter(Tariff.property_id.in_(prop_ids)).count(),
         'expenses': Expense.query.filter(Expense.property_id.in_(prop_ids)).count(),
         'recurring_costs': RecurringCost.query.filter(RecurringCost.property_id.in_(prop_ids)).count(),
@@ -88,25 +147,30 @@ def create_backup():
         'version': '1.0',
         'created_at': datetime.utcnow().isoformat(),
         'created_by': user.username,
-        'properties': [p.to_dict() for p in Property.query.filter(Property.id.in_(prop_ids)).all()],
-        'meter_readings': [r.to_dict() for r in MeterReading.query.filter(MeterReading.property_id.in_(prop_ids)).all()],
-        'tariffs': [t.to_dict() for t in Tariff.query.filter(Tariff.property_id.in_(prop_ids)).all()],
-        'expenses': [e.to_dict() for e in Expense.query.filter(Expense.property_id.in_(prop_ids)).all()],
-        'recurring_costs': [c.to_dict() for c in RecurringCost.query.filter(RecurringCost.property_id.in_(prop_ids)).all()],
+        'properties': serializers.properties(Property.id.in_(prop_ids)),
+        'meter_readings': serializers.meter_readings(MeterReading.property_id.in_(prop_ids)),
+        'meters': serializers.meters(Meter.property_id.in_(prop_ids)),
+        'tariffs': serializers.tariffs(Tariff.property_id.in_(prop_ids)),
+        'expenses': serializers.expenses(Expense.property_id.in_(prop_ids)),
+        'recurring_costs': serializers.recurring_costs(RecurringCost.property_id.in_(prop_ids)),
+        'units': [u.to_dict() for u in Unit.query.filter(Unit.property_id.in_(prop_ids))],
+        'unit_consumption': [c.to_dict() for c in UnitConsumption.query.join(Unit).filter(
+            Unit.property_id.in_(prop_ids))],
+        'allocation_rules': [r.to_dict() for r in AllocationRule.query.filter(
+            AllocationRule.property_id.in_(prop_ids))],
     }
 
     # Users
     if user.role == 'admin':
-        backup['users'] = [u.to_dict() for u in User.query.all()]
+        backup['users'] = serializers.users()
         # User-property assignments
         assignments = db.session.execute(
             user_property.select().where(user_property.c.property_id.in_(prop_ids))
         ).fetchall()
         backup['user_property'] = [{'user_id': a.user_id, 'property_id': a.property_id} for a in assignments]
     else:
-        users = User.query.filter(db.or_(User.id == user.id, User.created_by == user.id)).all()
-        backup['users'] = [u.to_dict() for u in users]
-        user_ids = [u.id for u in users]
+        backup['users'] = serializers.users(db.or_(User.id == user.id, User.created_by == user.id))
+        user_ids = [u['id'] for u in backup['users']]
         assignments = db.session.execute(
             user_property.select().where(
                 user_property.c.user_id.in_(user_ids),
@@ -130,29 +194,27 @@ def create_backup():
             FileAttachment.query.filter(FileAttachment.entity_type == 'recurring_cost', FileAttachment.entity_id.in_(rc_ids)).all()
         )
 
-    for att in att_query_parts:
+    photos = db.session.query(MeterReading.id, MeterReading.photo_filename).filter(
+        MeterReading.property_id.in_(prop_ids), MeterReading.photo_filename.isnot(None),
+    ).order_by(MeterReading.id).all()
+    paths = [os.path.join(UPLOAD_BASE, ATTACHMENT_FOLDERS[att.entity_type], att.stored_filename)
+             for att in att_query_parts]
+    paths += [os.path.join(UPLOAD_BASE, 'meters', filename) for _, filename in photos]
+    with ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='backup') as pool:
+        files = list(pool.map(_read_file, paths))
+
+    for att, file in zip(att_query_parts, files):
         d = att.to_dict()
-        folder = 'expenses' if att.entity_type == 'expense' else 'recurring_costs'
-        filepath = os.path.join(UPLOAD_BASE, folder, att.stored_filename)
-        if os.path.exists(filepath):
-            with open(filepath, 'rb') as f:
-                d['file_data'] = base64.b64encode(f.read()).decode('utf-8')
+        if file:
+            d['file_data'], d['sha256'] = file
         attachments.append(d)
     backup['attachments'] = attachments
 
     # Meter photos as base64
     meter_photos = []
-    for r in backup['meter_readings']:
-        reading = MeterReading.query.get(r['id'])
-        if reading and reading.photo_filename:
-            filepath = os.path.join(UPLOAD_BASE, 'meters', reading.photo_filename)
-            if os.path.exists(filepath):
-                with open(filepath, 'rb') as f:
-                    meter_photos.append({
-                        'reading_id': r['id'],
-                        'filename': reading.photo_filename,
-                        'data': base64.b64encode(f.read()).decode('utf-8'),
-                    })
+    for (rid, filename), file in zip(photos, files[len(att_query_parts):]):
+        if file:
+            meter_photos.append({'reading_id': rid, 'filename': filename, 'data': file[0], 'sha256': file[1]})
     backup['meter_photos'] = meter_photos
 
     log_activity(user.id, 'export', 'backup', None, 'Backup erstellt')
@@ -181,12 +243,31 @@ def restore_backup():
     if not data:
         return jsonify({'error': 'Keine Backup-Daten'}), 400
 
+    # Decode and verify all files into a staging directory before touching the database
+    staged = [(ATTACHMENT_FOLDERS[att['entity_type']], att['stored_filename'], att['file_data'], att.get('sha256'))
+              for att in data.get('attachments', []) if att.get('file_data') and att['entity_type'] in ATTACHMENT_FOLDERS]
+    staged += [('meters', mp['filename'], mp['data'], mp.get('sha256'))
+               for mp in data.get('meter_photos', []) if mp.get('data')]
+    staged = list({(f[0], f[1]): f for f in staged}.values())
+    staging = os.path.join(STAGING_DIR, uuid.uuid4().hex)
+    try:
+        with ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='restore') as pool:
+            errors = [e for e in pool.map(lambda f: _stage_file(staging, *f), staged) if e]
+    except OSError as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        return jsonify({'error': f'Wiederherstellung fehlgeschlagen: {str(e)}'}), 500
+    if errors:
+        shutil.rmtree(staging, ignore_errors=True)
+        return jsonify({'error': 'Backup-Dateien fehlerhaft', 'files': errors}), 400
+    published = []  # (folder, filename) of staged files the restored rows refer to
+
     # ID mapping: old_id -> new_id
     prop_map = {}
     user_map = {}
     expense_map = {}
     rc_map = {}
     reading_map = {}
+    unit_map = {}
 
     try:
         # Restore properties
@@ -249,6 +330,45 @@ def restore_backup():
             db.session.flush()
             reading_map[r['id']] = reading.id
 
+        # Restore meters
+        for m in data.get('meters', []):
+            new_pid = prop_map.get(m['property_id'])
+            if not new_pid:
+                continue
+            db.session.add(Meter(
+                property_id=new_pid,
+                meter_type=m['meter_type'],
+                serial_number=m.get('serial_number', ''),
+                installed_on=date.fromisoformat(m['installed_on']),
+                removed_on=date.fromisoformat(m['removed_on']) if m.get('removed_on') else None,
+                initial_value=m.get('initial_value'),
+                final_value=m.get('final_value'),
+                rollover_limit=m.get('rollover_limit'),
+                notes=m.get('notes', ''),
+            ))
+
+        # Restore units, their sub-meter consumption and the allocation rules
+        for u in data.get('units', []):
+            new_pid = prop_map.get(u['property_id'])
+            if not new_pid:
+                continue
+            unit = Unit(property_id=new_pid, name=u['name'], area=u.get('area') or 0.0,
+                        fixed_share=u.get('fixed_share'), notes=u.get('notes', ''))
+            db.session.add(unit)
+            db.session.flush()
+            unit_map[u['id']] = unit.id
+        for c in data.get('unit_consumption', []):
+            new_uid = unit_map.get(c['unit_id'])
+            if new_uid:
+                db.session.add(UnitConsumption(unit_id=new_uid, year=c['year'], meter_type=c['meter_type'],
+                                               value=c['value']))
+        for r in data.get('allocation_rules', []):
+            new_pid = prop_map.get(r['property_id'])
+            if new_pid and not AllocationRule.query.filter_by(property_id=new_pid, pool=r['pool']).first():
+                db.session.add(AllocationRule(property_id=new_pid, pool=r['pool'], method=r['method'],
+                                              meter_type=r.get('meter_type'),
+                                              consumption_percent=r.get('consumption_percent')))
+
         # Restore tariffs
         for t in data.get('tariffs', []):
             new_pid = prop_map.get(t['property_id'])
@@ -301,6 +421,7 @@ def restore_backup():
                 start_date=date.fromisoformat(c['start_date']),
                 end_date=date.fromisoformat(c['end_date']) if c.get('end_date') else None,
                 category=c.get('category', ''),
+                billing_interval=c.get('billing_interval') or 'monthly',
             )
             db.session.add(cost)
             db.session.flush()
@@ -311,10 +432,8 @@ def restore_backup():
             entity_id = None
             if att['entity_type'] == 'expense':
                 entity_id = expense_map.get(att['entity_id'])
-                folder = 'expenses'
             elif att['entity_type'] == 'recurring_cost':
                 entity_id = rc_map.get(att['entity_id'])
-                folder = 'recurring_costs'
             if not entity_id:
                 continue
             new_att = FileAttachment(
@@ -325,26 +444,22 @@ def restore_backup():
                 file_type=att['file_type'],
             )
             db.session.add(new_att)
-            # Save file data
             if att.get('file_data'):
-                filepath = os.path.join(UPLOAD_BASE, folder, att['stored_filename'])
-                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                with open(filepath, 'wb') as f:
-                    f.write(base64.b64decode(att['file_data']))
+                published.append((ATTACHMENT_FOLDERS[att['entity_type']], att['stored_filename']))
 
         # Restore meter photos
         for mp in data.get('meter_photos', []):
             new_rid = reading_map.get(mp['reading_id'])
-            if new_rid:
+            if new_rid and mp.get('data'):
                 reading = MeterReading.query.get(new_rid)
                 if reading:
                     reading.photo_filename = mp['filename']
-                    filepath = os.path.join(UPLOAD_BASE, 'meters', mp['filename'])
-                    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                    with open(filepath, 'wb') as f:
-                        f.write(base64.b64decode(mp['data']))
+                    published.append(('meters', mp['filename']))
 
         db.session.commit()
+        # Files go into place only once the rows referring to them are committed
+        with ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='restore') as pool:
+            missing = [f for f in pool.map(lambda f: _publish_file(staging, *f), set(published)) if f]
         log_activity(user.id, 'import', 'backup', None, 'Backup wiederhergestellt')
 
         return jsonify({
@@ -355,8 +470,14 @@ def restore_backup():
                 'meter_readings': len(reading_map),
                 'expenses': len(expense_map),
                 'recurring_costs': len(rc_map),
-            }
+                'units': len(unit_map),
+                'files': len(set(published)) - len(missing),
+            },
+            'missing_files': missing,
         })
     except Exception as e:
         db.session.rollback()
+        logger.exception('Restore failed')
         return jsonify({'error': f'Wiederherstellung fehlgeschlagen: {str(e)}'}), 500
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
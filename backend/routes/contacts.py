@@ -4,29 +4,61 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, Contact, User
 from activity_logger import log_activity
+from thumbnails import UPLOAD_BASE, schedule_derivatives, remove_derivatives
+from contact_search import search_contacts, DEFAULT_LIMIT, TYPEAHEAD_LIMIT
+from contact_matching import find_duplicates, merge_contacts, MATCH_THRESHOLD
+import serializers
 
 contacts_bp = Blueprint('contacts', __name__)
 
-UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads', 'contacts')
+UPLOAD_DIR = os.path.join(UPLOAD_BASE, 'contacts')
 
 
 @contacts_bp.route('/api/contacts', methods=['GET'])
 @jwt_required()
 def list_contacts():
     q = request.args.get('q', '').strip()
-    query = Contact.query
     if q:
-        like = f'%{q}%'
-        query = query.filter(
-            db.or_(
-                Contact.name.ilike(like),
-                Contact.company.ilike(like),
-                Contact.email.ilike(like),
-                Contact.phone.ilike(like),
-            )
-        )
-    contacts = query.order_by(Contact.name).all()
-    return jsonify([c.to_dict() for c in contacts])
+        limit = max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), 500))
+        return jsonify([c.to_dict() for c in search_contacts(q, limit=limit)])
+    return jsonify(serializers.contacts(order_by=[Contact.name]))
+
+
+@contacts_bp.route('/api/contacts/typeahead', methods=['GET'])
+@jwt_required()
+def typeahead_contacts():
+    q = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', TYPEAHEAD_LIMIT, type=int), 50))
+    contacts = search_contacts(q, limit=limit) if q else []
+    return jsonify([{'id': c.id, 'name': c.name, 'company': c.company} for c in contacts])
+
+
+@contacts_bp.route('/api/contacts/duplicates', methods=['GET'])
+@jwt_required()
+def list_duplicate_contacts():
+    threshold = request.args.get('threshold', MATCH_THRESHOLD, type=float)
+    groups = find_duplicates(threshold=threshold)
+    by_id = {c.id: c for c in Contact.query.filter(Contact.id.in_([cid for ids in groups for cid in ids])).all()}
+    return jsonify([
+        {'keep': by_id[ids[0]].to_dict(), 'duplicates': [by_id[cid].to_dict() for cid in ids[1:]]}
+        for ids in groups
+    ])
+
+
+@contacts_bp.route('/api/contacts/<int:cid>/merge', methods=['POST'])
+@jwt_required()
+def merge_contact(cid):
+    user = User.query.get(int(get_jwt_identity()))
+    contact = Contact.query.get_or_404(cid)
+    data = request.get_json() or {}
+    ids = [int(i) for i in data.get('duplicate_ids', []) if int(i) != cid]
+    duplicates = Contact.query.filter(Contact.id.in_(ids)).all()
+    if not duplicates or len(duplicates) != len(set(ids)):
+        return jsonify({'error': 'Ungültige Kontakt-IDs'}), 400
+    names = ', '.join(d.name for d in duplicates)
+    merge_contacts(contact, duplicates)
+    log_activity(user.id, 'merge', 'contact', cid, f'Kontakte zusammengeführt in {contact.name}: {names}')
+    return jsonify(contact.to_dict())
 
 
 @contacts_bp.route('/api/contacts/<int:cid>', methods=['GET'])
@@ -81,6 +113,7 @@ def delete_contact(cid):
         filepath = os.path.join(UPLOAD_DIR, contact.photo_filename)
         if os.path.exists(filepath):
             os.remove(filepath)
+        remove_derivatives('contacts', contact.photo_filename)
     db.session.delete(contact)
     db.session.commit()
     log_activity(user.id, 'delete', 'contact', cid, f'Kontakt gelöscht: {contact.name}')
@@ -104,6 +137,7 @@ def scan_business_card():
         stored = f'{uuid.uuid4().hex}{ext}'
         with open(os.path.join(UPLOAD_DIR, stored), 'wb') as f:
             f.write(image_bytes)
+        schedule_derivatives('contacts', stored)
 
         result['photo_filename'] = stored
         return jsonify(result)
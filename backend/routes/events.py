@@ -0,0 +1,86 @@
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, Response
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from models import db, User, EventTicket
+from live_updates import feed, replay_since
+
+events_bp = Blueprint('events', __name__)
+
+TICKET_EXPIRES = timedelta(seconds=60)
+
+
+def _hash(ticket):
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+
+def issue_ticket(user_id, expires=TICKET_EXPIRES):
+    """A random single-use ticket for GET /api/events; unlike a JWT it is no API credential."""
+    ticket = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    EventTicket.query.filter(EventTicket.expires_at < now).delete()
+    db.session.add(EventTicket(token_hash=_hash(ticket), user_id=user_id, expires_at=now + expires))
+    db.session.commit()
+    return ticket
+
+
+def redeem_ticket(ticket):
+    """User id of a valid ticket, or None; the ticket is used up either way."""
+    token_hash = _hash(ticket)
+    row = db.session.get(EventTicket, token_hash)
+    if row is None:
+        return None
+    user_id, expires_at = row.user_id, row.expires_at
+    # Only the request that deletes the row may use it
+    deleted = EventTicket.query.filter_by(token_hash=token_hash).delete()
+    db.session.commit()
+    return user_id if deleted and expires_at >= datetime.utcnow() else None
+
+
+@events_bp.route('/api/events/ticket', methods=['POST'])
+@jwt_required()
+def create_ticket():
+    # EventSource cannot send headers; the ticket keeps the real token out of URLs and logs
+    return jsonify({'ticket': issue_ticket(int(get_jwt_identity()))})
+
+
+def _current_user():
+    ticket = request.args.get('ticket')
+    if ticket:
+        user_id = redeem_ticket(ticket)
+    else:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+        user_id = int(identity) if identity else None
+    return db.session.get(User, user_id) if user_id else None
+
+
+@events_bp.route('/api/events', methods=['GET'])
+def stream_events():
+    user = _current_user()
+    if not user:
+        return jsonify({'error': 'Nicht autorisiert'}), 401
+    property_ids = None if user.role == 'admin' else [p.id for p in user.properties]
+
+    # Subscribe before reading the replay so no event falls between the two
+    sub = feed.subscribe(property_ids)
+    replay = []
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_event_id and last_event_id.isdigit():
+        replay = replay_since(int(last_event_id), property_ids)
+    db.session.remove()  # do not hold a connection for the lifetime of the stream
+
+    def generate():
+        try:
+            if replay is None:
+                yield 'event: resync\ndata: {}\n\n'
+            yield from sub.stream(replay or ())
+        finally:
+            feed.unsubscribe(sub)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
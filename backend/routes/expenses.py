@@ -5,10 +5,14 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import date
 from models import db, Expense, User, FileAttachment, Contact
 from activity_logger import log_activity
+from thumbnails import UPLOAD_BASE, schedule_derivatives, remove_derivatives
+from importers import detect_format, iter_records, import_expenses
+from contact_matching import resolve_contact
+import serializers
 
 expenses_bp = Blueprint('expenses', __name__)
 
-UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads', 'expenses')
+UPLOAD_DIR = os.path.join(UPLOAD_BASE, 'expenses')
 
 
 def check_property_access(user, pid):
@@ -24,16 +28,11 @@ def list_expenses(pid):
     if not check_property_access(user, pid):
         return jsonify({'error': 'Kein Zugriff'}), 403
     category = request.args.get('category')
-    q = Expense.query.filter_by(property_id=pid)
+    criteria = [Expense.property_id == pid]
     if category:
-        q = q.filter_by(category=category)
-    expenses = q.order_by(Expense.invoice_date.desc()).all()
-    result = []
-    for e in expenses:
-        d = e.to_dict()
-        d['attachment_count'] = FileAttachment.query.filter_by(entity_type='expense', entity_id=e.id).count()
-        result.append(d)
-    return jsonify(result)
+        criteria.append(Expense.category == category)
+    return jsonify(serializers.expenses(*criteria, order_by=[Expense.invoice_date.desc()],
+                                        attachments=serializers.attachment_counts('expense', property_id=pid)))
 
 
 @expenses_bp.route('/api/properties/<int:pid>/expenses', methods=['POST'])
@@ -92,6 +91,7 @@ def create_expense(pid):
         ext = os.path.splitext(f.filename)[1].lower()
         stored = f'{uuid.uuid4().hex}{ext}'
         f.save(os.path.join(UPLOAD_DIR, stored))
+        schedule_derivatives('expenses', stored)
         ftype = 'pdf' if ext == '.pdf' else 'image'
         att = FileAttachment(
             entity_type='expense', entity_id=expense.id,
@@ -104,6 +104,26 @@ def create_expense(pid):
     return jsonify(expense.to_dict()), 201
 
 
+@expenses_bp.route('/api/properties/<int:pid>/expenses/import', methods=['POST'])
+@jwt_required()
+def import_expenses_route(pid):
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    file = request.files.get('file')
+    if file:
+        fmt = detect_format(file.filename, file.mimetype, request.args.get('format'))
+        stream = file.stream
+    else:
+        fmt = detect_format(content_type=request.content_type, explicit=request.args.get('format'))
+        stream = request.stream
+    report = import_expenses(iter_records(stream, fmt), property_id=pid, allowed_property_ids={pid})
+    result = report.to_dict()
+    log_activity(user.id, 'import', 'expense', pid,
+                 f'{result["inserted"]} Ausgaben importiert ({result["errors"]} Fehler)')
+    return jsonify(result)
+
+
 @expenses_bp.route('/api/expenses/scan', methods=['POST'])
 @jwt_required()
 def scan_invoice():
@@ -120,9 +140,7 @@ def scan_invoice():
         # Auto-create or find contact from scan data
         vendor_name = result.get('vendor')
         if vendor_name:
-            contact = Contact.query.filter(
-                db.func.lower(Contact.name) == vendor_name.lower()
-            ).first()
+            contact = resolve_contact(vendor_name)
             if contact:
                 # Update missing fields
                 if not contact.phone and result.get('contact_phone'):
@@ -174,6 +192,7 @@ def add_attachment(eid):
     stored = f'{uuid.uuid4().hex}{ext}'
     os.makedirs(UPLOAD_DIR, exist_ok=True)
     file.save(os.path.join(UPLOAD_DIR, stored))
+    schedule_derivatives('expenses', stored)
     ftype = 'pdf' if ext == '.pdf' else 'image'
     att = FileAttachment(
         entity_type='expense', entity_id=eid,
@@ -196,9 +215,10 @@ def delete_attachment(aid):
         if expense and not check_property_access(user, expense.property_id):
             return jsonify({'error': 'Kein Zugriff'}), 403
     folder = 'expenses' if att.entity_type == 'expense' else 'recurring_costs'
-    filepath = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads', folder, att.stored_filename)
+    filepath = os.path.join(UPLOAD_BASE, folder, att.stored_filename)
     if os.path.exists(filepath):
         os.remove(filepath)
+    remove_derivatives(folder, att.stored_filename)
     db.session.delete(att)
     db.session.commit()
     log_activity(user.id, 'delete', 'attachment', aid, 'Anhang gelöscht')
@@ -249,6 +269,7 @@ def delete_expense(eid):
         filepath = os.path.join(UPLOAD_DIR, att.stored_filename)
         if os.path.exists(filepath):
             os.remove(filepath)
+        remove_derivatives('expenses', att.stored_filename)
         db.session.delete(att)
     db.session.delete(expense)
     db.session.commit()
@@ -0,0 +1,166 @@
+import re
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, User, MeterType, TariffType, MeterReading, Meter, Tariff
+from activity_logger import log_activity
+from meter_types import registry
+
+meter_types_bp = Blueprint('meter_types', __name__)
+
+KEY_PATTERN = re.compile(r'[a-z][a-z0-9_]{0,49}')
+
+
+def _admin():
+    user = User.query.get(int(get_jwt_identity()))
+    return user if user.role == 'admin' else None
+
+
+def _int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+@meter_types_bp.route('/api/meter-types', methods=['GET'])
+@jwt_required()
+def list_meter_types():
+    types = registry()
+    return jsonify({'meter_types': list(types.meter_types.values()),
+                    'tariff_types': list(types.tariff_types.values())})
+
+
+@meter_types_bp.route('/api/meter-types', methods=['POST'])
+@jwt_required()
+def create_meter_type():
+    # {"key": "gas", "label": "Gas", "unit": "m³", "category": "Gas"}; also creates the
+    # tariff type of the same key unless "tariff": false
+    user = _admin()
+    if user is None:
+        return jsonify({'error': 'Nicht berechtigt'}), 403
+    data = request.get_json() or {}
+    key = data.get('key') or ''
+    if not KEY_PATTERN.fullmatch(key):
+        return jsonify({'error': 'Schlüssel: Kleinbuchstaben, Ziffern und _'}), 400
+    if not data.get('label'):
+        return jsonify({'error': 'Bezeichnung fehlt'}), 400
+    if db.session.get(MeterType, key):
+        return jsonify({'error': f'Zählertyp {key} existiert bereits'}), 409
+    db.session.add(MeterType(
+        key=key, label=data['label'], unit=data.get('unit', ''), category=data.get('category'),
+        sort_order=_int(data.get('sort_order'), len(registry().meter_types)),
+    ))
+    if data.get('tariff', True) and not db.session.get(TariffType, key):
+        db.session.flush()
+        db.session.add(TariffType(key=key, label=data['label'], meter_type=key,
+                                  sort_order=len(registry().tariff_types)))
+    db.session.commit()
+    log_activity(user.id, 'create', 'meter_type', None, f'Zählertyp {key} angelegt')
+    return jsonify(db.session.get(MeterType, key).to_dict()), 201
+
+
+@meter_types_bp.route('/api/meter-types/<key>', methods=['PUT'])
+@jwt_required()
+def update_meter_type(key):
+    user = _admin()
+    if user is None:
+        return jsonify({'error': 'Nicht berechtigt'}), 403
+    meter_type = db.session.get(MeterType, key)
+    if meter_type is None:
+        return jsonify({'error': 'Nicht gefunden'}), 404
+    data = request.get_json() or {}
+    for field in ('label', 'unit', 'category'):
+        if field in data:
+            setattr(meter_type, field, data[field])
+    if 'sort_order' in data:
+        meter_type.sort_order = _int(data['sort_order'], meter_type.sort_order)
+    db.session.commit()
+    log_activity(user.id, 'update', 'meter_type', None, f'Zählertyp {key} aktualisiert')
+    return jsonify(meter_type.to_dict())
+
+
+@meter_types_bp.route('/api/meter-types/<key>', methods=['DELETE'])
+@jwt_required()
+def delete_meter_type(key):
+    # Only unused types; their tariff types go with them
+    user = _admin()
+    if user is None:
+        return jsonify({'error': 'Nicht berechtigt'}), 403
+    meter_type = db.session.get(MeterType, key)
+    if meter_type is None:
+        return jsonify({'error': 'Nicht gefunden'}), 404
+    tariff_keys = [k for (k,) in db.session.query(TariffType.key).filter_by(meter_type=key)]
+    if (db.session.query(MeterReading.id).filter_by(meter_type=key).first()
+            or db.session.query(Meter.id).filter_by(meter_type=key).first()
+            or db.session.query(Tariff.id).filter(Tariff.tariff_type.in_(tariff_keys)).first()):
+        return jsonify({'error': f'Zählertyp {key} wird noch verwendet'}), 409
+    TariffType.query.filter_by(meter_type=key).delete()
+    db.session.delete(meter_type)
+    db.session.commit()
+    log_activity(user.id, 'delete', 'meter_type', None, f'Zählertyp {key} gelöscht')
+    return jsonify({'message': 'Gelöscht'})
+
+
+@meter_types_bp.route('/api/tariff-types', methods=['POST'])
+@jwt_required()
+def create_tariff_type():
+    # {"key": "sewage_rain", "label": "Niederschlagswasser", "meter_type": "water"}
+    user = _admin()
+    if user is None:
+        return jsonify({'error': 'Nicht berechtigt'}), 403
+    data = request.get_json() or {}
+    key = data.get('key') or ''
+    if not KEY_PATTERN.fullmatch(key):
+        return jsonify({'error': 'Schlüssel: Kleinbuchstaben, Ziffern und _'}), 400
+    if not data.get('label'):
+        return jsonify({'error': 'Bezeichnung fehlt'}), 400
+    if not db.session.get(MeterType, data.get('meter_type') or ''):
+        return jsonify({'error': 'Unbekannter Zählertyp'}), 400
+    if db.session.get(TariffType, key):
+        return jsonify({'error': f'Tariftyp {key} existiert bereits'}), 409
+    tariff_type = TariffType(key=key, label=data['label'], meter_type=data['meter_type'],
+                             sort_order=_int(data.get('sort_order'), len(registry().tariff_types)))
+    db.session.add(tariff_type)
+    db.session.commit()
+    log_activity(user.id, 'create', 'tariff_type', None, f'Tariftyp {key} angelegt')
+    return jsonify(tariff_type.to_dict()), 201
+
+
+@meter_types_bp.route('/api/tariff-types/<key>', methods=['PUT'])
+@jwt_required()
+def update_tariff_type(key):
+    user = _admin()
+    if user is None:
+        return jsonify({'error': 'Nicht berechtigt'}), 403
+    tariff_type = db.session.get(TariffType, key)
+    if tariff_type is None:
+        return jsonify({'error': 'Nicht gefunden'}), 404
+    data = request.get_json() or {}
+    if 'meter_type' in data:
+        if not db.session.get(MeterType, data['meter_type'] or ''):
+            return jsonify({'error': 'Unbekannter Zählertyp'}), 400
+        tariff_type.meter_type = data['meter_type']
+    if 'label' in data:
+        tariff_type.label = data['label']
+    if 'sort_order' in data:
+        tariff_type.sort_order = _int(data['sort_order'], tariff_type.sort_order)
+    db.session.commit()
+    log_activity(user.id, 'update', 'tariff_type', None, f'Tariftyp {key} aktualisiert')
+    return jsonify(tariff_type.to_dict())
+
+
+@meter_types_bp.route('/api/tariff-types/<key>', methods=['DELETE'])
+@jwt_required()
+def delete_tariff_type(key):
+    user = _admin()
+    if user is None:
+        return jsonify({'error': 'Nicht berechtigt'}), 403
+    tariff_type = db.session.get(TariffType, key)
+    if tariff_type is None:
+        return jsonify({'error': 'Nicht gefunden'}), 404
+    if db.session.query(Tariff.id).filter_by(tariff_type=key).first():
+        return jsonify({'error': f'Tariftyp {key} wird noch verwendet'}), 409
+    db.session.delete(tariff_type)
+    db.session.commit()
+    log_activity(user.id, 'delete', 'tariff_type', None, f'Tariftyp {key} gelöscht')
+    return jsonify({'message': 'Gelöscht'})
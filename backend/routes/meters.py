@@ -3,13 +3,17 @@ import uuid
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import date
-from models import db, MeterReading, User
+from models import db, Meter, MeterReading, User
 from activity_logger import log_activity
+from thumbnails import UPLOAD_BASE, schedule_derivatives
+from importers import detect_format, iter_records, import_meter_readings
+from anomalies import check_reading
+from meter_types import meter_type_keys
+import serializers
 
 meters_bp = Blueprint('meters', __name__)
 
-VALID_METER_TYPES = ['water', 'electricity_day', 'electricity_night']
-UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads', 'meters')
+UPLOAD_DIR = os.path.join(UPLOAD_BASE, 'meters')
 
 
 def check_property_access(user, pid):
@@ -25,11 +29,10 @@ def list_readings(pid):
     if not check_property_access(user, pid):
         return jsonify({'error': 'Kein Zugriff'}), 403
     meter_type = request.args.get('meter_type')
-    q = MeterReading.query.filter_by(property_id=pid)
+    criteria = [MeterReading.property_id == pid]
     if meter_type:
-        q = q.filter_by(meter_type=meter_type)
-    readings = q.order_by(MeterReading.reading_date.desc()).all()
-    return jsonify([r.to_dict() for r in readings])
+        criteria.append(MeterReading.meter_type == meter_type)
+    return jsonify(serializers.meter_readings(*criteria, order_by=[MeterReading.reading_date.desc()]))
 
 
 @meters_bp.route('/api/properties/<int:pid>/meters', methods=['POST'])
@@ -46,6 +49,7 @@ def create_reading(pid):
         reading_date = date.fromisoformat(request.form.get('reading_date'))
         notes = request.form.get('notes', '')
         photo = request.files.get('photo')
+        force = request.form.get('force') in ('1', 'true')
     else:
         data = request.get_json()
         meter_type = data.get('meter_type')
@@ -53,9 +57,14 @@ def create_reading(pid):
         reading_date = date.fromisoformat(data['reading_date'])
         notes = data.get('notes', '')
         photo = None
+        force = bool(data.get('force'))
 
-    if meter_type not in VALID_METER_TYPES:
-        return jsonify({'error': f'Ungültiger Zählertyp. Erlaubt: {VALID_METER_TYPES}'}), 400
+    if meter_type not in meter_type_keys():
+        return jsonify({'error': f'Ungültiger Zählertyp. Erlaubt: {meter_type_keys()}'}), 400
+    # Implausible values need force=true, see anomalies.py
+    anomalies = check_reading(pid, meter_type, reading_date, reading_value)
+    if anomalies and not force:
+        return jsonify({'error': 'Zählerstand unplausibel', 'anomalies': anomalies}), 409
 
     photo_filename = None
     if photo:
@@ -65,6 +74,7 @@ def create_reading(pid):
         photo_filename = f'{uuid.uuid4().hex}{ext}'
         os.makedirs(UPLOAD_DIR, exist_ok=True)
         photo.save(os.path.join(UPLOAD_DIR, photo_filename))
+        schedule_derivatives('meters', photo_filename)
 
     reading = MeterReading(
         property_id=pid,
@@ -80,6 +90,28 @@ def create_reading(pid):
     return jsonify(reading.to_dict()), 201
 
 
+@meters_bp.route('/api/properties/<int:pid>/meters/import', methods=['POST'])
+@jwt_required()
+def import_readings(pid):
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+
+    # Multipart upload or raw CSV/NDJSON body; both are parsed as a stream
+    file = request.files.get('file')
+    if file:
+        fmt = detect_format(file.filename, file.mimetype, request.args.get('format'))
+        stream = file.stream
+    else:
+        fmt = detect_format(content_type=request.content_type, explicit=request.args.get('format'))
+        stream = request.stream
+    report = import_meter_readings(iter_records(stream, fmt), property_id=pid, allowed_property_ids={pid})
+    result = report.to_dict()
+    log_activity(user.id, 'import', 'meter_reading', pid,
+                 f'{result["inserted"]} Zählerstände importiert ({result["duplicates"]} Duplikate, {result["errors"]} Fehler)')
+    return jsonify(result)
+
+
 @meters_bp.route('/api/properties/<int:pid>/meters/scan', methods=['POST'])
 @jwt_required()
 def scan_meter_photo(pid):
@@ -108,12 +140,15 @@ def update_reading(mid):
     if not check_property_access(user, reading.property_id):
         return jsonify({'error': 'Kein Zugriff'}), 403
     data = request.get_json()
-    if 'meter_type' in data and data['meter_type'] in VALID_METER_TYPES:
-        reading.meter_type = data['meter_type']
-    if 'reading_value' in data:
-        reading.reading_value = data['reading_value']
-    if 'reading_date' in data:
-        reading.reading_date = date.fromisoformat(data['reading_date'])
+    meter_type = data['meter_type'] if data.get('meter_type') in meter_type_keys() else reading.meter_type
+    reading_value = data.get('reading_value', reading.reading_value)
+    reading_date = date.fromisoformat(data['reading_date']) if 'reading_date' in data else reading.reading_date
+    anomalies = check_reading(reading.property_id, meter_type, reading_date, reading_value, exclude_id=mid)
+    if anomalies and not data.get('force'):
+        return jsonify({'error': 'Zählerstand unplausibel', 'anomalies': anomalies}), 409
+    reading.meter_type = meter_type
+    reading.reading_value = reading_value
+    reading.reading_date = reading_date
     if 'notes' in data:
         reading.notes = data['notes']
     db.session.commit()
@@ -132,3 +167,133 @@ def delete_reading(mid):
     db.session.commit()
     log_activity(user.id, 'delete', 'meter_reading', mid, 'Zählerstand gelöscht')
     return jsonify({'message': 'Gelöscht'})
+
+
+def _parse_meter(data, meter):
+    """Apply request fields to a Meter; returns an error message or None."""
+    try:
+        if 'meter_type' in data:
+            meter.meter_type = data['meter_type']
+        if 'serial_number' in data:
+            meter.serial_number = data['serial_number'] or ''
+        if 'installed_on' in data:
+            meter.installed_on = date.fromisoformat(data['installed_on'])
+        if 'removed_on' in data:
+            meter.removed_on = date.fromisoformat(data['removed_on']) if data['removed_on'] else None
+        for key in ('initial_value', 'final_value', 'rollover_limit'):
+            if key in data:
+                setattr(meter, key, float(data[key]) if data[key] not in (None, '') else None)
+        if 'notes' in data:
+            meter.notes = data['notes']
+    except (TypeError, ValueError) as e:
+        return f'Ungültige Eingabe: {e}'
+    if meter.meter_type not in meter_type_keys():
+        return f'Ungültiger Zählertyp. Erlaubt: {meter_type_keys()}'
+    if meter.installed_on is None:
+        return 'Einbaudatum fehlt'
+    if meter.removed_on is not None and meter.removed_on <= meter.installed_on:
+        return 'Ausbau muss nach dem Einbau liegen'
+    if meter.rollover_limit is not None and meter.rollover_limit <= 0:
+        return 'Überlaufgrenze muss positiv sein'
+    # Readings are assigned to meters by date, so meters of one type must not overlap
+    overlap = Meter.query.filter(
+        Meter.property_id == meter.property_id, Meter.meter_type == meter.meter_type,
+        Meter.id != (meter.id or 0),
+        db.or_(Meter.removed_on.is_(None), Meter.removed_on > meter.installed_on),
+    )
+    if meter.removed_on is not None:
+        overlap = overlap.filter(Meter.installed_on < meter.removed_on)
+    if overlap.first():
+        return 'Zeitraum überschneidet sich mit einem anderen Zähler'
+    return None
+
+
+@meters_bp.route('/api/properties/<int:pid>/meter-devices', methods=['GET'])
+@jwt_required()
+def list_meters(pid):
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    q = Meter.query.filter_by(property_id=pid)
+    if request.args.get('meter_type'):
+        q = q.filter_by(meter_type=request.args['meter_type'])
+    return jsonify([m.to_dict() for m in q.order_by(Meter.meter_type, Meter.installed_on)])
+
+
+@meters_bp.route('/api/properties/<int:pid>/meter-devices', methods=['POST'])
+@jwt_required()
+def create_meter(pid):
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    meter = Meter(property_id=pid)
+    error = _parse_meter(request.get_json() or {}, meter)
+    if error:
+        return jsonify({'error': error}), 400
+    db.session.add(meter)
+    db.session.commit()
+    log_activity(user.id, 'create', 'meter', meter.id, f'Zähler {meter.meter_type} {meter.serial_number}'.strip())
+    return jsonify(meter.to_dict()), 201
+
+
+@meters_bp.route('/api/meter-devices/<int:meter_id>', methods=['PUT'])
+@jwt_required()
+def update_meter(meter_id):
+    meter = Meter.query.get_or_404(meter_id)
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, meter.property_id):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    with db.session.no_autoflush:
+        error = _parse_meter(request.get_json() or {}, meter)
+    if error:
+        db.session.rollback()
+        return jsonify({'error': error}), 400
+    db.session.commit()
+    log_activity(user.id, 'update', 'meter', meter_id, 'Zähler aktualisiert')
+    return jsonify(meter.to_dict())
+
+
+@meters_bp.route('/api/meter-devices/<int:meter_id>', methods=['DELETE'])
+@jwt_required()
+def delete_meter(meter_id):
+    # Readings stay; they count as one continuous counter again
+    meter = Meter.query.get_or_404(meter_id)
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, meter.property_id):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    db.session.delete(meter)
+    db.session.commit()
+    log_activity(user.id, 'delete', 'meter', meter_id, 'Zähler gelöscht')
+    return jsonify({'message': 'Gelöscht'})
+
+
+@meters_bp.route('/api/meter-devices/<int:meter_id>/replace', methods=['POST'])
+@jwt_required()
+def replace_meter(meter_id):
+    # {"date": "2024-05-02", "final_value": 1234.5, "serial_number": "...", "initial_value": 0}
+    old = Meter.query.get_or_404(meter_id)
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, old.property_id):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    if old.removed_on is not None:
+        return jsonify({'error': 'Zähler ist bereits ausgebaut'}), 400
+    data = request.get_json() or {}
+    if not data.get('date'):
+        return jsonify({'error': 'Datum fehlt'}), 400
+    with db.session.no_autoflush:
+        error = _parse_meter({'removed_on': data['date'], 'final_value': data.get('final_value')}, old)
+    if not error:
+        db.session.flush()  # the new meter's overlap check must see the removal
+        new = Meter(property_id=old.property_id, meter_type=old.meter_type, rollover_limit=old.rollover_limit)
+        error = _parse_meter({
+            'installed_on': data['date'],
+            **{k: data[k] for k in ('serial_number', 'initial_value', 'rollover_limit', 'notes') if k in data},
+        }, new)
+    if error:
+        db.session.rollback()
+        return jsonify({'error': error}), 400
+    db.session.add(new)
+    db.session.commit()
+    log_activity(user.id, 'update', 'meter', old.id,
+                 f'Zähler {old.serial_number or old.id} durch {new.serial_number or new.id} ersetzt')
+    return jsonify({'removed': old.to_dict(), 'installed': new.to_dict()}), 201
@@ -0,0 +1,33 @@
+import hmac
+import os
+import re
+from flask import Blueprint, request, jsonify, Response, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import User
+from instrumentation import render, profile_dir, profile_summary
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus cannot log in; protect with METRICS_TOKEN (bearer) where the port is reachable
+    token = os.environ.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Nicht autorisiert'}), 401
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+@metrics_bp.route('/api/profiles/<profile_id>', methods=['GET'])
+@jwt_required()
+def get_profile(profile_id):
+    user = User.query.get(int(get_jwt_identity()))
+    if user.role != 'admin':
+        return jsonify({'error': 'Nicht berechtigt'}), 403
+    path = os.path.join(profile_dir(), f'{profile_id}.prof')
+    if not re.fullmatch(r'[0-9a-f]{32}', profile_id) or not os.path.exists(path):
+        return jsonify({'error': 'Profil nicht gefunden'}), 404
+    if request.args.get('format') == 'prof':
+        # Raw cProfile data, e.g. for snakeviz
+        return send_file(path, as_attachment=True, download_name=f'{profile_id}.prof')
+    return Response(profile_summary(profile_id), mimetype='text/plain')
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, Property, User
 from activity_logger import log_activity
+from statements import statement_files, remove_files
 
 properties_bp = Blueprint('properties', __name__)
 
@@ -82,7 +83,9 @@ def delete_property(pid):
         return jsonify({'error': 'Nur Admins können Immobilien löschen'}), 403
     prop = Property.query.get_or_404(pid)
     name = prop.name
+    files = statement_files(prop.statement_snapshots)
     db.session.delete(prop)
     db.session.commit()
+    remove_files(files)
     log_activity(user.id, 'delete', 'property', pid, f'Immobilie "{name}" gelöscht')
     return jsonify({'message': 'Gelöscht'})
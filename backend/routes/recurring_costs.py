@@ -5,10 +5,14 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import date
 from models import db, RecurringCost, User, FileAttachment, Contact
 from activity_logger import log_activity
+from thumbnails import UPLOAD_BASE, schedule_derivatives, remove_derivatives
+from importers import detect_format, iter_records, import_recurring_costs
+from schedules import INTERVALS, cost_schedule, property_schedule
+import serializers
 
 recurring_costs_bp = Blueprint('recurring_costs', __name__)
 
-UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads', 'recurring_costs')
+UPLOAD_DIR = os.path.join(UPLOAD_BASE, 'recurring_costs')
 
 
 def check_property_access(user, pid):
@@ -23,13 +27,9 @@ def list_recurring(pid):
     user = User.query.get(int(get_jwt_identity()))
     if not check_property_access(user, pid):
         return jsonify({'error': 'Kein Zugriff'}), 403
-    costs = RecurringCost.query.filter_by(property_id=pid).order_by(RecurringCost.start_date.desc()).all()
-    result = []
-    for c in costs:
-        d = c.to_dict()
-        d['attachment_count'] = FileAttachment.query.filter_by(entity_type='recurring_cost', entity_id=c.id).count()
-        result.append(d)
-    return jsonify(result)
+    return jsonify(serializers.recurring_costs(
+        RecurringCost.property_id == pid, order_by=[RecurringCost.start_date.desc()],
+        attachments=serializers.attachment_counts('recurring_cost', property_id=pid)))
 
 
 @recurring_costs_bp.route('/api/properties/<int:pid>/recurring-costs', methods=['POST'])
@@ -48,6 +48,7 @@ def create_recurring(pid):
         end_date_str = request.form.get('end_date')
         category = request.form.get('category', '')
         contact_id = request.form.get('contact_id') or None
+        billing_interval = request.form.get('billing_interval') or 'monthly'
         files = request.files.getlist('files')
     else:
         data = request.get_json()
@@ -59,8 +60,11 @@ def create_recurring(pid):
         end_date_str = data.get('end_date')
         category = data.get('category', '')
         contact_id = data.get('contact_id') or None
+        billing_interval = data.get('billing_interval') or 'monthly'
         files = []
 
+    if billing_interval not in INTERVALS:
+        return jsonify({'error': f'Ungültiges Intervall. Erlaubt: {list(INTERVALS)}'}), 400
     if contact_id:
         contact_id = int(contact_id)
 
@@ -77,6 +81,7 @@ def create_recurring(pid):
         start_date=date.fromisoformat(start_date_str),
         end_date=date.fromisoformat(end_date_str) if end_date_str else None,
         category=category,
+        billing_interval=billing_interval,
     )
     db.session.add(cost)
     db.session.flush()
@@ -86,6 +91,7 @@ def create_recurring(pid):
         ext = os.path.splitext(f.filename)[1].lower()
         stored = f'{uuid.uuid4().hex}{ext}'
         f.save(os.path.join(UPLOAD_DIR, stored))
+        schedule_derivatives('recurring_costs', stored)
         ftype = 'pdf' if ext == '.pdf' else 'image'
         att = FileAttachment(
             entity_type='recurring_cost', entity_id=cost.id,
@@ -98,6 +104,26 @@ def create_recurring(pid):
     return jsonify(cost.to_dict()), 201
 
 
+@recurring_costs_bp.route('/api/properties/<int:pid>/recurring-costs/import', methods=['POST'])
+@jwt_required()
+def import_recurring_route(pid):
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    file = request.files.get('file')
+    if file:
+        fmt = detect_format(file.filename, file.mimetype, request.args.get('format'))
+        stream = file.stream
+    else:
+        fmt = detect_format(content_type=request.content_type, explicit=request.args.get('format'))
+        stream = request.stream
+    report = import_recurring_costs(iter_records(stream, fmt), property_id=pid, allowed_property_ids={pid})
+    result = report.to_dict()
+    log_activity(user.id, 'import', 'recurring_cost', pid,
+                 f'{result["inserted"]} lfd. Kosten importiert ({result["errors"]} Fehler)')
+    return jsonify(result)
+
+
 @recurring_costs_bp.route('/api/recurring-costs/scan', methods=['POST'])
 @jwt_required()
 def scan_contract():
@@ -140,6 +166,7 @@ def add_attachment(cid):
     stored = f'{uuid.uuid4().hex}{ext}'
     os.makedirs(UPLOAD_DIR, exist_ok=True)
     file.save(os.path.join(UPLOAD_DIR, stored))
+    schedule_derivatives('recurring_costs', stored)
     ftype = 'pdf' if ext == '.pdf' else 'image'
     att = FileAttachment(
         entity_type='recurring_cost', entity_id=cid,
@@ -175,6 +202,10 @@ def update_recurring(cid):
         cost.category = data['category']
     if 'contact_id' in data:
         cost.contact_id = data['contact_id'] or None
+    if 'billing_interval' in data:
+        if data['billing_interval'] not in INTERVALS:
+            return jsonify({'error': f'Ungültiges Intervall. Erlaubt: {list(INTERVALS)}'}), 400
+        cost.billing_interval = data['billing_interval']
     cost.net_amount = round(cost.monthly_amount / (1 + cost.vat_rate / 100), 2)
     cost.gross_amount = cost.monthly_amount
     db.session.commit()
@@ -182,6 +213,55 @@ def update_recurring(cid):
     return jsonify(cost.to_dict())
 
 
+def _range_args():
+    today = date.today()
+    start = date.fromisoformat(request.args.get('start', f'{today.year}-01-01'))
+    end = date.fromisoformat(request.args.get('end', f'{today.year}-12-31'))
+    return start, end
+
+
+@recurring_costs_bp.route('/api/recurring-costs/<int:cid>/schedule', methods=['GET'])
+@jwt_required()
+def recurring_schedule(cid):
+    cost = RecurringCost.query.get_or_404(cid)
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, cost.property_id):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    start, end = _range_args()
+    schedule = cost_schedule(cost)
+    charges = schedule.charges(start, end)
+    return jsonify({
+        'id': cid,
+        'billing_interval': schedule.interval,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'charges': charges,
+        'charged_total': round(sum(c['amount'] for c in charges), 2),
+        'accrued_total': round(schedule.amount(start, end), 2),
+    })
+
+
+@recurring_costs_bp.route('/api/properties/<int:pid>/recurring-costs/schedule', methods=['GET'])
+@jwt_required()
+def property_recurring_schedule(pid):
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    start, end = _range_args()
+    schedule = property_schedule(pid)
+    months = []
+    k = start.year * 12 + start.month - 1
+    while date(k // 12, k % 12 + 1, 1) <= end:
+        months.append({'month': f'{k // 12}-{k % 12 + 1:02d}', 'total': round(schedule.month_total(k), 2)})
+        k += 1
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'total': round(schedule.total(start, end), 2),
+        'months': months,
+    })
+
+
 @recurring_costs_bp.route('/api/recurring-costs/<int:cid>', methods=['DELETE'])
 @jwt_required()
 def delete_recurring(cid):
@@ -194,6 +274,7 @@ def delete_recurring(cid):
         filepath = os.path.join(UPLOAD_DIR, att.stored_filename)
         if os.path.exists(filepath):
             os.remove(filepath)
+        remove_derivatives('recurring_costs', att.stored_filename)
         db.session.delete(att)
     db.session.delete(cost)
     db.session.commit()
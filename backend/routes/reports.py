@@ -1,11 +1,19 @@
 import csv
 import io
+import json
 from datetime import date
 from flask import Blueprint, request, jsonify, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Property, MeterReading, Tariff, Expense, RecurringCost, User, FileAttachment
-from utils import get_consumption, get_forecast, get_cost_for_tariff_type, get_recurring_costs_total, get_expenses_total
+from models import db, Property, MeterReading, Expense, RecurringCost, User, ClosedYear
+from utils import get_consumption, get_forecast, get_tariffs, consumption_costs, get_recurring_costs_total, get_expenses_total
 from activity_logger import log_activity
+from analytics import expense_cube
+from schedules import property_schedule
+from anomalies import scan_readings
+from consumption import property_series
+from meter_types import registry
+from statements import build_statement, load_inputs, closed_year, close_year, recompute_year, reopen_year, diff_statement
+from allocation import allocate, load_allocation_inputs
 
 reports_bp = Blueprint('reports', __name__)
 
@@ -58,7 +66,7 @@ def consumption_report(pid):
     end_date = date.fromisoformat(end)
 
     result = {}
-    for mt in ['water', 'electricity_day', 'electricity_night']:
+    for mt, _ in registry().ordered(property_series(pid)):
         data, _ = get_consumption(pid, mt, start_date, end_date)
         if data:
             result[mt] = data
@@ -76,19 +84,13 @@ def cost_report(pid):
     start_date = date.fromisoformat(start)
     end_date = date.fromisoformat(end)
 
-    costs = {}
-    for mt in ['water', 'electricity_day', 'electricity_night']:
-        cons_data, _ = get_consumption(pid, mt, start_date, end_date)
-        if cons_data:
-            tariff_type = mt
-            cost = get_cost_for_tariff_type(pid, tariff_type, cons_data['total'], start_date, end_date)
-            if cost:
-                costs[mt] = cost
-    water_data, _ = get_consumption(pid, 'water', start_date, end_date)
-    if water_data:
-        ww_cost = get_cost_for_tariff_type(pid, 'wastewater', water_data['total'], start_date, end_date)
-        if ww_cost:
-            costs['wastewater'] = ww_cost
+    consumption = {}
+    for mt in property_series(pid):
+        data, _ = get_consumption(pid, mt, start_date, end_date)
+        if data:
+            consumption[mt] = data
+    tariffs = get_tariffs([pid], start_date, end_date).get(pid, {})
+    costs = consumption_costs(consumption, tariffs, registry().tariff_meters(), start_date, end_date)
 
     recurring_total, recurring_details = get_recurring_costs_total(pid, start_date, end_date)
     expenses_total, expenses_details = get_expenses_total(pid, start_date, end_date)
@@ -112,7 +114,7 @@ def forecast_report(pid):
         return jsonify({'error': 'Kein Zugriff'}), 403
     year = int(request.args.get('year', date.today().year))
     result = {}
-    for mt in ['water', 'electricity_day', 'electricity_night']:
+    for mt, _ in registry().ordered(property_series(pid)):
         fc = get_forecast(pid, mt, year)
         if fc:
             result[mt] = fc
@@ -126,50 +128,125 @@ def annual_report(pid):
     if not check_property_access(user, pid):
         return jsonify({'error': 'Kein Zugriff'}), 403
     year = int(request.args.get('year', date.today().year))
-    start_date = date(year, 1, 1)
-    end_date = date(year, 12, 31)
+    closure = closed_year(pid, year)
+    if closure:
+        result = json.loads(closure.snapshot.data)
+    else:
+        result = build_statement(pid, year, load_inputs([pid], year)[pid])
+    result['closed'] = closure.to_dict() if closure else None
+    log_activity(user.id, 'view', 'report', pid, f'Jahresabrechnung {year}')
+    return jsonify(result)
 
-    consumption = {}
-    costs = {}
-    for mt in ['water', 'electricity_day', 'electricity_night']:
-        cons_data, _ = get_consumption(pid, mt, start_date, end_date)
-        if cons_data:
-            consumption[mt] = cons_data
-            cost = get_cost_for_tariff_type(pid, mt, cons_data['total'], start_date, end_date)
-            if cost:
-                costs[mt] = cost
-
-    water_data, _ = get_consumption(pid, 'water', start_date, end_date)
-    if water_data:
-        ww_cost = get_cost_for_tariff_type(pid, 'wastewater', water_data['total'], start_date, end_date)
-        if ww_cost:
-            costs['wastewater'] = ww_cost
 
-    recurring_total, recurring_details = get_recurring_costs_total(pid, start_date, end_date)
-    expenses_total, expenses_details = get_expenses_total(pid, start_date, end_date)
-    usage_total = sum(c.get('total_cost', 0) for c in costs.values())
+def _fiscal_year():
+    data = request.get_json(silent=True) or {}
+    try:
+        return int(data.get('year') or request.args['year'])
+    except (KeyError, TypeError, ValueError):
+        return None
 
-    # Add attachment info to expense details
-    for exp in expenses_details:
-        att_count = FileAttachment.query.filter_by(entity_type='expense', entity_id=exp['id']).count()
-        exp['attachment_count'] = att_count
-        if att_count > 0:
-            atts = FileAttachment.query.filter_by(entity_type='expense', entity_id=exp['id']).all()
-            exp['attachments'] = [a.to_dict() for a in atts]
 
-    log_activity(user.id, 'view', 'report', pid, f'Jahresabrechnung {year}')
+@reports_bp.route('/api/reports/annual/<int:pid>/closed', methods=['GET'])
+@jwt_required()
+def list_closed_years(pid):
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    closures = ClosedYear.query.filter_by(property_id=pid).order_by(ClosedYear.year.desc()).all()
+    return jsonify([c.to_dict() for c in closures])
 
+
+@reports_bp.route('/api/reports/annual/<int:pid>/close', methods=['POST'])
+@jwt_required()
+def close_fiscal_year(pid):
+    # {"year": 2024}: freezes the annual report of the year
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    year = _fiscal_year()
+    if year is None:
+        return jsonify({'error': 'Ungültiges Jahr'}), 400
+    if year >= date.today().year:
+        return jsonify({'error': 'Nur vergangene Jahre können abgeschlossen werden'}), 400
+    Property.query.get_or_404(pid)
+    if closed_year(pid, year):
+        return jsonify({'error': f'Jahr {year} ist bereits abgeschlossen'}), 409
+    closure = close_year(pid, year, user.id)
+    log_activity(user.id, 'close', 'report', pid, f'Geschäftsjahr {year} abgeschlossen')
+    return jsonify(closure.to_dict()), 201
+
+
+@reports_bp.route('/api/reports/annual/<int:pid>/reopen', methods=['POST'])
+@jwt_required()
+def reopen_fiscal_year(pid):
+    user = User.query.get(int(get_jwt_identity()))
+    if user.role != 'admin':
+        return jsonify({'error': 'Nicht berechtigt'}), 403
+    year = _fiscal_year()
+    closure = closed_year(pid, year) if year else None
+    if closure is None:
+        return jsonify({'error': 'Jahr ist nicht abgeschlossen'}), 404
+    reopen_year(closure)
+    log_activity(user.id, 'reopen', 'report', pid, f'Geschäftsjahr {year} wieder geöffnet')
+    return jsonify({'message': f'Geschäftsjahr {year} wieder geöffnet'})
+
+
+@reports_bp.route('/api/reports/annual/<int:pid>/recompute', methods=['POST'])
+@jwt_required()
+def recompute_fiscal_year(pid):
+    # Re-freezes a closed year from current data as a new snapshot version
+    user = User.query.get(int(get_jwt_identity()))
+    if user.role != 'admin':
+        return jsonify({'error': 'Nicht berechtigt'}), 403
+    year = _fiscal_year()
+    closure = closed_year(pid, year) if year else None
+    if closure is None:
+        return jsonify({'error': 'Jahr ist nicht abgeschlossen'}), 404
+    closure = recompute_year(closure, user.id)
+    log_activity(user.id, 'update', 'report', pid,
+                 f'Geschäftsjahr {year} neu berechnet (Version {closure.snapshot.version})')
+    return jsonify(closure.to_dict())
+
+
+@reports_bp.route('/api/reports/annual/<int:pid>/diff', methods=['GET'])
+@jwt_required()
+def diff_fiscal_year(pid):
+    # Frozen vs. live annual report of a closed year
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    year = _fiscal_year()
+    closure = closed_year(pid, year) if year else None
+    if closure is None:
+        return jsonify({'error': 'Jahr ist nicht abgeschlossen'}), 404
+    live = build_statement(pid, year, load_inputs([pid], year)[pid])
     return jsonify({
-        'year': year,
-        'property_id': pid,
-        'consumption': consumption,
-        'costs': costs,
-        'recurring_costs': {'total': recurring_total, 'details': recurring_details},
-        'expenses': {'total': expenses_total, 'details': expenses_details},
-        'grand_total': round(usage_total + recurring_total + expenses_total, 2),
+        'closed': closure.to_dict(),
+        **diff_statement(json.loads(closure.snapshot.data), live),
     })
 
 
+@reports_bp.route('/api/reports/annual/<int:pid>/allocation', methods=['GET'])
+@jwt_required()
+def annual_allocation(pid):
+    # Annual report split across the units of the property; a closed year uses its frozen report
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    year = int(request.args.get('year', date.today().year))
+    closure = closed_year(pid, year)
+    if closure:
+        statement = json.loads(closure.snapshot.data)
+    else:
+        statement = build_statement(pid, year, load_inputs([pid], year)[pid])
+    result = allocate(statement, load_allocation_inputs([pid], year)[pid], registry().labels())
+    if result is None:
+        return jsonify({'error': 'Keine Einheiten angelegt'}), 400
+    result['closed'] = closure.to_dict() if closure else None
+    log_activity(user.id, 'view', 'report', pid, f'Kostenverteilung {year}')
+    return jsonify(result)
+
+
 @reports_bp.route('/api/reports/monthly/<int:pid>', methods=['GET'])
 @jwt_required()
 def monthly_comparison(pid):
@@ -177,24 +254,64 @@ def monthly_comparison(pid):
     if not check_property_access(user, pid):
         return jsonify({'error': 'Kein Zugriff'}), 403
     year = int(request.args.get('year', date.today().year))
+    recurring = property_schedule(pid).monthly(year)
+    cube = expense_cube(['month'], property_ids=[pid], start=date(year, 1, 1), end=date(year, 12, 31))
+    expenses = dict(zip(cube['columns']['month'], cube['columns']['gross']))
+    consumption = {mt: series.monthly(year) for mt, series in registry().ordered(property_series(pid))}
     months = []
     for m in range(1, 13):
-        start_date = date(year, m, 1)
-        if m == 12:
-            end_date = date(year, 12, 31)
-        else:
-            end_date = date(year, m + 1, 1)
-        rec_total, _ = get_recurring_costs_total(pid, start_date, end_date)
-        exp_total, _ = get_expenses_total(pid, start_date, end_date)
+        rec_total = round(recurring[m - 1], 2)
+        exp_total = expenses.get(f'{year}-{m:02d}', 0.0)
         months.append({
             'month': m,
             'recurring_costs': rec_total,
             'expenses': exp_total,
             'total': round(rec_total + exp_total, 2),
+            'consumption': {mt: values[m - 1] for mt, values in consumption.items() if values[m - 1] is not None},
         })
     return jsonify(months)
 
 
+@reports_bp.route('/api/reports/anomalies', methods=['GET'])
+@jwt_required()
+def anomaly_report():
+    # ?property_id=1; without it all accessible properties
+    user = User.query.get(int(get_jwt_identity()))
+    pid = request.args.get('property_id', type=int)
+    if pid:
+        if not check_property_access(user, pid):
+            return jsonify({'error': 'Kein Zugriff'}), 403
+        property_ids = [pid]
+    else:
+        property_ids = None if user.role == 'admin' else [p.id for p in user.properties]
+    return jsonify(scan_readings(property_ids))
+
+
+@reports_bp.route('/api/reports/expenses/cube', methods=['GET'])
+@jwt_required()
+def expenses_cube():
+    # e.g. ?dims=category,month&property_id=1&start=2024-01-01&end=2024-12-31
+    user = User.query.get(int(get_jwt_identity()))
+    pid = request.args.get('property_id', type=int)
+    if pid:
+        if not check_property_access(user, pid):
+            return jsonify({'error': 'Kein Zugriff'}), 403
+        property_ids = [pid]
+    else:
+        property_ids = None if user.role == 'admin' else [p.id for p in user.properties]
+    dims = [d.strip() for d in request.args.get('dims', '').split(',') if d.strip()]
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+        result = expense_cube(
+            dims, property_ids=property_ids, start=start, end=end,
+            category=request.args.get('category'), contact_id=request.args.get('contact_id', type=int),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+
 @reports_bp.route('/api/reports/export/<int:pid>', methods=['GET'])
 @jwt_required()
 def export_csv(pid):
@@ -225,10 +342,10 @@ def export_csv(pid):
         for r in readings:
             writer.writerow([r.reading_date, r.meter_type, r.reading_value, r.notes])
     elif report_type == 'recurring':
-        writer.writerow(['Beschreibung', 'Anbieter', 'Monatlich', 'USt %', 'Netto', 'Brutto', 'Start', 'Ende', 'Kategorie'])
+        writer.writerow(['Beschreibung', 'Anbieter', 'Monatlich', 'USt %', 'Netto', 'Brutto', 'Start', 'Ende', 'Kategorie', 'Intervall'])
         costs = RecurringCost.query.filter_by(property_id=pid).all()
         for c in costs:
-            writer.writerow([c.description, c.vendor, c.monthly_amount, c.vat_rate, c.net_amount, c.gross_amount, c.start_date, c.end_date, c.category])
+            writer.writerow([c.description, c.vendor, c.monthly_amount, c.vat_rate, c.net_amount, c.gross_amount, c.start_date, c.end_date, c.category, c.billing_interval])
 
     log_activity(user.id, 'export', 'report', pid, f'CSV Export: {report_type}')
 
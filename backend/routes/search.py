@@ -0,0 +1,28 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import User
+from search_index import search, SOURCES, DEFAULT_LIMIT, MAX_LIMIT
+
+search_bp = Blueprint('search', __name__)
+
+
+@search_bp.route('/api/search', methods=['GET'])
+@jwt_required()
+def global_search():
+    user = User.query.get(int(get_jwt_identity()))
+    q = request.args.get('q', '').strip()
+    entity_type = request.args.get('entity_type') or None
+    if entity_type and entity_type not in SOURCES:
+        return jsonify({'error': f'Ungültiger Typ. Erlaubt: {list(SOURCES)}'}), 400
+    property_ids = None if user.role == 'admin' else [p.id for p in user.properties]
+    result = search(
+        q,
+        property_ids=property_ids,
+        entity_type=entity_type,
+        property_id=request.args.get('property_id', type=int),
+        year=request.args.get('year', type=int),
+        limit=max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT)),
+        offset=max(0, request.args.get('offset', 0, type=int)),
+        facets=request.args.get('facets', '1') != '0',
+    )
+    return jsonify(result)
@@ -0,0 +1,127 @@
+import os
+from datetime import date
+from flask import Blueprint, request, jsonify, send_file, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, User, Property, StatementJob, StatementSnapshot
+from activity_logger import log_activity
+from statements import STATEMENT_DIR, create_job, submit_job
+
+statements_bp = Blueprint('statements', __name__)
+
+
+def _accessible_ids(user):
+    if user.role == 'admin':
+        return {pid for (pid,) in db.session.query(Property.id)}
+    return {p.id for p in user.properties}
+
+
+def _get_job(user, job_id):
+    job = StatementJob.query.get(job_id)
+    if job is None or (user.role != 'admin' and job.created_by != user.id):
+        return None
+    return job
+
+
+def _get_snapshot(user, sid):
+    snapshot = StatementSnapshot.query.get(sid)
+    if snapshot is None or snapshot.property_id not in _accessible_ids(user):
+        return None
+    return snapshot
+
+
+@statements_bp.route('/api/statements/jobs', methods=['POST'])
+@jwt_required()
+def create_statement_job():
+    # {"year": 2024, "property_ids": [1, 2]}; without property_ids all accessible properties
+    user = User.query.get(int(get_jwt_identity()))
+    data = request.get_json(silent=True) or {}
+    try:
+        year = int(data.get('year') or date.today().year - 1)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Ungültiges Jahr'}), 400
+    accessible = _accessible_ids(user)
+    requested = data.get('property_ids')
+    if requested is None:
+        property_ids = sorted(accessible)
+    else:
+        try:
+            property_ids = sorted({int(pid) for pid in requested})
+        except (TypeError, ValueError):
+            return jsonify({'error': 'property_ids muss eine Liste von IDs sein'}), 400
+        if not set(property_ids) <= accessible:
+            return jsonify({'error': 'Kein Zugriff'}), 403
+    if not property_ids:
+        return jsonify({'error': 'Keine Immobilien ausgewählt'}), 400
+    job = create_job(year, property_ids, user.id)
+    submit_job(current_app._get_current_object(), job.id)
+    log_activity(user.id, 'create', 'statement_job', job.id,
+                 f'Jahresabrechnungen {year} für {len(property_ids)} Immobilien gestartet')
+    return jsonify(job.to_dict()), 202
+
+
+@statements_bp.route('/api/statements/jobs', methods=['GET'])
+@jwt_required()
+def list_statement_jobs():
+    user = User.query.get(int(get_jwt_identity()))
+    q = StatementJob.query
+    if user.role != 'admin':
+        q = q.filter_by(created_by=user.id)
+    return jsonify([j.to_dict() for j in q.order_by(StatementJob.id.desc()).limit(50)])
+
+
+@statements_bp.route('/api/statements/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_statement_job(job_id):
+    user = User.query.get(int(get_jwt_identity()))
+    job = _get_job(user, job_id)
+    if job is None:
+        return jsonify({'error': 'Nicht gefunden'}), 404
+    return jsonify(job.to_dict())
+
+
+@statements_bp.route('/api/statements', methods=['GET'])
+@jwt_required()
+def list_statements():
+    # ?property_id=1&year=2024&job_id=3; newest version first
+    user = User.query.get(int(get_jwt_identity()))
+    q = StatementSnapshot.query
+    pid = request.args.get('property_id', type=int)
+    if pid:
+        if pid not in _accessible_ids(user):
+            return jsonify({'error': 'Kein Zugriff'}), 403
+        q = q.filter_by(property_id=pid)
+    elif user.role != 'admin':
+        q = q.filter(StatementSnapshot.property_id.in_(_accessible_ids(user)))
+    year = request.args.get('year', type=int)
+    if year:
+        q = q.filter_by(year=year)
+    job_id = request.args.get('job_id', type=int)
+    if job_id:
+        q = q.filter_by(job_id=job_id)
+    snapshots = q.order_by(StatementSnapshot.year.desc(), StatementSnapshot.property_id,
+                           StatementSnapshot.version.desc()).all()
+    return jsonify([s.to_dict() for s in snapshots])
+
+
+@statements_bp.route('/api/statements/<int:sid>', methods=['GET'])
+@jwt_required()
+def get_statement(sid):
+    user = User.query.get(int(get_jwt_identity()))
+    snapshot = _get_snapshot(user, sid)
+    if snapshot is None:
+        return jsonify({'error': 'Nicht gefunden'}), 404
+    return jsonify(snapshot.to_dict(data=True))
+
+
+@statements_bp.route('/api/statements/<int:sid>/<fmt>', methods=['GET'])
+@jwt_required()
+def download_statement(sid, fmt):
+    user = User.query.get(int(get_jwt_identity()))
+    snapshot = _get_snapshot(user, sid)
+    filename = {'csv': snapshot.csv_filename, 'pdf': snapshot.pdf_filename}.get(fmt) if snapshot else None
+    if not filename or not os.path.exists(os.path.join(STATEMENT_DIR, filename)):
+        return jsonify({'error': 'Nicht gefunden'}), 404
+    return send_file(
+        os.path.join(STATEMENT_DIR, filename), as_attachment=True,
+        download_name=f'Jahresabrechnung_{snapshot.year}_{snapshot.property_id}_v{snapshot.version}.{fmt}',
+    )
@@ -0,0 +1,40 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import User
+from activity_logger import log_activity
+from sync import changes_since, apply_readings, PAGE_SIZE, MAX_UPLOAD
+
+sync_bp = Blueprint('sync', __name__)
+
+
+def _scope(user):
+    return None if user.role == 'admin' else sorted(p.id for p in user.properties)
+
+
+@sync_bp.route('/api/sync', methods=['GET'])
+@jwt_required()
+def pull_changes():
+    user = User.query.get(int(get_jwt_identity()))
+    limit = min(request.args.get('limit', PAGE_SIZE, type=int), PAGE_SIZE)
+    return jsonify(changes_since(request.args.get('since'), _scope(user), limit=max(limit, 1)))
+
+
+@sync_bp.route('/api/sync/readings', methods=['POST'])
+@jwt_required()
+def push_readings():
+    user = User.query.get(int(get_jwt_identity()))
+    data = request.get_json(silent=True) or {}
+    items = data.get('readings')
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        return jsonify({'error': 'readings muss eine Liste von Objekten sein'}), 400
+    if len(items) > MAX_UPLOAD:
+        return jsonify({'error': f'Maximal {MAX_UPLOAD} Zählerstände pro Upload'}), 400
+    results = apply_readings(items, _scope(user))
+    counts = {}
+    for r in results:
+        counts[r['status']] = counts.get(r['status'], 0) + 1
+    if counts.get('created') or counts.get('updated'):
+        log_activity(user.id, 'sync', 'meter_reading', None,
+                     f'{counts.get("created", 0)} Zählerstände synchronisiert, {counts.get("updated", 0)} aktualisiert, '
+                     f'{counts.get("conflict", 0)} Konflikte')
+    return jsonify({'results': results, 'counts': counts})
@@ -3,12 +3,11 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import date
 from models import db, Tariff, User
 from activity_logger import log_activity
+from meter_types import tariff_type_keys
+import serializers
 
 tariffs_bp = Blueprint('tariffs', __name__)
 
-VALID_TARIFF_TYPES = ['water', 'wastewater', 'electricity_day', 'electricity_night']
-
-
 def check_property_access(user, pid):
     if user.role == 'admin':
         return True
@@ -22,11 +21,10 @@ def list_tariffs(pid):
     if not check_property_access(user, pid):
         return jsonify({'error': 'Kein Zugriff'}), 403
     tariff_type = request.args.get('tariff_type')
-    q = Tariff.query.filter_by(property_id=pid)
+    criteria = [Tariff.property_id == pid]
     if tariff_type:
-        q = q.filter_by(tariff_type=tariff_type)
-    tariffs = q.order_by(Tariff.valid_from.desc()).all()
-    return jsonify([t.to_dict() for t in tariffs])
+        criteria.append(Tariff.tariff_type == tariff_type)
+    return jsonify(serializers.tariffs(*criteria, order_by=[Tariff.valid_from.desc()]))
 
 
 @tariffs_bp.route('/api/properties/<int:pid>/tariffs', methods=['POST'])
@@ -36,8 +34,8 @@ def create_tariff(pid):
     if not check_property_access(user, pid):
         return jsonify({'error': 'Kein Zugriff'}), 403
     data = request.get_json()
-    if data.get('tariff_type') not in VALID_TARIFF_TYPES:
-        return jsonify({'error': f'Ungültiger Tariftyp. Erlaubt: {VALID_TARIFF_TYPES}'}), 400
+    if data.get('tariff_type') not in tariff_type_keys():
+        return jsonify({'error': f'Ungültiger Tariftyp. Erlaubt: {tariff_type_keys()}'}), 400
     tariff = Tariff(
         property_id=pid,
         tariff_type=data['tariff_type'],
@@ -62,9 +60,10 @@ def create_tariffs_bulk(pid):
     valid_from = date.fromisoformat(data['valid_from'])
     valid_to = date.fromisoformat(data['valid_to']) if data.get('valid_to') else None
     tariffs_data = data.get('tariffs', [])
+    valid_types = tariff_type_keys()
     created = []
     for t in tariffs_data:
-        if t.get('tariff_type') not in VALID_TARIFF_TYPES:
+        if t.get('tariff_type') not in valid_types:
             continue
         if t.get('price_per_unit') is None:
             continue
@@ -91,7 +90,7 @@ def update_tariff(tid):
     if not check_property_access(user, tariff.property_id):
         return jsonify({'error': 'Kein Zugriff'}), 403
     data = request.get_json()
-    if 'tariff_type' in data and data['tariff_type'] in VALID_TARIFF_TYPES:
+    if 'tariff_type' in data and data['tariff_type'] in tariff_type_keys():
         tariff.tariff_type = data['tariff_type']
     if 'price_per_unit' in data:
         tariff.price_per_unit = data['price_per_unit']
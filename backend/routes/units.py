@@ -0,0 +1,185 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, User, Unit, UnitConsumption, AllocationRule
+from activity_logger import log_activity
+from allocation import METHODS
+from meter_types import meter_type_keys
+
+units_bp = Blueprint('units', __name__)
+
+
+def check_property_access(user, pid):
+    if user.role == 'admin':
+        return True
+    return any(p.id == pid for p in user.properties)
+
+
+def _parse_unit(data, unit):
+    """Apply request fields to a Unit; returns an error message or None."""
+    try:
+        if 'name' in data:
+            unit.name = (data['name'] or '').strip()
+        if 'area' in data:
+            unit.area = float(data['area'] or 0)
+        if 'fixed_share' in data:
+            unit.fixed_share = float(data['fixed_share']) if data['fixed_share'] not in (None, '') else None
+        if 'notes' in data:
+            unit.notes = data['notes']
+    except (TypeError, ValueError) as e:
+        return f'Ungültige Eingabe: {e}'
+    if not unit.name:
+        return 'Bezeichnung fehlt'
+    if unit.area < 0 or (unit.fixed_share is not None and unit.fixed_share < 0):
+        return 'Fläche und Anteil dürfen nicht negativ sein'
+    return None
+
+
+@units_bp.route('/api/properties/<int:pid>/units', methods=['GET'])
+@jwt_required()
+def list_units(pid):
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    return jsonify([u.to_dict() for u in Unit.query.filter_by(property_id=pid).order_by(Unit.name, Unit.id)])
+
+
+@units_bp.route('/api/properties/<int:pid>/units', methods=['POST'])
+@jwt_required()
+def create_unit(pid):
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    unit = Unit(property_id=pid, area=0.0)
+    error = _parse_unit(request.get_json() or {}, unit)
+    if error:
+        return jsonify({'error': error}), 400
+    db.session.add(unit)
+    db.session.commit()
+    log_activity(user.id, 'create', 'unit', unit.id, f'Einheit {unit.name} angelegt')
+    return jsonify(unit.to_dict()), 201
+
+
+@units_bp.route('/api/units/<int:unit_id>', methods=['PUT'])
+@jwt_required()
+def update_unit(unit_id):
+    unit = Unit.query.get_or_404(unit_id)
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, unit.property_id):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    error = _parse_unit(request.get_json() or {}, unit)
+    if error:
+        db.session.rollback()
+        return jsonify({'error': error}), 400
+    db.session.commit()
+    log_activity(user.id, 'update', 'unit', unit_id, 'Einheit aktualisiert')
+    return jsonify(unit.to_dict())
+
+
+@units_bp.route('/api/units/<int:unit_id>', methods=['DELETE'])
+@jwt_required()
+def delete_unit(unit_id):
+    unit = Unit.query.get_or_404(unit_id)
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, unit.property_id):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    db.session.delete(unit)
+    db.session.commit()
+    log_activity(user.id, 'delete', 'unit', unit_id, 'Einheit gelöscht')
+    return jsonify({'message': 'Gelöscht'})
+
+
+@units_bp.route('/api/properties/<int:pid>/unit-consumption', methods=['GET'])
+@jwt_required()
+def list_unit_consumption(pid):
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    q = UnitConsumption.query.join(Unit).filter(Unit.property_id == pid)
+    if request.args.get('year'):
+        q = q.filter(UnitConsumption.year == int(request.args['year']))
+    return jsonify([c.to_dict() for c in q.order_by(UnitConsumption.year, UnitConsumption.meter_type)])
+
+
+@units_bp.route('/api/properties/<int:pid>/unit-consumption', methods=['PUT'])
+@jwt_required()
+def save_unit_consumption(pid):
+    # {"year": 2024, "meter_type": "heat", "values": {"<unit id>": 812.5, ...}}; null removes a value
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    data = request.get_json() or {}
+    meter_type = data.get('meter_type')
+    if meter_type not in meter_type_keys():
+        return jsonify({'error': f'Ungültiger Zählertyp. Erlaubt: {meter_type_keys()}'}), 400
+    try:
+        year = int(data['year'])
+        values = {int(uid): float(v) if v not in (None, '') else None for uid, v in (data.get('values') or {}).items()}
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Ungültige Eingabe: {e}'}), 400
+    if any(v is not None and v < 0 for v in values.values()):
+        return jsonify({'error': 'Verbrauch darf nicht negativ sein'}), 400
+    unit_ids = {uid for (uid,) in db.session.query(Unit.id).filter(Unit.property_id == pid)}
+    if not values.keys() <= unit_ids:
+        return jsonify({'error': 'Unbekannte Einheit'}), 400
+    existing = {c.unit_id: c for c in UnitConsumption.query.filter(
+        UnitConsumption.unit_id.in_(values), UnitConsumption.year == year, UnitConsumption.meter_type == meter_type,
+    )}
+    for uid, value in values.items():
+        row = existing.get(uid)
+        if value is None:
+            if row:
+                db.session.delete(row)
+        elif row:
+            row.value = value
+        else:
+            db.session.add(UnitConsumption(unit_id=uid, year=year, meter_type=meter_type, value=value))
+    db.session.commit()
+    log_activity(user.id, 'update', 'unit_consumption', pid, f'Verbrauch {meter_type} {year} für {len(values)} Einheiten')
+    return jsonify({'message': 'Gespeichert', 'count': len(values)})
+
+
+@units_bp.route('/api/properties/<int:pid>/allocation-rules', methods=['GET'])
+@jwt_required()
+def list_allocation_rules(pid):
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    return jsonify([r.to_dict() for r in AllocationRule.query.filter_by(property_id=pid).order_by(AllocationRule.pool)])
+
+
+@units_bp.route('/api/properties/<int:pid>/allocation-rules', methods=['PUT'])
+@jwt_required()
+def save_allocation_rules(pid):
+    # Replaces all rules: [{"pool": "Heizung", "method": "consumption", "meter_type": "heat",
+    # "consumption_percent": 70}, {"pool": "*", "method": "area"}, ...]
+    user = User.query.get(int(get_jwt_identity()))
+    if not check_property_access(user, pid):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    rules = []
+    for data in request.get_json() or []:
+        pool = (data.get('pool') or '').strip()
+        method = data.get('method')
+        if not pool:
+            return jsonify({'error': 'Kostenart fehlt'}), 400
+        if method not in METHODS:
+            return jsonify({'error': f'Ungültiger Schlüssel. Erlaubt: {list(METHODS)}'}), 400
+        rule = AllocationRule(property_id=pid, pool=pool, method=method)
+        if method == 'consumption':
+            if data.get('meter_type') not in meter_type_keys():
+                return jsonify({'error': f'Ungültiger Zählertyp. Erlaubt: {meter_type_keys()}'}), 400
+            try:
+                percent = float(data.get('consumption_percent') or 100)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Ungültiger Verbrauchsanteil'}), 400
+            if not 0 < percent <= 100:
+                return jsonify({'error': 'Verbrauchsanteil muss zwischen 0 und 100 % liegen'}), 400
+            rule.meter_type = data['meter_type']
+            rule.consumption_percent = percent
+        rules.append(rule)
+    if len({r.pool for r in rules}) != len(rules):
+        return jsonify({'error': 'Kostenart doppelt vergeben'}), 400
+    AllocationRule.query.filter_by(property_id=pid).delete()
+    db.session.add_all(rules)
+    db.session.commit()
+    log_activity(user.id, 'update', 'allocation_rule', pid, f'{len(rules)} Verteilerschlüssel gespeichert')
+    return jsonify([r.to_dict() for r in rules])
@@ -0,0 +1,216 @@
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, User, Expense, RecurringCost, FileAttachment, UploadSession
+from activity_logger import log_activity
+from thumbnails import UPLOAD_BASE, schedule_derivatives
+
+upload_sessions_bp = Blueprint('upload_sessions', __name__)
+
+INCOMING_DIR = os.path.join(UPLOAD_BASE, 'incoming')
+# entity_type -> (model, upload folder, activity label)
+ENTITIES = {
+    'expense': (Expense, 'expenses', 'Ausgabe'),
+    'recurring_cost': (RecurringCost, 'recurring_costs', 'lfd. Kosten'),
+}
+CHUNK_SIZE = 8 * 1024 * 1024
+STREAM_BUFFER = 1024 * 1024
+MAX_FILE_SIZE = 2 * 1024 * 1024 * 1024
+SESSION_TTL = timedelta(hours=24)
+
+# Running hash per session, valid for the offset it was computed at. Another worker
+# (or a restart) simply rebuilds it from the partial file.
+_hashers = {}
+
+
+def check_property_access(user, pid):
+    if user.role == 'admin':
+        return True
+    return any(p.id == pid for p in user.properties)
+
+
+def _part_path(sid):
+    return os.path.join(INCOMING_DIR, f'{sid}.part')
+
+
+def _hasher_for(session):
+    cached = _hashers.get(session.id)
+    if cached and cached[0] == session.received:
+        return cached[1].copy()
+    h = hashlib.sha256()
+    remaining = session.received
+    with open(_part_path(session.id), 'rb') as f:
+        while remaining > 0:
+            buf = f.read(min(STREAM_BUFFER, remaining))
+            if not buf:
+                break
+            h.update(buf)
+            remaining -= len(buf)
+    return h
+
+
+def _discard(session):
+    _hashers.pop(session.id, None)
+    path = _part_path(session.id)
+    if os.path.exists(path):
+        os.remove(path)
+    db.session.delete(session)
+
+
+def _purge_expired():
+    expired = UploadSession.query.filter(UploadSession.created_at < datetime.utcnow() - SESSION_TTL).all()
+    for s in expired:
+        _discard(s)
+    if expired:
+        db.session.commit()
+
+
+def _load_session(sid):
+    session = UploadSession.query.get(sid)
+    if not session or session.user_id != int(get_jwt_identity()):
+        return None, (jsonify({'error': 'Upload nicht gefunden'}), 404)
+    return session, None
+
+
+@upload_sessions_bp.route('/api/upload-sessions', methods=['POST'])
+@jwt_required()
+def init_upload():
+    user = User.query.get(int(get_jwt_identity()))
+    data = request.get_json(silent=True) or {}
+    entity_type = data.get('entity_type')
+    if entity_type not in ENTITIES:
+        return jsonify({'error': f'Ungültiger Typ. Erlaubt: {list(ENTITIES)}'}), 400
+    try:
+        entity_id = int(data['entity_id'])
+        size = int(data['size'])
+        filename = str(data['filename']).strip()
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Ungültige Eingabe: {e}'}), 400
+    if not filename:
+        return jsonify({'error': 'Dateiname fehlt'}), 400
+    model = ENTITIES[entity_type][0]
+    entity = model.query.get_or_404(entity_id)
+    if not check_property_access(user, entity.property_id):
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    # Empty files are accepted like in the single-request upload: no chunks, then complete
+    if size < 0 or size > MAX_FILE_SIZE:
+        return jsonify({'error': 'Ungültige Dateigröße'}), 400
+
+    _purge_expired()
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=user.id,
+        entity_type=entity_type,
+        entity_id=entity.id,
+        original_filename=filename,
+        total_size=size,
+        received=0,
+        expected_sha256=(data.get('sha256') or '').lower() or None,
+    )
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    open(_part_path(session.id), 'wb').close()
+    db.session.add(session)
+    db.session.commit()
+    return jsonify({**session.to_dict(), 'chunk_size': CHUNK_SIZE}), 201
+
+
+@upload_sessions_bp.route('/api/upload-sessions/<sid>', methods=['GET'])
+@jwt_required()
+def upload_status(sid):
+    session, error = _load_session(sid)
+    if error:
+        return error
+    return jsonify(session.to_dict())
+
+
+@upload_sessions_bp.route('/api/upload-sessions/<sid>', methods=['PUT'])
+@jwt_required()
+def upload_chunk(sid):
+    session, error = _load_session(sid)
+    if error:
+        return error
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'offset fehlt'}), 400
+    if offset != session.received:
+        # Client resumes from the offset we actually have
+        return jsonify({'error': 'Offset passt nicht', 'offset': session.received}), 409
+
+    hasher = _hasher_for(session)
+    written = 0
+    # Read the body in fixed-size pieces; the chunk is never held in memory as a whole
+    with open(_part_path(sid), 'r+b') as f:
+        f.seek(offset)
+        f.truncate()  # drop bytes left behind by an interrupted chunk
+        while True:
+            buf = request.stream.read(STREAM_BUFFER)
+            if not buf:
+                break
+            if offset + written + len(buf) > session.total_size:
+                return jsonify({'error': 'Mehr Daten als angekündigt', 'offset': session.received}), 400
+            f.write(buf)
+            hasher.update(buf)
+            written += len(buf)
+
+    session.received = offset + written
+    db.session.commit()
+    _hashers[sid] = (session.received, hasher)
+    return jsonify(session.to_dict())
+
+
+@upload_sessions_bp.route('/api/upload-sessions/<sid>/complete', methods=['POST'])
+@jwt_required()
+def complete_upload(sid):
+    session, error = _load_session(sid)
+    if error:
+        return error
+    if session.received != session.total_size:
+        return jsonify({'error': 'Upload unvollständig', 'offset': session.received}), 400
+    # The entry may have been deleted or the user's access revoked since the upload started
+    model, folder, label = ENTITIES[session.entity_type]
+    entity = db.session.get(model, session.entity_id)
+    user = User.query.get(session.user_id)
+    if not entity or not check_property_access(user, entity.property_id):
+        _discard(session)
+        db.session.commit()
+        if not entity:
+            return jsonify({'error': 'Nicht gefunden'}), 404
+        return jsonify({'error': 'Kein Zugriff'}), 403
+    digest = _hasher_for(session).hexdigest()
+    if session.expected_sha256 and digest != session.expected_sha256:
+        _discard(session)
+        db.session.commit()
+        return jsonify({'error': 'Prüfsumme stimmt nicht überein'}), 400
+
+    ext = os.path.splitext(session.original_filename)[1].lower()
+    stored = f'{uuid.uuid4().hex}{ext}'
+    target_dir = os.path.join(UPLOAD_BASE, folder)
+    os.makedirs(target_dir, exist_ok=True)
+    os.replace(_part_path(sid), os.path.join(target_dir, stored))
+    _hashers.pop(sid, None)
+
+    att = FileAttachment(
+        entity_type=session.entity_type, entity_id=session.entity_id,
+        original_filename=session.original_filename, stored_filename=stored,
+        file_type='pdf' if ext == '.pdf' else 'image',
+    )
+    db.session.add(att)
+    db.session.delete(session)
+    db.session.commit()
+    schedule_derivatives(folder, stored)
+    log_activity(session.user_id, 'create', 'attachment', att.id, f'Anhang zu {label} #{session.entity_id}')
+    return jsonify({**att.to_dict(), 'sha256': digest}), 201
+
+
+@upload_sessions_bp.route('/api/upload-sessions/<sid>', methods=['DELETE'])
+@jwt_required()
+def abort_upload(sid):
+    session, error = _load_session(sid)
+    if error:
+        return error
+    _discard(session)
+    db.session.commit()
+    return jsonify({'message': 'Abgebrochen'})
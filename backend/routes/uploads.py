@@ -1,10 +1,15 @@
+import mimetypes
 import os
-from flask import Blueprint, send_from_directory, abort
+from flask import Blueprint, current_app, send_file, abort
+from werkzeug.security import safe_join
+from static_files import file_etag
+from thumbnails import UPLOAD_BASE, ensure_derivative
 
 uploads_bp = Blueprint('uploads', __name__)
 
-UPLOAD_BASE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
-CATEGORIES = ['meters', 'expenses', 'recurring_costs']
+CATEGORIES = ['meters', 'expenses', 'recurring_costs', 'contacts']
+# Stored filenames are random and never rewritten, so clients may cache them indefinitely
+UPLOAD_MAX_AGE = 365 * 24 * 3600
 
 
 def init_upload_dirs():
@@ -12,12 +17,46 @@ def init_upload_dirs():
         os.makedirs(os.path.join(UPLOAD_BASE, cat), exist_ok=True)
 
 
+def _send_stored(filepath, relpath):
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        abort(404)
+    etag = file_etag(filepath, st)
+
+    accel_prefix = current_app.config.get('UPLOADS_ACCEL_REDIRECT')
+    if accel_prefix:
+        # Front proxy (nginx internal location) streams the file, incl. Range handling
+        resp = current_app.response_class(
+            mimetype=mimetypes.guess_type(filepath)[0] or 'application/octet-stream'
+        )
+        resp.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{relpath}"
+        resp.set_etag(etag)
+    else:
+        # X-Sendfile is applied by send_file when USE_X_SENDFILE is set
+        resp = send_file(filepath, conditional=True, etag=etag, max_age=UPLOAD_MAX_AGE)
+    resp.cache_control.private = True
+    resp.cache_control.public = False
+    resp.cache_control.max_age = UPLOAD_MAX_AGE
+    resp.cache_control.immutable = True
+    return resp
+
+
 @uploads_bp.route('/api/uploads/<category>/<filename>', methods=['GET'])
 def serve_upload(category, filename):
     if category not in CATEGORIES:
         abort(404)
-    directory = os.path.join(UPLOAD_BASE, category)
-    filepath = os.path.join(directory, filename)
-    if not os.path.exists(filepath):
+    filepath = safe_join(UPLOAD_BASE, category, filename)
+    if filepath is None:
+        abort(404)
+    return _send_stored(filepath, f'{category}/{filename}')
+
+
+@uploads_bp.route('/api/thumbnails/<category>/<size>/<filename>', methods=['GET'])
+def serve_thumbnail(category, size, filename):
+    if category not in CATEGORIES or safe_join(UPLOAD_BASE, category, filename) is None:
+        abort(404)
+    filepath = ensure_derivative(category, filename, size)
+    if filepath is None:
         abort(404)
-    return send_from_directory(directory, filename)
+    return _send_stored(filepath, os.path.relpath(filepath, UPLOAD_BASE).replace(os.sep, '/'))
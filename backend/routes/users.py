@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash
 from models import db, User, Property
 from activity_logger import log_activity
+import serializers
 
 users_bp = Blueprint('users', __name__)
 
@@ -12,14 +13,12 @@ users_bp = Blueprint('users', __name__)
 def list_users():
     current = User.query.get(int(get_jwt_identity()))
     if current.role == 'admin':
-        users = User.query.all()
+        users = serializers.users()
     elif current.role == 'manager':
-        users = User.query.filter(
-            db.or_(User.id == current.id, User.created_by == current.id)
-        ).all()
+        users = serializers.users(db.or_(User.id == current.id, User.created_by == current.id))
     else:
         return jsonify({'error': 'Nicht berechtigt'}), 403
-    return jsonify([u.to_dict() for u in users])
+    return jsonify(users)
 
 
 @users_bp.route('/api/users', methods=['POST'])
@@ -0,0 +1,224 @@
+import calendar
+import threading
+import time
+from datetime import date
+from models import db, RecurringCost
+from write_hooks import on_commit
+from live_updates import on_change
+
+# Recurring costs accrue monthly_amount per calendar month, pro rata by day in the
+# first and last month. CostSchedule answers ranges for one contract in O(1);
+# PropertySchedule keeps month totals of all contracts of a property with prefix
+# sums, so a range costs two edge months plus one subtraction.
+
+INTERVALS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+CACHE_TTL = 60
+
+
+def month_index(d):
+    return d.year * 12 + d.month - 1
+
+
+def month_start(k):
+    return date(k // 12, k % 12 + 1, 1)
+
+
+def days_in_month(k):
+    return calendar.monthrange(k // 12, k % 12 + 1)[1]
+
+
+def month_end(k):
+    return date(k // 12, k % 12 + 1, days_in_month(k))
+
+
+def month_fraction(start, end):
+    """Calendar months covered by the days start..end (inclusive), partial months by day."""
+    if start > end:
+        return 0.0
+    a, b = month_index(start), month_index(end)
+    if a == b:
+        return ((end - start).days + 1) / days_in_month(a)
+    head = (days_in_month(a) - start.day + 1) / days_in_month(a)
+    tail = end.day / days_in_month(b)
+    return head + tail + (b - a - 1)
+
+
+class CostSchedule:
+    __slots__ = ('cost_id', 'description', 'vendor', 'category', 'monthly_amount', 'start', 'end', 'interval',
+                 'first', 'last')
+
+    def __init__(self, cost_id, monthly_amount, start, end=None, interval='monthly', description='', vendor='',
+                 category=None):
+        self.cost_id = cost_id
+        self.description = description
+        self.vendor = vendor
+        self.category = category
+        self.monthly_amount = monthly_amount or 0.0
+        self.start = start
+        self.end = end
+        self.interval = interval if interval in INTERVALS else 'monthly'
+        self.first = month_index(start)
+        self.last = month_index(end) if end else None
+
+    def months(self, start, end):
+        """Active months within start..end (fractional)."""
+        lo = max(start, self.start)
+        hi = min(end, self.end) if self.end else end
+        return month_fraction(lo, hi)
+
+    def amount(self, start, end):
+        return self.monthly_amount * self.months(start, end)
+
+    def month_amount(self, k):
+        return self.amount(month_start(k), month_end(k))
+
+    def charges(self, start, end):
+        """Billing periods that begin within start..end, each charged for its active days."""
+        step = INTERVALS[self.interval]
+        k = self.first
+        if start > self.start:
+            # Jump to the first period that begins on or after start
+            k += -(-(month_index(start) - self.first) // step) * step
+            if month_start(k) < start:
+                k += step
+        result = []
+        while True:
+            period_start = self.start if k == self.first else month_start(k)
+            if period_start > end or (self.end and period_start > self.end):
+                return result
+            period_end = month_end(k + step - 1)
+            if self.end and period_end > self.end:
+                period_end = self.end
+            result.append({
+                'date': period_start.isoformat(),
+                'period_start': period_start.isoformat(),
+                'period_end': period_end.isoformat(),
+                'amount': round(self.amount(period_start, period_end), 2),
+            })
+            k += step
+
+
+class PropertySchedule:
+    def __init__(self, costs):
+        self.costs = costs
+        if not costs:
+            self.base, self.totals, self.prefix, self.tail = 0, [], [0.0], 0.0
+            return
+        self.base = min(c.first for c in costs)
+        top = max(c.last if c.last is not None else c.first for c in costs)
+        size = top - self.base + 1
+        # Difference array for the full months, partial first/last months added directly
+        diff = [0.0] * (size + 1)
+        totals = [0.0] * size
+        for c in costs:
+            f = c.first - self.base
+            totals[f] += c.month_amount(c.first)
+            if c.last is None:
+                diff[f + 1] += c.monthly_amount
+            elif c.last > c.first:
+                diff[f + 1] += c.monthly_amount
+                diff[c.last - self.base] -= c.monthly_amount
+                totals[c.last - self.base] += c.month_amount(c.last)
+        running = 0.0
+        for i in range(size):
+            running += diff[i]
+            totals[i] += running
+        self.totals = totals
+        # Open-ended contracts keep accruing after the last explicit month
+        self.tail = running + diff[size]
+        self.prefix = [0.0]
+        for t in totals:
+            self.prefix.append(self.prefix[-1] + t)
+
+    def month_total(self, k):
+        i = k - self.base
+        if i < 0:
+            return 0.0
+        if i >= len(self.totals):
+            return self.tail
+        return self.totals[i]
+
+    def _full_months(self, a, b):
+        """Sum of month totals for months a..b (inclusive)."""
+        if b < a:
+            return 0.0
+        size = len(self.totals)
+        lo, hi = max(a - self.base, 0), b - self.base
+        if hi < 0:
+            return 0.0
+        total = self.prefix[min(hi + 1, size)] - self.prefix[min(lo, size)]
+        if hi >= size:
+            total += self.tail * (hi - max(lo, size) + 1)
+        return total
+
+    def total(self, start, end):
+        if start > end:
+            return 0.0
+        a, b = month_index(start), month_index(end)
+        if a == b:
+            if start.day == 1 and end == month_end(a):
+                return self.month_total(a)
+            return sum(c.amount(start, end) for c in self.costs)
+        head = self.month_total(a) if start.day == 1 else sum(c.amount(start, month_end(a)) for c in self.costs)
+        tail = self.month_total(b) if end == month_end(b) else sum(c.amount(month_start(b), end) for c in self.costs)
+        return head + tail + self._full_months(a + 1, b - 1)
+
+    def monthly(self, year):
+        return [self.month_total(year * 12 + m) for m in range(12)]
+
+    def details(self, start, end):
+        result = []
+        for c in self.costs:
+            months = c.months(start, end)
+            if months <= 0:
+                continue
+            result.append({
+                'description': c.description,
+                'vendor': c.vendor,
+                'category': c.category,
+                'monthly_amount': c.monthly_amount,
+                'billing_interval': c.interval,
+                'months': round(months, 2),
+                'total': round(c.monthly_amount * months, 2),
+            })
+        return result
+
+
+def cost_schedule(cost):
+    return CostSchedule(cost.id, cost.monthly_amount, cost.start_date, cost.end_date, cost.billing_interval,
+                        cost.description, cost.vendor, cost.category)
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+_generation = 0
+
+
+def property_schedule(property_id):
+    """Cached schedule of all recurring costs of a property."""
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(property_id)
+        if hit and now - hit[0] < CACHE_TTL:
+            return hit[1]
+        generation = _generation
+    rows = db.session.query(
+        RecurringCost.id, RecurringCost.monthly_amount, RecurringCost.start_date, RecurringCost.end_date,
+        RecurringCost.billing_interval, RecurringCost.description, RecurringCost.vendor, RecurringCost.category,
+    ).filter(RecurringCost.property_id == property_id).order_by(RecurringCost.id).all()
+    schedule = PropertySchedule([CostSchedule(*row) for row in rows])
+    with _cache_lock:
+        if generation == _generation:
+            _cache[property_id] = (now, schedule)
+    return schedule
+
+
+def clear_cache():
+    global _generation
+    with _cache_lock:
+        _generation += 1
+        _cache.clear()
+
+
+on_commit(RecurringCost, clear_cache)
+on_change(RecurringCost, clear_cache)
@@ -0,0 +1,247 @@
+import html
+from models import db, Expense, RecurringCost, MeterReading
+from contact_search import TOKEN_RE, fold, query_tokens, prefix_match
+
+# Cross-entity full-text search over expenses, recurring costs and meter notes.
+# One FTS5 table holds a document per entity; rowid = entity id * 4 + type code,
+# so triggers can replace or drop a document by rowid without scanning.
+
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 200
+# Only this many matches are scored; bounds the cost of very broad prefixes
+RANK_CANDIDATES = 2000
+# Facets and total are counted over at most this many matches ('exact': False beyond)
+COUNT_CANDIDATES = 20000
+
+# entity_type -> (type code, table, title SQL, body SQL, date column, row filter)
+SOURCES = {
+    'expense': (
+        1, 'expense', "{r}.vendor",
+        "coalesce({r}.invoice_number, '') || ' ' || coalesce({r}.description, '')",
+        'invoice_date', None,
+    ),
+    'recurring_cost': (
+        2, 'recurring_cost', "{r}.description",
+        "coalesce({r}.vendor, '')",
+        'start_date', None,
+    ),
+    'meter_reading': (
+        3, 'meter_reading', "{r}.meter_type",
+        "{r}.notes",
+        'reading_date', "{r}.notes IS NOT NULL AND {r}.notes != ''",
+    ),
+}
+CODE_TO_TYPE = {src[0]: name for name, src in SOURCES.items()}
+
+FTS_TABLE = """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    title, body,
+    entity_type UNINDEXED, entity_id UNINDEXED, property_id UNINDEXED, year UNINDEXED,
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+)"""
+
+_fts_enabled = None
+
+
+def _select_sql(entity_type, r):
+    code, _, title, body, date_col, _ = SOURCES[entity_type]
+    return (
+        f"{r}.id * 4 + {code}, {title.format(r=r)}, {body.format(r=r)}, "
+        f"'{entity_type}', {r}.id, {r}.property_id, CAST(substr({r}.{date_col}, 1, 4) AS INTEGER)"
+    )
+
+
+def _trigger_sql(entity_type):
+    code, table, _, _, _, row_filter = SOURCES[entity_type]
+    insert = (
+        'INSERT INTO search_index(rowid, title, body, entity_type, entity_id, property_id, year) '
+        f'SELECT {_select_sql(entity_type, "new")}'
+    )
+    if row_filter:
+        insert += f' WHERE {row_filter.format(r="new")}'
+    delete = f'DELETE FROM search_index WHERE rowid = old.id * 4 + {code}'
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS search_{table}_ai AFTER INSERT ON {table} BEGIN {insert}; END',
+        f'CREATE TRIGGER IF NOT EXISTS search_{table}_ad AFTER DELETE ON {table} BEGIN {delete}; END',
+        f'CREATE TRIGGER IF NOT EXISTS search_{table}_au AFTER UPDATE ON {table} BEGIN {delete}; {insert}; END',
+    ]
+
+
+def _fill_sql(entity_type):
+    _, table, _, _, _, row_filter = SOURCES[entity_type]
+    sql = (
+        'INSERT INTO search_index(rowid, title, body, entity_type, entity_id, property_id, year) '
+        f'SELECT {_select_sql(entity_type, table)} FROM {table}'
+    )
+    if row_filter:
+        sql += f' WHERE {row_filter.format(r=table)}'
+    return sql
+
+
+def init_search_index():
+    """Create the index and its triggers (idempotent); fills it on first run."""
+    global _fts_enabled
+    if db.engine.dialect.name != 'sqlite':
+        _fts_enabled = False
+        return
+    with db.engine.begin() as conn:
+        existed = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='search_index'"
+        ).first() is not None
+        try:
+            conn.exec_driver_sql(FTS_TABLE)
+        except Exception:
+            # SQLite compiled without FTS5
+            _fts_enabled = False
+            return
+        for entity_type in SOURCES:
+            for stmt in _trigger_sql(entity_type):
+                conn.exec_driver_sql(stmt)
+        if not existed:
+            for entity_type in SOURCES:
+                conn.exec_driver_sql(_fill_sql(entity_type))
+    _fts_enabled = True
+
+
+def rebuild_search_index():
+    """Drop and refill all documents; returns the number of indexed rows."""
+    if not _fts_enabled:
+        return 0
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('DELETE FROM search_index')
+        for entity_type in SOURCES:
+            conn.exec_driver_sql(_fill_sql(entity_type))
+        return conn.exec_driver_sql('SELECT count(*) FROM search_index').scalar()
+
+
+def _filters(property_ids, entity_type, property_id, year):
+    clauses, params = [], []
+    if property_ids is not None:
+        clauses.append(f"property_id IN ({', '.join('?' * len(property_ids))})")
+        params.extend(property_ids)
+    if entity_type:
+        clauses.append('entity_type = ?')
+        params.append(entity_type)
+    if property_id:
+        clauses.append('property_id = ?')
+        params.append(property_id)
+    if year:
+        clauses.append('year = ?')
+        params.append(year)
+    return ''.join(f' AND {c}' for c in clauses), params
+
+
+def _snippet(text, tokens, width=12):
+    """Up to width words around the first match as HTML: text escaped, matching words wrapped in <b>."""
+    words = text.split()
+    marked = [any(fold(part).startswith(t) for part in TOKEN_RE.findall(w) for t in tokens) for w in words]
+    first = marked.index(True) if True in marked else 0
+    start = max(0, min(first - width // 3, len(words) - width))
+    out = [f'<b>{html.escape(w)}</b>' if m else html.escape(w)
+           for w, m in zip(words[start:start + width], marked[start:start + width])]
+    return ('… ' if start else '') + ' '.join(out) + (' …' if start + width < len(words) else '')
+
+
+def search(q, property_ids=None, entity_type=None, property_id=None, year=None,
+           limit=DEFAULT_LIMIT, offset=0, facets=True):
+    """Ranked hits plus facet counts; property_ids=None means no access restriction."""
+    tokens = query_tokens(q)
+    empty = {'total': 0, 'exact': True, 'hits': [], 'facets': {'property_id': {}, 'entity_type': {}, 'year': {}}}
+    if not tokens or property_ids == []:
+        return empty
+    if not _fts_enabled:
+        return _search_fallback(q, property_ids, entity_type, property_id, year, limit, offset)
+
+    match = prefix_match(tokens)
+    where, params = _filters(property_ids, entity_type, property_id, year)
+    with db.engine.connect() as conn:
+        ranked = conn.exec_driver_sql(
+            f'SELECT rowid, score FROM ('
+            f'  SELECT rowid, bm25(search_index, 5.0, 1.0) AS score'
+            f'  FROM search_index WHERE search_index MATCH ?{where} LIMIT {RANK_CANDIDATES}'
+            f') ORDER BY score LIMIT ? OFFSET ?',
+            (match, *params, limit, offset),
+        ).fetchall()
+        hits = []
+        if ranked:
+            # Plain rowid lookup: snippet() under a prefix MATCH re-merges the prefix doclists
+            docs = {row[0]: row[1:] for row in conn.exec_driver_sql(
+                f"SELECT rowid, entity_type, entity_id, property_id, year, title, body FROM search_index "
+                f"WHERE rowid IN ({', '.join('?' * len(ranked))})",
+                tuple(r[0] for r in ranked),
+            )}
+            for rowid, score in ranked:
+                et, eid, pid, yr, title, body = docs[rowid]
+                hits.append({
+                    'entity_type': et, 'entity_id': eid, 'property_id': pid, 'year': yr,
+                    'title': title, 'snippet': _snippet(body or '', tokens), 'score': round(-score, 6),
+                })
+        result = {'hits': hits}
+        if not facets:
+            total = conn.exec_driver_sql(
+                f'SELECT count(*) FROM (SELECT 1 FROM search_index WHERE search_index MATCH ?{where} '
+                f'LIMIT {COUNT_CANDIDATES + 1})', (match, *params)
+            ).scalar()
+            result['total'] = min(total, COUNT_CANDIDATES)
+            result['exact'] = total <= COUNT_CANDIDATES
+            return result
+        # One grouped scan; each facet is then summed ignoring its own filter
+        # so the client can switch between values
+        a_where, a_params = _filters(property_ids, None, None, None)
+        groups = conn.exec_driver_sql(
+            f'SELECT property_id, entity_type, year, count(*) FROM ('
+            f'  SELECT property_id, entity_type, year FROM search_index'
+            f'  WHERE search_index MATCH ?{a_where} LIMIT {COUNT_CANDIDATES + 1}'
+            f') GROUP BY property_id, entity_type, year',
+            (match, *a_params),
+        ).fetchall()
+    wanted = {'property_id': property_id, 'entity_type': entity_type, 'year': year}
+    result['facets'] = {column: {} for column in wanted}
+    result['total'] = 0
+    result['exact'] = sum(g[3] for g in groups) <= COUNT_CANDIDATES
+    for pid, et, yr, n in groups:
+        values = {'property_id': pid, 'entity_type': et, 'year': yr}
+        misses = [c for c, v in wanted.items() if v and values[c] != v]
+        if not misses:
+            result['total'] += n
+        for column in wanted:
+            if not misses or misses == [column]:
+                key = str(values[column])
+                result['facets'][column][key] = result['facets'][column].get(key, 0) + n
+    result['total'] = min(result['total'], COUNT_CANDIDATES)
+    return result
+
+
+def _search_fallback(q, property_ids, entity_type, property_id, year, limit, offset):
+    # ILIKE scan for databases without FTS5; facets are computed from the hits
+    like = f'%{q}%'
+    tokens = query_tokens(q)
+    specs = {
+        'expense': (Expense, Expense.vendor, Expense.invoice_date,
+                    [Expense.vendor, Expense.invoice_number, Expense.description], Expense.description),
+        'recurring_cost': (RecurringCost, RecurringCost.description, RecurringCost.start_date,
+                           [RecurringCost.description, RecurringCost.vendor], RecurringCost.vendor),
+        'meter_reading': (MeterReading, MeterReading.meter_type, MeterReading.reading_date,
+                          [MeterReading.notes], MeterReading.notes),
+    }
+    hits = []
+    for et, (model, title_col, date_col, cols, body_col) in specs.items():
+        if entity_type and et != entity_type:
+            continue
+        query = db.session.query(model.id, model.property_id, date_col, title_col, body_col).filter(
+            db.or_(*[c.ilike(like) for c in cols])
+        )
+        if property_ids is not None:
+            query = query.filter(model.property_id.in_(property_ids))
+        if property_id:
+            query = query.filter(model.property_id == property_id)
+        for eid, pid, d, title, body in query.limit(MAX_LIMIT * 5):
+            if year and d.year != year:
+                continue
+            hits.append({'entity_type': et, 'entity_id': eid, 'property_id': pid, 'year': d.year,
+                         'title': title, 'snippet': _snippet(body or '', tokens), 'score': 0.0})
+    facets = {'property_id': {}, 'entity_type': {}, 'year': {}}
+    for h in hits:
+        for column in facets:
+            key = str(h[column])
+            facets[column][key] = facets[column].get(key, 0) + 1
+    return {'total': len(hits), 'exact': len(hits) < MAX_LIMIT * 5, 'hits': hits[offset:offset + limit], 'facets': facets}
@@ -0,0 +1,219 @@
+from models import (db, User, Property, MeterReading, Meter, Tariff, Contact, Expense, RecurringCost, FileAttachment,
+                    ActivityLog, user_property)
+
+# Column projections for list endpoints and the backup. Each function returns the
+# same dicts as the model's to_dict() (keep both in sync; responses must not change)
+# but selects only the needed columns as tuples: no ORM objects, no lazy loads of
+# contacts or user properties, one grouped query for attachment counts.
+#
+# Dates are read as the stored ISO text, which is what isoformat() returns for them,
+# so they are neither parsed nor formatted again.
+
+
+def _text(column):
+    return db.type_coerce(column, db.String)
+
+
+def _query(columns, criteria, order_by):
+    return db.session.query(*columns).filter(*criteria).order_by(*order_by)
+
+
+def _photo_urls(d, folder, filename):
+    if filename:
+        d['photo_url'] = f'/api/uploads/{folder}/{filename}'
+        d['thumbnail_url'] = f'/api/thumbnails/{folder}/thumb/{filename}'
+        d['preview_url'] = f'/api/thumbnails/{folder}/preview/{filename}'
+    return d
+
+
+def attachment_counts(entity_type, ids=None, property_id=None):
+    """entity id -> number of attachments, for the given ids or all entities of a property."""
+    query = db.session.query(FileAttachment.entity_id, db.func.count(FileAttachment.id)).filter(
+        FileAttachment.entity_type == entity_type)
+    if property_id is not None:
+        model = Expense if entity_type == 'expense' else RecurringCost
+        query = query.filter(FileAttachment.entity_id.in_(
+            db.select(model.id).where(model.property_id == property_id).scalar_subquery()))
+    elif ids is not None:
+        query = query.filter(FileAttachment.entity_id.in_(ids))
+    return dict(query.group_by(FileAttachment.entity_id))
+
+
+def properties(*criteria, order_by=()):
+    rows = _query((Property.id, Property.name, Property.address, Property.description, Property.created_at),
+                  criteria, order_by)
+    return [{
+        'id': pid,
+        'name': name,
+        'address': address,
+        'description': description,
+        'created_at': created_at.isoformat(),
+    } for pid, name, address, description, created_at in rows]
+
+
+def meter_readings(*criteria, order_by=()):
+    rows = _query((MeterReading.id, MeterReading.property_id, MeterReading.meter_type, MeterReading.reading_value,
+                   _text(MeterReading.reading_date), MeterReading.notes, MeterReading.photo_filename),
+                  criteria, order_by)
+    return [_photo_urls({
+        'id': rid,
+        'property_id': pid,
+        'meter_type': meter_type,
+        'reading_value': value,
+        'reading_date': reading_date,
+        'notes': notes,
+    }, 'meters', photo) for rid, pid, meter_type, value, reading_date, notes, photo in rows]
+
+
+def meters(*criteria, order_by=()):
+    rows = _query((Meter.id, Meter.property_id, Meter.meter_type, Meter.serial_number, _text(Meter.installed_on),
+                   _text(Meter.removed_on), Meter.initial_value, Meter.final_value, Meter.rollover_limit, Meter.notes),
+                  criteria, order_by)
+    return [{
+        'id': mid,
+        'property_id': pid,
+        'meter_type': meter_type,
+        'serial_number': serial_number,
+        'installed_on': installed_on,
+        'removed_on': removed_on,
+        'initial_value': initial_value,
+        'final_value': final_value,
+        'rollover_limit': rollover_limit,
+        'notes': notes,
+    } for mid, pid, meter_type, serial_number, installed_on, removed_on, initial_value, final_value, rollover_limit,
+        notes in rows]
+
+
+def tariffs(*criteria, order_by=()):
+    rows = _query((Tariff.id, Tariff.property_id, Tariff.tariff_type, Tariff.price_per_unit,
+                   Tariff.base_cost_monthly, _text(Tariff.valid_from), _text(Tariff.valid_to)),
+                  criteria, order_by)
+    return [{
+        'id': tid,
+        'property_id': pid,
+        'tariff_type': tariff_type,
+        'price_per_unit': price,
+        'base_cost_monthly': base_cost,
+        'valid_from': valid_from,
+        'valid_to': valid_to,
+    } for tid, pid, tariff_type, price, base_cost, valid_from, valid_to in rows]
+
+
+def contacts(*criteria, order_by=()):
+    rows = _query((Contact.id, Contact.name, Contact.company, Contact.address, Contact.phone, Contact.email,
+                   Contact.website, Contact.tax_id, Contact.notes, Contact.created_at, Contact.photo_filename),
+                  criteria, order_by)
+    return [_photo_urls({
+        'id': cid,
+        'name': name,
+        'company': company,
+        'address': address,
+        'phone': phone,
+        'email': email,
+        'website': website,
+        'tax_id': tax_id,
+        'notes': notes,
+        'created_at': created_at.isoformat(),
+    }, 'contacts', photo) for cid, name, company, address, phone, email, website, tax_id, notes, created_at, photo
+        in rows]
+
+
+def expenses(*criteria, order_by=(), attachments=None):
+    """attachments: id -> count (see attachment_counts) to add 'attachment_count'."""
+    rows = _query((Expense.id, Expense.property_id, Expense.contact_id, Contact.name, Expense.vendor,
+                   _text(Expense.invoice_date), Expense.invoice_number, Expense.net_amount, Expense.vat_rate,
+                   Expense.vat_amount, Expense.gross_amount, Expense.description, Expense.category),
+                  criteria, order_by).outerjoin(Contact, Contact.id == Expense.contact_id)
+    result = []
+    for (eid, pid, contact_id, contact_name, vendor, invoice_date, invoice_number, net, vat_rate, vat, gross,
+         description, category) in rows:
+        d = {
+            'id': eid,
+            'property_id': pid,
+            'contact_id': contact_id,
+            'contact_name': contact_name,
+            'vendor': vendor,
+            'invoice_date': invoice_date,
+            'invoice_number': invoice_number,
+            'net_amount': net,
+            'vat_rate': vat_rate,
+            'vat_amount': vat,
+            'gross_amount': gross,
+            'description': description,
+            'category': category,
+        }
+        if attachments is not None:
+            d['attachment_count'] = attachments.get(eid, 0)
+        result.append(d)
+    return result
+
+
+def recurring_costs(*criteria, order_by=(), attachments=None):
+    rows = _query((RecurringCost.id, RecurringCost.property_id, RecurringCost.contact_id, Contact.name,
+                   RecurringCost.description, RecurringCost.vendor, RecurringCost.monthly_amount,
+                   RecurringCost.vat_rate, RecurringCost.net_amount, RecurringCost.gross_amount,
+                   _text(RecurringCost.start_date), _text(RecurringCost.end_date), RecurringCost.category,
+                   RecurringCost.billing_interval),
+                  criteria, order_by).outerjoin(Contact, Contact.id == RecurringCost.contact_id)
+    result = []
+    for (cid, pid, contact_id, contact_name, description, vendor, monthly, vat_rate, net, gross, start_date,
+         end_date, category, interval) in rows:
+        d = {
+            'id': cid,
+            'property_id': pid,
+            'contact_id': contact_id,
+            'contact_name': contact_name,
+            'description': description,
+            'vendor': vendor,
+            'monthly_amount': monthly,
+            'vat_rate': vat_rate,
+            'net_amount': net,
+            'gross_amount': gross,
+            'start_date': start_date,
+            'end_date': end_date,
+            'category': category,
+            'billing_interval': interval,
+        }
+        if attachments is not None:
+            d['attachment_count'] = attachments.get(cid, 0)
+        result.append(d)
+    return result
+
+
+def users(*criteria, order_by=()):
+    rows = _query((User.id, User.username, User.role, User.created_by, User.created_at), criteria, order_by).all()
+    property_ids = {}
+    if rows:
+        assignments = db.session.query(user_property.c.user_id, user_property.c.property_id).order_by(
+            user_property.c.user_id, user_property.c.property_id)
+        if criteria:
+            assignments = assignments.filter(user_property.c.user_id.in_([r[0] for r in rows]))
+        for uid, pid in assignments:
+            property_ids.setdefault(uid, []).append(pid)
+    return [{
+        'id': uid,
+        'username': username,
+        'role': role,
+        'is_admin': role == 'admin',
+        'created_by': created_by,
+        'created_at': created_at.isoformat(),
+        'property_ids': property_ids.get(uid, []),
+    } for uid, username, role, created_by, created_at in rows]
+
+
+def activity_log(query):
+    """Entries of an already filtered and paged ActivityLog query."""
+    rows = query.with_entities(ActivityLog.id, ActivityLog.user_id, ActivityLog.username, ActivityLog.action,
+                               ActivityLog.entity_type, ActivityLog.entity_id, ActivityLog.details,
+                               ActivityLog.ip_address, ActivityLog.timestamp)
+    return [{
+        'id': lid,
+        'user_id': uid,
+        'username': username,
+        'action': action,
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'details': details,
+        'ip_address': ip_address,
+        'timestamp': timestamp.isoformat(),
+    } for lid, uid, username, action, entity_type, entity_id, details, ip_address, timestamp in rows]
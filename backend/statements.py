@@ -0,0 +1,420 @@
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime
+from models import (db, Property, Expense, RecurringCost, FileAttachment, StatementJob,
+                    StatementSnapshot, ClosedYear)
+from schedules import CostSchedule, PropertySchedule
+from thumbnails import UPLOAD_BASE
+from utils import get_tariffs, consumption_costs
+from meter_types import registry
+from consumption import load_series
+import serializers
+
+# Annual statements (Nebenkostenabrechnung) for many properties at once. A job loads
+# tariffs and recurring costs of all its properties once, then consumption series,
+# expenses and attachments chunk by chunk with a few bulk queries. Computing and rendering
+# (JSON, CSV, PDF) runs in a process pool without database access; the results are
+# stored as a new StatementSnapshot version per property. GET /api/reports/annual
+# uses the same build_statement(), so a snapshot matches what the UI showed.
+# Closing a fiscal year (close_year) pins one snapshot version; the annual report
+# of a closed year is served from it until the year is reopened.
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_DIR = os.path.join(UPLOAD_BASE, 'statements')
+CHUNK = 50
+WORKERS = int(os.environ.get('STATEMENT_WORKERS', '0')) or os.cpu_count() or 1
+
+_runner = None
+
+
+def _period(year):
+    return date(year, 1, 1), date(year, 12, 31)
+
+
+def load_shared(property_ids, year):
+    """Tariffs valid in the year (the latest per type) and recurring costs per property, and the type registry."""
+    start, end = _period(year)
+    tariffs = get_tariffs(property_ids, start, end)
+    types = registry()
+    types = {'meter_types': list(types.meter_types), 'tariff_meters': types.tariff_meters(), 'labels': types.labels()}
+    recurring = {}
+    for pid, *row in db.session.query(
+        RecurringCost.property_id, RecurringCost.id, RecurringCost.monthly_amount, RecurringCost.start_date,
+        RecurringCost.end_date, RecurringCost.billing_interval, RecurringCost.description, RecurringCost.vendor,
+        RecurringCost.category,
+    ).filter(RecurringCost.property_id.in_(property_ids)).order_by(RecurringCost.id):
+        recurring.setdefault(pid, []).append(tuple(row))
+    return tariffs, recurring, types
+
+
+def load_inputs(property_ids, year, shared=None):
+    """Everything build_statement() needs, per property id, as plain data."""
+    start, end = _period(year)
+    tariffs, recurring, types = shared or load_shared(property_ids, year)
+    consumption = {}
+    for pid, by_type in load_series(property_ids).items():
+        for mt, series in by_type.items():
+            data = series.consumption(start, end)
+            if data:
+                consumption.setdefault(pid, {})[mt] = data
+    expenses = serializers.expenses(
+        Expense.property_id.in_(property_ids), Expense.invoice_date >= start, Expense.invoice_date <= end,
+        order_by=[Expense.property_id, Expense.invoice_date, Expense.id],
+    )
+    attachments = {}
+    ids = [e['id'] for e in expenses]
+    for i in range(0, len(ids), 500):
+        for a in FileAttachment.query.filter(
+            FileAttachment.entity_type == 'expense', FileAttachment.entity_id.in_(ids[i:i + 500])
+        ).order_by(FileAttachment.entity_id, FileAttachment.id):
+            attachments.setdefault(a.entity_id, []).append(a.to_dict())
+    by_property = {}
+    for e in expenses:
+        atts = attachments.get(e['id'], [])
+        e['attachment_count'] = len(atts)
+        if atts:
+            e['attachments'] = atts
+        by_property.setdefault(e['property_id'], []).append(e)
+    return {pid: {
+        'consumption': consumption.get(pid, {}),
+        'tariffs': tariffs.get(pid, {}),
+        'recurring': recurring.get(pid, []),
+        'expenses': by_property.get(pid, []),
+        'types': types,
+    } for pid in property_ids}
+
+
+def build_statement(pid, year, inputs):
+    """The annual statement of one property (the body of GET /api/reports/annual)."""
+    start, end = _period(year)
+    types = inputs['types']
+    consumption = {mt: inputs['consumption'][mt] for mt in types['meter_types'] if mt in inputs['consumption']}
+    costs = consumption_costs(consumption, inputs['tariffs'], types['tariff_meters'], start, end)
+
+    schedule = PropertySchedule([CostSchedule(*row) for row in inputs['recurring']])
+    recurring_total = round(schedule.total(start, end), 2)
+    expenses = inputs['expenses']
+    expenses_total = round(sum(e['gross_amount'] or 0 for e in expenses), 2)
+    usage_total = sum(c.get('total_cost', 0) for c in costs.values())
+    return {
+        'year': year,
+        'property_id': pid,
+        'consumption': consumption,
+        'costs': costs,
+        'recurring_costs': {'total': recurring_total, 'details': schedule.details(start, end)},
+        'expenses': {'total': expenses_total, 'details': expenses},
+        'grand_total': round(usage_total + recurring_total + expenses_total, 2),
+    }
+
+
+def _eur(value):
+    return f'{value:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def _lines(data, header, labels):
+    """(section, position, detail, amount) rows shared by CSV and PDF."""
+    rows = []
+    for key, cost in data['costs'].items():
+        rows.append(('Verbrauch', labels.get(key, key),
+                     f'{cost["consumption"]} x {cost["price_per_unit"]} + {cost["months"]} x '
+                     f'{cost["base_cost_monthly"]} Grundkosten', cost['total_cost']))
+    for d in data['recurring_costs']['details']:
+        position = d['description'] + (f' ({d["vendor"]})' if d['vendor'] else '')
+        rows.append(('Laufende Kosten', position, f'{d["months"]} Monate x {d["monthly_amount"]}', d['total']))
+    for e in data['expenses']['details']:
+        position = ' '.join(filter(None, [e['vendor'], e['invoice_number']]))
+        rows.append(('Ausgaben', position, f'{e["invoice_date"]} {e["description"] or ""}'.strip(),
+                     e['gross_amount'] or 0))
+    rows.append(('Summe', header.get('name') or '', '', data['grand_total']))
+    return rows
+
+
+def render_csv(data, header, labels):
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=';')
+    writer.writerow(['Jahresabrechnung', data['year'], header.get('name') or '', header.get('address') or ''])
+    writer.writerow(['Abschnitt', 'Position', 'Berechnung', 'Betrag'])
+    for section, position, detail, amount in _lines(data, header, labels):
+        writer.writerow([section, position, detail, _eur(amount)])
+    return out.getvalue()
+
+
+def render_pdf(data, header, labels):
+    """Plain A4 statement; None without the optional PyMuPDF."""
+    try:
+        import pymupdf
+    except ImportError:
+        return None
+    regular, bold = pymupdf.Font('helv'), pymupdf.Font('hebo')
+    doc = pymupdf.open()
+    # One TextWriter per page, written at the end: far cheaper than insert_text per line
+    writers = [pymupdf.TextWriter(pymupdf.paper_rect('a4'))]
+    y = 60
+
+    def line(text, x=50, size=9, font=regular, right=False):
+        if right:
+            x -= font.text_length(text, fontsize=size)
+        writers[-1].append((x, y), text, font=font, fontsize=size)
+
+    def advance(dy):
+        nonlocal y
+        y += dy
+        if y > 800:
+            writers.append(pymupdf.TextWriter(pymupdf.paper_rect('a4')))
+            y = 60
+
+    line(f'Jahresabrechnung {data["year"]}', size=16, font=bold)
+    advance(20)
+    line(' - '.join(filter(None, [header.get('name'), header.get('address')])), size=10)
+    advance(24)
+    section = None
+    for sec, position, detail, amount in _lines(data, header, labels):
+        if sec != section:
+            section = sec
+            advance(6)
+            line(sec, size=11, font=bold)
+            advance(15)
+        font = bold if sec == 'Summe' else regular
+        line(position[:60], font=font)
+        line(detail[:55], x=330, size=7)
+        line(f'{_eur(amount)} EUR', x=545, font=font, right=True)
+        advance(13)
+    for writer in writers:
+        writer.write_text(doc.new_page(width=595, height=842))
+    pdf = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return pdf
+
+
+def render_statement(pid, year, inputs, header):
+    """Worker task: (statement JSON, grand total, CSV, PDF bytes or None)."""
+    data = build_statement(pid, year, inputs)
+    labels = inputs['types']['labels']
+    return (json.dumps(data, ensure_ascii=False, separators=(',', ':')), data['grand_total'],
+            render_csv(data, header, labels), render_pdf(data, header, labels))
+
+
+def _pool(workers, size):
+    if workers > 1 and size > 1:
+        # spawn: the caller may be a threaded web worker with open database connections
+        return ProcessPoolExecutor(min(workers, size), mp_context=multiprocessing.get_context('spawn'))
+    return ThreadPoolExecutor(max_workers=1)
+
+
+def _save(pid, year, version, job_id, result):
+    """Write rendered files and add the StatementSnapshot row (not committed)."""
+    data, grand_total, csv_text, pdf = result
+    stem = f'{pid}_{year}_v{version}_{job_id or "manual"}'
+    os.makedirs(STATEMENT_DIR, exist_ok=True)
+    with open(os.path.join(STATEMENT_DIR, f'{stem}.csv'), 'w', encoding='utf-8') as f:
+        f.write(csv_text)
+    if pdf is not None:
+        with open(os.path.join(STATEMENT_DIR, f'{stem}.pdf'), 'wb') as f:
+            f.write(pdf)
+    snapshot = StatementSnapshot(
+        property_id=pid, year=year, version=version, job_id=job_id, data=data,
+        grand_total=grand_total, csv_filename=f'{stem}.csv',
+        pdf_filename=f'{stem}.pdf' if pdf is not None else None,
+    )
+    db.session.add(snapshot)
+    return snapshot
+
+
+def statement_files(snapshots):
+    """Paths of the CSV and PDF files of StatementSnapshot rows."""
+    return [os.path.join(STATEMENT_DIR, name) for snap in snapshots
+            for name in (snap.csv_filename, snap.pdf_filename) if name]
+
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def purge_orphans():
+    """Drop snapshots and closures left by properties deleted before they cascaded.
+
+    SQLite reuses the highest id, so rows created before their property are stale too.
+    """
+    stale = StatementSnapshot.query.outerjoin(Property, Property.id == StatementSnapshot.property_id).filter(
+        db.or_(Property.id.is_(None), StatementSnapshot.created_at < Property.created_at)).all()
+    if not stale:
+        return
+    ids = [snap.id for snap in stale]
+    paths = statement_files(stale)
+    ClosedYear.query.filter(ClosedYear.snapshot_id.in_(ids)).delete(synchronize_session=False)
+    StatementSnapshot.query.filter(StatementSnapshot.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+    remove_files(paths)
+    logger.warning('Removed %d statement snapshots of deleted properties', len(ids))
+
+
+def _store(job, futures):
+    """Write the finished statements of one chunk as new snapshot versions."""
+    pids = list(futures)
+    versions = dict(db.session.query(StatementSnapshot.property_id, db.func.max(StatementSnapshot.version)).filter(
+        StatementSnapshot.year == job.year, StatementSnapshot.property_id.in_(pids),
+    ).group_by(StatementSnapshot.property_id))
+    errors = []
+    for pid in pids:
+        try:
+            result = futures[pid].result()
+        except Exception as e:
+            logger.exception('Statement for property %s failed', pid)
+            job.failed += 1
+            errors.append(f'{pid}: {e}')
+            continue
+        _save(pid, job.year, versions.get(pid, 0) + 1, job.id, result)
+        job.done += 1
+    if errors:
+        job.error = '\n'.join(filter(None, [job.error] + errors))
+    db.session.commit()
+
+
+def run_job(job_id, workers=WORKERS, progress=None):
+    """Compute all statements of a job; progress(job) is called after every chunk."""
+    job = db.session.get(StatementJob, job_id)
+    job.status = 'running'
+    job.started_at = datetime.utcnow()
+    db.session.commit()
+    property_ids = json.loads(job.property_ids)
+    headers = {pid: {'name': name, 'address': address} for pid, name, address in
+               db.session.query(Property.id, Property.name, Property.address).filter(Property.id.in_(property_ids))}
+    property_ids = [pid for pid in property_ids if pid in headers]  # deleted since the job was queued
+    job.total = len(property_ids)
+    shared = load_shared(property_ids, job.year)
+
+    with _pool(workers, len(property_ids)) as pool:
+        pending = None
+        for i in range(0, len(property_ids), CHUNK):
+            chunk = property_ids[i:i + CHUNK]
+            inputs = load_inputs(chunk, job.year, shared)
+            futures = {pid: pool.submit(render_statement, pid, job.year, inputs[pid], headers[pid]) for pid in chunk}
+            # Store the previous chunk while the pool works on this one
+            if pending:
+                _store(job, pending)
+                if progress:
+                    progress(job)
+            pending = futures
+        if pending:
+            _store(job, pending)
+            if progress:
+                progress(job)
+
+    if job.failed:
+        job.status = 'partial' if job.done else 'failed'
+    else:
+        job.status = 'done'
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return job
+
+
+def create_job(year, property_ids, user_id):
+    job = StatementJob(year=year, property_ids=json.dumps(property_ids), total=len(property_ids), created_by=user_id)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def _run_logged(app, job_id):
+    with app.app_context():
+        try:
+            run_job(job_id)
+        except Exception as e:
+            logger.exception('Statement job %s failed', job_id)
+            db.session.rollback()
+            job = db.session.get(StatementJob, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def submit_job(app, job_id):
+    """Run a job in the background, one job at a time per process."""
+    global _runner
+    if _runner is None:
+        _runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='statements')
+    _runner.submit(_run_logged, app, job_id)
+
+
+def freeze_statement(pid, year):
+    """Compute the statement from live data and store it as the next snapshot version (not committed)."""
+    prop = db.session.get(Property, pid)
+    header = {'name': prop.name, 'address': prop.address}
+    version = db.session.query(db.func.max(StatementSnapshot.version)).filter_by(property_id=pid, year=year).scalar()
+    result = render_statement(pid, year, load_inputs([pid], year)[pid], header)
+    return _save(pid, year, (version or 0) + 1, None, result)
+
+
+def closed_year(pid, year):
+    return ClosedYear.query.filter_by(property_id=pid, year=year).first()
+
+
+def close_year(pid, year, user_id):
+    """Freeze the annual statement of a property; returns the ClosedYear."""
+    closure = ClosedYear(property_id=pid, year=year, snapshot=freeze_statement(pid, year), closed_by=user_id)
+    db.session.add(closure)
+    db.session.commit()
+    return closure
+
+
+def recompute_year(closure, user_id):
+    """Replace the frozen statement of a closed year with one from current data."""
+    closure.snapshot = freeze_statement(closure.property_id, closure.year)
+    closure.closed_by = user_id
+    closure.closed_at = datetime.utcnow()
+    db.session.commit()
+    return closure
+
+
+def reopen_year(closure):
+    # The snapshot stays as an ordinary version
+    db.session.delete(closure)
+    db.session.commit()
+
+
+def _totals(data):
+    totals = {
+        'grand_total': data['grand_total'],
+        'recurring_costs.total': data['recurring_costs']['total'],
+        'expenses.total': data['expenses']['total'],
+    }
+    for mt, cons in data['consumption'].items():
+        totals[f'consumption.{mt}.total'] = cons['total']
+    for key, cost in data['costs'].items():
+        totals[f'costs.{key}.total_cost'] = cost['total_cost']
+    return totals
+
+
+def diff_statement(frozen, live):
+    """Differences between two statements: changed totals and added/removed/changed expenses."""
+    a, b = _totals(frozen), _totals(live)
+    fields = [{'field': key, 'frozen': a.get(key), 'live': b.get(key)}
+              for key in sorted(a.keys() | b.keys()) if a.get(key) != b.get(key)]
+    old = {e['id']: e for e in frozen['expenses']['details']}
+    new = {e['id']: e for e in live['expenses']['details']}
+    expenses = {
+        'added': sorted(new.keys() - old.keys()),
+        'removed': sorted(old.keys() - new.keys()),
+        'changed': sorted(eid for eid in old.keys() & new.keys()
+                          if (old[eid]['gross_amount'], old[eid]['invoice_date'])
+                          != (new[eid]['gross_amount'], new[eid]['invoice_date'])),
+    }
+    return {
+        'changed': bool(fields or any(expenses.values())),
+        'fields': fields,
+        'expenses': expenses,
+    }
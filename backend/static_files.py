@@ -0,0 +1,94 @@
+import hashlib
+import mimetypes
+import os
+import re
+from functools import lru_cache
+from flask import request, send_file, abort
+
+# Build output with a content hash in the filename, e.g. static/js/main.3f2a91bc.js
+HASHED_ASSET = re.compile(r'\.[0-9a-f]{8,}(\.chunk)?\.[A-Za-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+DEFAULT_MAX_AGE = 3600
+# Preferred order when the client accepts several encodings
+PRECOMPRESSED = [('br', '.br'), ('gzip', '.gz')]
+
+
+@lru_cache(maxsize=4096)
+def _hash_file(filepath, mtime_ns, size):
+    h = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()[:32]
+
+
+def file_etag(filepath, st=None):
+    """Content-hash ETag, cached per (path, mtime, size)."""
+    st = st or os.stat(filepath)
+    return _hash_file(filepath, st.st_mtime_ns, st.st_size)
+
+
+class StaticFiles:
+    """Serves the frontend build from an index built once instead of stat'ing per request."""
+
+    def __init__(self, root, reload=False):
+        self.root = root
+        self.reload = reload
+        self._index = None
+
+    def _build_index(self):
+        index = {}
+        variants = {}
+        if os.path.isdir(self.root):
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    full = os.path.join(dirpath, name)
+                    rel = os.path.relpath(full, self.root).replace(os.sep, '/')
+                    for encoding, suffix in PRECOMPRESSED:
+                        if rel.endswith(suffix):
+                            variants.setdefault(rel[:-len(suffix)], {})[encoding] = full
+                            break
+                    else:
+                        index[rel] = full
+        return {rel: (full, variants.get(rel, {})) for rel, full in index.items()}
+
+    @property
+    def index(self):
+        if self._index is None or self.reload:
+            self._index = self._build_index()
+        return self._index
+
+    def serve(self, path):
+        entry = self.index.get(path) if path else None
+        if entry is None:
+            # Client-side routes fall back to the SPA shell
+            path = 'index.html'
+            entry = self.index.get(path)
+            if entry is None:
+                abort(404)
+        filepath, variants = entry
+
+        encoding = None
+        for enc, _ in PRECOMPRESSED:
+            if enc in variants and request.accept_encodings[enc] > 0:
+                encoding = enc
+                filepath = variants[enc]
+                break
+
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        immutable = bool(HASHED_ASSET.search(path))
+        if path == 'index.html':
+            max_age = None
+        else:
+            max_age = IMMUTABLE_MAX_AGE if immutable else DEFAULT_MAX_AGE
+
+        resp = send_file(filepath, mimetype=mimetype, conditional=True, etag=file_etag(filepath), max_age=max_age)
+        if path == 'index.html':
+            resp.cache_control.no_cache = True
+        elif immutable:
+            resp.cache_control.immutable = True
+        if variants:
+            resp.vary.add('Accept-Encoding')
+        if encoding:
+            resp.headers['Content-Encoding'] = encoding
+        return resp
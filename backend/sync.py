@@ -0,0 +1,240 @@
+import zlib
+from models import db, ChangeEvent, Property, MeterReading, Tariff, Contact
+from importers import parse_date, parse_number
+from meter_types import meter_type_keys
+import serializers
+
+# Delta sync for offline clients. The version is the id of the last ChangeEvent
+# (see live_updates), which grows with every committed write. A token also carries
+# a hash of the property scope it was issued for: when access changes, or when the
+# events after it were pruned, the next sync returns a full snapshot instead.
+
+SYNC_TYPES = {
+    'property': Property,
+    'meter_reading': MeterReading,
+    'tariff': Tariff,
+    'contact': Contact,
+}
+PROJECTIONS = {
+    'property': serializers.properties,
+    'meter_reading': serializers.meter_readings,
+    'tariff': serializers.tariffs,
+    'contact': serializers.contacts,
+}
+PAGE_SIZE = 5000
+MAX_UPLOAD = 1000
+CHUNK = 500
+
+
+def _scope_hash(property_ids):
+    key = 'all' if property_ids is None else ','.join(map(str, sorted(property_ids)))
+    return format(zlib.crc32(key.encode()), '08x')
+
+
+def make_token(version, property_ids):
+    return f'{version}-{_scope_hash(property_ids)}'
+
+
+def parse_token(token, property_ids):
+    """Version of a token, or None if it is missing, malformed or for another scope."""
+    if not token:
+        return None
+    version, _, scope = token.partition('-')
+    if not version.isdigit() or scope != _scope_hash(property_ids):
+        return None
+    return int(version)
+
+
+def current_version():
+    return db.session.query(db.func.max(ChangeEvent.id)).scalar() or 0
+
+
+def _criteria(model, property_ids):
+    if property_ids is None or model is Contact:
+        return []  # contacts are shared between all properties
+    column = Property.id if model is Property else model.property_id
+    return [column.in_(property_ids)]
+
+
+def _scoped(model, query, property_ids):
+    return query.filter(*_criteria(model, property_ids))
+
+
+def _rows(model, property_ids, ids=None, replace_pids=None):
+    query = _scoped(model, model.query, property_ids)
+    if replace_pids is not None and model is not Contact:
+        column = Property.id if model is Property else model.property_id
+        query = query.filter(column.in_(replace_pids))
+    if ids is None:
+        return query.order_by(model.id).all()
+    ids = sorted(ids)
+    result = []
+    for i in range(0, len(ids), CHUNK):
+        result.extend(query.filter(model.id.in_(ids[i:i + CHUNK])).all())
+    return result
+
+
+def snapshot(property_ids):
+    version = current_version()
+    return {
+        'full': True,
+        'changes': {
+            name: {'upserts': PROJECTIONS[name](*_criteria(model, property_ids), order_by=[model.id]),
+                   'deletes': [], 'replace': 'all'}
+            for name, model in SYNC_TYPES.items()
+        },
+        'token': make_token(version, property_ids),
+        'has_more': False,
+    }
+
+
+def changes_since(token, property_ids, limit=PAGE_SIZE):
+    """Changes of the synced models after token, scoped to property_ids (None = all).
+
+    Per type: upserts (current rows), deletes (ids) and replace. replace is None,
+    'all', or a list of property ids whose rows are listed completely in upserts
+    (after bulk writes); the client drops its other rows in that scope.
+    """
+    version = parse_token(token, property_ids)
+    # The head is read before the events: an event committed after this point has a higher
+    # id and is picked up by the next call instead of falling below the returned token
+    head = current_version()
+    oldest = db.session.query(db.func.min(ChangeEvent.id)).scalar()
+    if version is None or (oldest is not None and version < oldest - 1) or version > head:
+        return snapshot(property_ids)
+
+    query = ChangeEvent.query.filter(ChangeEvent.id > version, ChangeEvent.id <= head,
+                                     ChangeEvent.entity_type.in_(SYNC_TYPES))
+    if property_ids is not None:
+        query = query.filter(db.or_(ChangeEvent.property_id.is_(None), ChangeEvent.property_id.in_(property_ids)))
+    events = query.order_by(ChangeEvent.id).limit(limit + 1).all()
+    has_more = len(events) > limit
+    events = events[:limit]
+    # Without more events the token can skip to the head, past events of other properties
+    version = events[-1].id if has_more else head
+
+    changed = {name: set() for name in SYNC_TYPES}
+    reloads = {name: set() for name in SYNC_TYPES}
+    for ev in events:
+        if ev.action == 'reload':
+            reloads[ev.entity_type].add(ev.property_id)
+        else:
+            changed[ev.entity_type].add(ev.entity_id)
+
+    changes = {}
+    for name, model in SYNC_TYPES.items():
+        replace = None
+        upserts = []
+        if None in reloads[name] or (reloads[name] and model is Contact):
+            replace = 'all'
+            upserts = _rows(model, property_ids)
+        elif reloads[name]:
+            replace = sorted(reloads[name])
+            upserts = _rows(model, property_ids, replace_pids=replace)
+        seen = {r.id for r in upserts}
+        ids = changed[name] - seen
+        found = _rows(model, property_ids, ids=ids) if ids and replace != 'all' else []
+        upserts.extend(found)
+        found_ids = {r.id for r in found}
+        deletes = sorted(i for i in ids if i not in found_ids) if replace != 'all' else []
+        changes[name] = {'upserts': [r.to_dict() for r in upserts], 'deletes': deletes, 'replace': replace}
+    return {'full': False, 'changes': changes, 'token': make_token(version, property_ids), 'has_more': has_more}
+
+
+def _last_events(reading_ids, version):
+    """reading id -> id of its newest ChangeEvent after version."""
+    ids = sorted(reading_ids)
+    result = {}
+    for i in range(0, len(ids), CHUNK):
+        result.update(db.session.query(ChangeEvent.entity_id, db.func.max(ChangeEvent.id)).filter(
+            ChangeEvent.entity_type == 'meter_reading',
+            ChangeEvent.entity_id.in_(ids[i:i + CHUNK]),
+            ChangeEvent.id > version,
+        ).group_by(ChangeEvent.entity_id))
+    return result
+
+
+def apply_readings(items, property_ids):
+    """Store readings captured offline in one transaction; returns one result per item.
+
+    Items without id create a reading. A reading for the same meter and day is a
+    'duplicate' when the value matches (e.g. an upload retried after a lost response)
+    and a 'conflict' otherwise. Items with id update that reading unless it changed
+    on the server after the item's base_token ('conflict'); force=true overwrites.
+    """
+    valid_types = meter_type_keys()
+    results = [None] * len(items)
+    creates, updates = [], []
+    for i, item in enumerate(items):
+        try:
+            rid = int(item['id']) if item.get('id') else None
+            pid = int(item['property_id']) if item.get('property_id') else None
+            if rid is None and pid is None:
+                raise ValueError('property_id fehlt')
+            if pid is not None and property_ids is not None and pid not in property_ids:
+                raise ValueError(f'Kein Zugriff auf Immobilie {pid}')
+            meter_type = item.get('meter_type')
+            if (rid is None or meter_type is not None) and meter_type not in valid_types:
+                raise ValueError(f'Ungültiger Zählertyp: {meter_type}')
+            value = parse_number(item['reading_value']) if item.get('reading_value') is not None else None
+            reading_date = parse_date(item['reading_date']) if item.get('reading_date') else None
+            if rid is None and (value is None or reading_date is None):
+                raise ValueError('reading_value und reading_date erforderlich')
+        except (KeyError, ValueError, TypeError) as e:
+            results[i] = {'client_id': item.get('client_id'), 'status': 'error', 'error': str(e)}
+            continue
+        values = {'property_id': pid, 'meter_type': meter_type, 'reading_value': value, 'reading_date': reading_date}
+        if 'notes' in item:
+            values['notes'] = item['notes'] or ''
+        (updates if rid else creates).append((i, rid, values, item))
+
+    # Existing readings for all (meter, day) keys, updated readings and their newest events: batched
+    keys = sorted({(v['property_id'], v['meter_type'], v['reading_date']) for _, _, v, _ in creates})
+    by_key = {}
+    for i in range(0, len(keys), CHUNK):
+        for r in MeterReading.query.filter(
+            db.tuple_(MeterReading.property_id, MeterReading.meter_type, MeterReading.reading_date)
+            .in_(keys[i:i + CHUNK])
+        ):
+            by_key.setdefault((r.property_id, r.meter_type, r.reading_date), r)
+    by_id = {r.id: r for r in _rows(MeterReading, property_ids, ids={rid for _, rid, _, _ in updates})}
+    bases = {i: parse_token(item.get('base_token'), property_ids) for i, _, _, item in updates}
+    known = [v for v in bases.values() if v is not None]
+    last_events = _last_events(by_id, min(known)) if known else {}
+
+    for i, _, values, item in creates:
+        key = (values['property_id'], values['meter_type'], values['reading_date'])
+        existing = by_key.get(key)
+        if existing is not None:
+            status = 'duplicate' if existing.reading_value == values['reading_value'] else 'conflict'
+            results[i] = {'status': status, 'reading': existing}
+            continue
+        reading = MeterReading(**{'notes': '', **values})
+        db.session.add(reading)
+        by_key[key] = reading
+        results[i] = {'status': 'created', 'reading': reading}
+
+    for i, rid, values, item in updates:
+        reading = by_id.get(rid)
+        if reading is None:
+            results[i] = {'status': 'conflict', 'reading': None}  # deleted (or no access)
+            continue
+        base = bases[i]
+        # Without a base token the client cannot know what it overwrites
+        stale = base is None or last_events.get(rid, 0) > base
+        if stale and not item.get('force'):
+            results[i] = {'status': 'conflict', 'reading': reading}
+            continue
+        for k, v in values.items():
+            if v is not None:
+                setattr(reading, k, v)
+        results[i] = {'status': 'updated', 'reading': reading}
+
+    db.session.commit()
+    for i, r in enumerate(results):
+        r['client_id'] = items[i].get('client_id')
+        if 'reading' in r:
+            reading = r.pop('reading')
+            r['id'] = reading.id if reading is not None else items[i].get('id')
+            r['server'] = reading.to_dict() if reading is not None else None
+    return results
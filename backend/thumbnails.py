@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# UPLOAD_DIR moves all stored files (e.g. benchmarks, separate volumes)
+UPLOAD_BASE = os.environ.get('UPLOAD_DIR') or os.path.join(os.path.dirname(__file__), 'uploads')
+DERIVATIVE_BASE = os.path.join(UPLOAD_BASE, 'derivatives')
+# Bounding boxes; aspect ratio is preserved
+DERIVATIVE_SIZES = {
+    'thumb': (320, 320),
+    'preview': (1280, 1280),
+}
+WEBP_QUALITY = 80
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff')
+
+_executor = None
+
+
+def has_derivatives(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return ext in IMAGE_EXTENSIONS or ext == '.pdf'
+
+
+def derivative_path(category, filename, size):
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(DERIVATIVE_BASE, size, category, f'{stem}.webp')
+
+
+def _load_source(filepath):
+    from PIL import Image, ImageOps
+    if filepath.lower().endswith('.pdf'):
+        # First page only; PyMuPDF is optional
+        import pymupdf
+        with pymupdf.open(filepath) as doc:
+            page = doc[0]
+            longest = max(DERIVATIVE_SIZES['preview'])
+            zoom = longest / max(page.rect.width, page.rect.height, 1)
+            pix = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+    img = Image.open(filepath)
+    # Let the JPEG decoder downscale while decoding; much cheaper for camera photos
+    img.draft('RGB', max(DERIVATIVE_SIZES.values()))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    return img
+
+
+def generate_derivatives(category, filename, sizes=None):
+    """Render WebP derivatives for an uploaded file; returns the written paths."""
+    source = os.path.join(UPLOAD_BASE, category, filename)
+    if not has_derivatives(filename) or not os.path.exists(source):
+        return []
+    img = _load_source(source)
+    written = []
+    # Largest first so each step resamples from the smallest sufficient image
+    for size in sorted(sizes or DERIVATIVE_SIZES, key=lambda s: -max(DERIVATIVE_SIZES[s])):
+        img.thumbnail(DERIVATIVE_SIZES[size])
+        target = derivative_path(category, filename, size)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # The background pool and a request's ensure_derivative() may render the same file at once
+        tmp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+        img.save(tmp, 'WEBP', quality=WEBP_QUALITY, method=4)
+        os.replace(tmp, target)
+        written.append(target)
+    return written
+
+
+def ensure_derivative(category, filename, size):
+    """Return the derivative path, (re)generating it if missing or older than the source."""
+    if size not in DERIVATIVE_SIZES or not has_derivatives(filename):
+        return None
+    source = os.path.join(UPLOAD_BASE, category, filename)
+    target = derivative_path(category, filename, size)
+    try:
+        source_mtime = os.stat(source).st_mtime
+    except OSError:
+        return None
+    try:
+        if os.stat(target).st_mtime >= source_mtime:
+            return target
+    except OSError:
+        pass
+    try:
+        generate_derivatives(category, filename, [size])
+    except Exception:
+        logger.exception('Derivative generation failed for %s/%s', category, filename)
+        return None
+    return target
+
+
+def _generate_logged(category, filename):
+    try:
+        generate_derivatives(category, filename)
+    except Exception:
+        logger.exception('Derivative generation failed for %s/%s', category, filename)
+
+
+def schedule_derivatives(category, filename):
+    """Generate derivatives in the background; missing ones are rebuilt lazily on request."""
+    global _executor
+    if not has_derivatives(filename):
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='thumbnails')
+    _executor.submit(_generate_logged, category, filename)
+
+
+def remove_derivatives(category, filename):
+    for size in DERIVATIVE_SIZES:
+        target = derivative_path(category, filename, size)
+        if os.path.exists(target):
+            os.remove(target)
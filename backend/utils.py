@@ -1,28 +1,17 @@
 from datetime import date, timedelta
-from models import db, MeterReading, Tariff, RecurringCost, Expense
+from models import db, Tariff, Expense
+from schedules import property_schedule
+from consumption import property_series
+import serializers
 
 
 def get_consumption(property_id, meter_type, start_date, end_date):
-    """Calculate consumption between two dates for a meter type."""
-    readings = (
-        MeterReading.query
-        .filter_by(property_id=property_id, meter_type=meter_type)
-        .filter(MeterReading.reading_date >= start_date)
-        .filter(MeterReading.reading_date <= end_date)
-        .order_by(MeterReading.reading_date)
-        .all()
-    )
-    if len(readings) < 2:
+    """Calculate consumption between two dates for a meter type (interpolated, across meter changes)."""
+    series = property_series(property_id).get(meter_type)
+    data = series.consumption(start_date, end_date) if series else None
+    if data is None:
         return None, []
-    consumption = readings[-1].reading_value - readings[0].reading_value
-    days = (readings[-1].reading_date - readings[0].reading_date).days
-    return {
-        'total': round(consumption, 2),
-        'days': days,
-        'daily_avg': round(consumption / days, 4) if days > 0 else 0,
-        'start_reading': readings[0].to_dict(),
-        'end_reading': readings[-1].to_dict(),
-    }, readings
+    return data, series.readings_between(start_date, end_date)
 
 
 def get_forecast(property_id, meter_type, year):
@@ -32,25 +21,16 @@ def get_forecast(property_id, meter_type, year):
     today = date.today()
     target_end = min(year_end, today)
 
-    readings = (
-        MeterReading.query
-        .filter_by(property_id=property_id, meter_type=meter_type)
-        .filter(MeterReading.reading_date >= year_start)
-        .filter(MeterReading.reading_date <= target_end)
-        .order_by(MeterReading.reading_date)
-        .all()
-    )
-    if len(readings) < 2:
-        return None
-
-    actual_consumption = readings[-1].reading_value - readings[0].reading_value
-    actual_days = (readings[-1].reading_date - readings[0].reading_date).days
-    if actual_days == 0:
+    series = property_series(property_id).get(meter_type)
+    span = series.between(year_start, target_end) if series else None
+    if span is None:
         return None
+    first_date, last_date, actual_consumption = span
+    actual_days = (last_date - first_date).days
 
     daily_avg = actual_consumption / actual_days
     total_days_in_year = (year_end - year_start).days + 1
-    remaining_days = (year_end - readings[-1].reading_date).days
+    remaining_days = (year_end - last_date).days
 
     forecasted_additional = daily_avg * remaining_days
     total_forecast = actual_consumption + forecasted_additional
@@ -64,34 +44,44 @@ def get_forecast(property_id, meter_type, year):
         'forecasted_additional': round(forecasted_additional, 2),
         'total_forecast': round(total_forecast, 2),
         'remaining_days': remaining_days,
-        'last_reading_date': readings[-1].reading_date.isoformat(),
+        'last_reading_date': last_date.isoformat(),
     }
 
 
-def get_cost_for_tariff_type(property_id, tariff_type, consumption, start_date, end_date):
-    """Calculate cost for a given consumption using applicable tariffs."""
-    tariffs = (
-        Tariff.query
-        .filter_by(property_id=property_id, tariff_type=tariff_type)
-        .filter(Tariff.valid_from <= end_date)
-        .filter(db.or_(Tariff.valid_to >= start_date, Tariff.valid_to.is_(None)))
-        .order_by(Tariff.valid_from)
-        .all()
-    )
-    if not tariffs:
-        return None
+def get_tariffs(property_ids, start_date, end_date):
+    """Tariffs valid in the period, the latest per type: {property_id: {tariff_type: dict}} in one query."""
+    result = {}
+    for t in serializers.tariffs(
+        Tariff.property_id.in_(property_ids), Tariff.valid_from <= end_date,
+        db.or_(Tariff.valid_to >= start_date, Tariff.valid_to.is_(None)),
+        order_by=[Tariff.property_id, Tariff.valid_from, Tariff.id],
+    ):
+        result.setdefault(t['property_id'], {})[t['tariff_type']] = t
+    return result
+
+
+def consumption_costs(consumption, tariffs, tariff_meters, start_date, end_date):
+    """Cost per tariff type, each billed on the consumption of its meter type (see meter_types)."""
+    costs = {}
+    for tariff_type, meter_type in tariff_meters.items():
+        if tariff_type in tariffs and meter_type in consumption:
+            costs[tariff_type] = tariff_cost(tariffs[tariff_type], consumption[meter_type]['total'],
+                                             start_date, end_date)
+    return costs
 
-    tariff = tariffs[-1]
+
+def tariff_cost(tariff, consumption, start_date, end_date):
+    """Cost of a consumption under one tariff (a to_dict() dict)."""
     months = max(1, ((end_date.year - start_date.year) * 12 + end_date.month - start_date.month))
-    usage_cost = consumption * tariff.price_per_unit
-    base_cost = tariff.base_cost_monthly * months
+    usage_cost = consumption * tariff['price_per_unit']
+    base_cost = tariff['base_cost_monthly'] * months
 
     return {
-        'tariff_type': tariff_type,
+        'tariff_type': tariff['tariff_type'],
         'consumption': round(consumption, 2),
-        'price_per_unit': tariff.price_per_unit,
+        'price_per_unit': tariff['price_per_unit'],
         'usage_cost': round(usage_cost, 2),
-        'base_cost_monthly': tariff.base_cost_monthly,
+        'base_cost_monthly': tariff['base_cost_monthly'],
         'base_cost_total': round(base_cost, 2),
         'total_cost': round(usage_cost + base_cost, 2),
         'months': months,
@@ -99,30 +89,9 @@ def get_cost_for_tariff_type(property_id, tariff_type, consumption, start_date,
 
 
 def get_recurring_costs_total(property_id, start_date, end_date):
-    """Sum all recurring costs active in the given period."""
-    costs = (
-        RecurringCost.query
-        .filter_by(property_id=property_id)
-        .filter(RecurringCost.start_date <= end_date)
-        .filter(db.or_(RecurringCost.end_date >= start_date, RecurringCost.end_date.is_(None)))
-        .all()
-    )
-    total = 0.0
-    details = []
-    for c in costs:
-        eff_start = max(c.start_date, start_date)
-        eff_end = min(c.end_date, end_date) if c.end_date else end_date
-        months = max(1, (eff_end.year - eff_start.year) * 12 + eff_end.month - eff_start.month + 1)
-        amount = c.monthly_amount * months
-        total += amount
-        details.append({
-            'description': c.description,
-            'vendor': c.vendor,
-            'monthly_amount': c.monthly_amount,
-            'months': months,
-            'total': round(amount, 2),
-        })
-    return round(total, 2), details
+    """Sum all recurring costs active in the given period (day-accurate, see schedules)."""
+    schedule = property_schedule(property_id)
+    return round(schedule.total(start_date, end_date), 2), schedule.details(start_date, end_date)
 
 
 def get_expenses_total(property_id, start_date, end_date):
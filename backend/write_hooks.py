@@ -0,0 +1,47 @@
+from collections import defaultdict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Callbacks that run after a commit that wrote rows of a model, whether through
+# ORM objects or insert()/update()/delete() statements. Rolled back writes are
+# dropped. Used to invalidate in-process caches.
+
+_callbacks = defaultdict(list)
+
+
+def on_commit(model, callback):
+    """Call callback() after every commit that wrote rows of model."""
+    _callbacks[model].append(callback)
+
+
+def _mark(session, model):
+    session.info.setdefault('written_models', set()).add(model)
+
+
+@event.listens_for(Session, 'after_flush')
+def _flushed(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if type(obj) in _callbacks:
+            _mark(session, type(obj))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _statement_executed(orm_execute_state):
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _callbacks:
+        _mark(orm_execute_state.session, mapper.class_)
+
+
+@event.listens_for(Session, 'after_commit')
+def _committed(session):
+    # Run on commit, not on flush: a reader in between would cache the old state again
+    for model in session.info.pop('written_models', ()):
+        for callback in _callbacks[model]:
+            callback()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _rolled_back(session):
+    session.info.pop('written_models', None)
@@ -25,4 +25,33 @@ api.interceptors.response.use(
 );
 
 export const API_BASE = process.env.REACT_APP_API_URL || 'http://localhost:5001';
+
+// Chunked, resumable attachment upload (entityType: 'expense' | 'recurring_cost')
+export async function uploadAttachment(entityType, entityId, file, onProgress) {
+  const init = await api.post('/api/upload-sessions', {
+    entity_type: entityType, entity_id: entityId, filename: file.name, size: file.size,
+  });
+  const { id, chunk_size: chunkSize } = init.data;
+  let offset = 0;
+  let retries = 0;
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + chunkSize);
+    try {
+      const res = await api.put(`/api/upload-sessions/${id}?offset=${offset}`, chunk, {
+        headers: { 'Content-Type': 'application/octet-stream' },
+      });
+      offset = res.data.offset;
+      retries = 0;
+      if (onProgress) onProgress(offset / file.size);
+    } catch (err) {
+      if (retries >= 5 || (err.response && err.response.status !== 409)) throw err;
+      retries += 1;
+      await new Promise(r => setTimeout(r, 1000 * retries));
+      const status = await api.get(`/api/upload-sessions/${id}`);
+      offset = status.data.offset;
+    }
+  }
+  const done = await api.post(`/api/upload-sessions/${id}/complete`);
+  return done.data;
+}
 export default api;
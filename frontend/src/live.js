@@ -0,0 +1,106 @@
+import { useEffect, useRef, useState } from 'react';
+import api, { API_BASE } from './api';
+
+// One EventSource per tab, shared by all mounted pages. The stream is authenticated
+// with a short-lived ticket, so reconnects fetch a new one and resume from the last
+// event id instead of relying on the browser's automatic retry.
+const handlers = new Set();
+const statusHandlers = new Set();
+let source = null;
+let connecting = false;
+let connected = false;
+let lastEventId = null;
+let retryTimer = null;
+let closeTimer = null;
+
+function setConnected(value) {
+  connected = value;
+  statusHandlers.forEach(fn => fn(value));
+}
+
+function dispatch(ev) {
+  handlers.forEach(fn => fn(ev));
+}
+
+function scheduleReconnect() {
+  if (retryTimer || !handlers.size) return;
+  retryTimer = setTimeout(() => { retryTimer = null; connect(); }, 3000);
+}
+
+async function connect() {
+  if (source || connecting || !handlers.size || !localStorage.getItem('token')) return;
+  connecting = true;
+  let ticket;
+  try {
+    ticket = (await api.post('/api/events/ticket')).data.ticket;
+  } catch (err) {
+    connecting = false;
+    scheduleReconnect();
+    return;
+  }
+  connecting = false;
+  if (!handlers.size) return;
+  const params = new URLSearchParams({ ticket });
+  if (lastEventId) params.set('last_event_id', lastEventId);
+  source = new EventSource(`${API_BASE}/api/events?${params}`);
+  source.onopen = () => setConnected(true);
+  source.addEventListener('change', (e) => {
+    lastEventId = e.lastEventId;
+    dispatch(JSON.parse(e.data));
+  });
+  // Missed events could not be replayed: pages reload their data
+  source.addEventListener('resync', () => dispatch({ action: 'resync' }));
+  source.onerror = () => {
+    source.close();
+    source = null;
+    setConnected(false);
+    // Whatever happened while disconnected is replayed on reconnect, or answered with a resync
+    scheduleReconnect();
+  };
+}
+
+function disconnect() {
+  clearTimeout(retryTimer);
+  retryTimer = null;
+  if (source) {
+    source.close();
+    source = null;
+  }
+  setConnected(false);
+}
+
+// handler(ev) receives {id, entity_type, entity_id, property_id, action, data};
+// action is 'create', 'update', 'delete', 'reload' (bulk change) or 'resync'.
+// Returns whether the stream is connected, i.e. whether changes arrive without reloading.
+export function useLiveUpdates(handler) {
+  const handlerRef = useRef(handler);
+  handlerRef.current = handler;
+  const [isConnected, setIsConnected] = useState(connected);
+
+  useEffect(() => {
+    const fn = (ev) => handlerRef.current(ev);
+    handlers.add(fn);
+    statusHandlers.add(setIsConnected);
+    clearTimeout(closeTimer);
+    connect();
+    return () => {
+      handlers.delete(fn);
+      statusHandlers.delete(setIsConnected);
+      // Keep the stream open across page switches
+      if (!handlers.size) closeTimer = setTimeout(() => { if (!handlers.size) disconnect(); }, 10000);
+    };
+  }, []);
+
+  return isConnected;
+}
+
+// Apply a create/update/delete event to a list of dicts. belongs(item) decides whether
+// the item is part of this list (e.g. selected property), compare keeps the sort order.
+export function applyChange(items, ev, belongs = () => true, compare = null) {
+  const rest = items.filter(i => i.id !== ev.entity_id);
+  if (ev.action === 'delete' || !belongs(ev.data)) return rest;
+  const next = [...rest, ev.data];
+  return compare ? next.sort(compare) : next;
+}
+
+export const byDateDesc = (field) => (a, b) => (b[field] || '').localeCompare(a[field] || '') || b.id - a.id;
@@ -0,0 +1,48 @@
+import { useEffect, useState } from 'react';
+import api from './api';
+
+// Meter and tariff types come from the registry on the server. They rarely change,
+// so one request per tab is shared by all pages.
+const EMPTY = { meter_types: [], tariff_types: [] };
+let pending = null;
+
+function fetchTypes() {
+  if (!pending) {
+    pending = api.get('/api/meter-types').then(r => r.data).catch(err => { pending = null; throw err; });
+  }
+  return pending;
+}
+
+export function useMeterTypes() {
+  const [types, setTypes] = useState(EMPTY);
+  useEffect(() => {
+    let active = true;
+    fetchTypes().then(data => { if (active) setTypes(data); }).catch(() => {});
+    return () => { active = false; };
+  }, []);
+  return types;
+}
+
+export function typeLabels(types) {
+  const labels = {};
+  types.tariff_types.forEach(t => { labels[t.key] = t.label; });
+  types.meter_types.forEach(m => { labels[m.key] = m.label; });
+  return labels;
+}
+
+// Tariff types grouped by the category of the meter type they are billed on
+export function tariffGroups(types) {
+  const meters = Object.fromEntries(types.meter_types.map(m => [m.key, m]));
+  const groups = [];
+  types.tariff_types.forEach(t => {
+    const meter = meters[t.meter_type];
+    const category = meter?.category || t.label;
+    let group = groups.find(g => g.key === category);
+    if (!group) {
+      group = { key: category, label: category, types: [] };
+      groups.push(group);
+    }
+    group.types.push({ value: t.key, label: t.label, unit: `€/${meter?.unit || ''}` });
+  });
+  return groups;
+}
@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
 import api, { API_BASE } from '../api';
+import { useLiveUpdates, applyChange } from '../live';
 import theme from '../styles/theme';
 import * as c from '../styles/common';
 
@@ -21,6 +22,14 @@ export default function Contacts() {
     api.get('/api/contacts', { params: { q: params } }).then(r => setContacts(r.data));
   };
 
+  const live = useLiveUpdates((ev) => {
+    if (ev.action === 'resync' || (ev.entity_type === 'contact' && (ev.action === 'reload' || search))) {
+      load();  // a search result cannot be patched locally
+    } else if (ev.entity_type === 'contact') {
+      setContacts(cs => applyChange(cs, ev, () => true, (a, b) => a.name.localeCompare(b.name)));
+    }
+  });
+
   const handleSearch = (e) => {
     setSearch(e.target.value);
     load(e.target.value);
@@ -71,7 +80,7 @@ export default function Contacts() {
       await api.post('/api/contacts', payload);
     }
     resetForm();
-    load();
+    if (!live) load();
   };
 
   const resetForm = () => {
@@ -84,7 +93,7 @@ export default function Contacts() {
   const del = async (id) => {
     if (window.confirm('Kontakt wirklich löschen?')) {
       await api.delete(`/api/contacts/${id}`);
-      load();
+      if (!live) load();
     }
   };
 
@@ -160,7 +169,7 @@ export default function Contacts() {
               <td style={c.td}>{ct.address || '-'}</td>
               <td style={c.td}>
                 {ct.photo_url ? (
-                  <span style={{ cursor: 'pointer', color: theme.colors.scan }} onClick={() => setPhotoModal(API_BASE + ct.photo_url)}>
+                  <span style={{ cursor: 'pointer', color: theme.colors.scan }} onClick={() => setPhotoModal(API_BASE + (ct.preview_url || ct.photo_url))}>
                     Anzeigen
                   </span>
                 ) : '-'}
@@ -1,12 +1,24 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import api from '../api';
+import { useLiveUpdates } from '../live';
 import theme from '../styles/theme';
 import * as c from '../styles/common';
 
 export default function Dashboard() {
   const [data, setData] = useState([]);
 
-  useEffect(() => { api.get('/api/reports/dashboard').then(r => setData(r.data)); }, []);
+  const reloadTimer = useRef(null);
+
+  const load = () => api.get('/api/reports/dashboard').then(r => setData(r.data));
+
+  useEffect(() => { load(); return () => clearTimeout(reloadTimer.current); }, []);
+
+  // Counts depend on several tables; refetch once per burst of changes
+  useLiveUpdates((ev) => {
+    if (ev.action !== 'resync' && !['property', 'meter_reading', 'expense', 'recurring_cost'].includes(ev.entity_type)) return;
+    clearTimeout(reloadTimer.current);
+    reloadTimer.current = setTimeout(load, 500);
+  });
 
   return (
     <div>
@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
-import api, { API_BASE } from '../api';
+import api, { API_BASE, uploadAttachment } from '../api';
+import { useLiveUpdates, applyChange, byDateDesc } from '../live';
 import theme from '../styles/theme';
 import * as c from '../styles/common';
 
@@ -28,6 +29,18 @@ export default function Expenses() {
 
   const load = () => api.get(`/api/properties/${selectedProp}/expenses`).then(r => setExpenses(r.data));
 
+  const live = useLiveUpdates((ev) => {
+    if (!selectedProp) return;
+    if (ev.action === 'resync' || (ev.entity_type === 'expense' && ev.action === 'reload'
+        && (!ev.property_id || ev.property_id === Number(selectedProp)))) {
+      load();
+    } else if (ev.entity_type === 'expense') {
+      setExpenses(es => applyChange(es, ev, e => e.property_id === Number(selectedProp), byDateDesc('invoice_date')));
+    } else if (ev.entity_type === 'contact' && ev.action !== 'reload') {
+      setContacts(cs => applyChange(cs, ev, () => true, (a, b) => a.name.localeCompare(b.name)));
+    }
+  });
+
   const handleScan = async (e) => {
     const file = e.target.files[0];
     if (!file) return;
@@ -79,10 +92,10 @@ export default function Expenses() {
     setForm({ vendor: '', invoice_date: '', invoice_number: '', net_amount: '', vat_rate: '19', description: '', category: '', contact_id: '' });
     setScanFile(null);
     setShowForm(false);
-    load();
+    if (!live) load();
   };
 
-  const del = async (id) => { if (window.confirm('Wirklich löschen?')) { await api.delete(`/api/expenses/${id}`); load(); } };
+  const del = async (id) => { if (window.confirm('Wirklich löschen?')) { await api.delete(`/api/expenses/${id}`); if (!live) load(); } };
 
   const toggleAtts = async (eid) => {
     if (expandedAtts[eid]) {
@@ -97,9 +110,7 @@ export default function Expenses() {
   const addAtt = async (e) => {
     const file = e.target.files[0];
     if (!file || !attTarget) return;
-    const formData = new FormData();
-    formData.append('file', file);
-    await api.post(`/api/expenses/${attTarget}/attachments`, formData, { headers: { 'Content-Type': 'multipart/form-data' } });
+    await uploadAttachment('expense', attTarget, file);
     const res = await api.get(`/api/expenses/${attTarget}/attachments`);
     setAttachments(prev => ({ ...prev, [attTarget]: res.data }));
     load();
@@ -198,7 +209,9 @@ export default function Expenses() {
                     <div style={c.attBox}>
                       {attachments[e.id].map(a => (
                         <div key={a.id} style={c.attItem}>
-                          <span style={{ fontSize: 16 }}>{a.file_type === 'pdf' ? '\u{1F4C4}' : '\u{1F5BC}'}</span>
+                          {a.thumbnail_url
+                            ? <img src={API_BASE + a.thumbnail_url} loading="lazy" alt="" style={{ width: 32, height: 32, objectFit: 'cover', borderRadius: 4 }} />
+                            : <span style={{ fontSize: 16 }}>{a.file_type === 'pdf' ? '\u{1F4C4}' : '\u{1F5BC}'}</span>}
                           <a href={API_BASE + a.url} target="_blank" rel="noopener noreferrer" style={{ color: theme.colors.link }}>{a.original_filename}</a>
                           <button style={c.btnSmallDanger} onClick={() => delAtt(a.id, e.id)}>x</button>
                         </div>
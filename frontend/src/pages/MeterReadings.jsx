@@ -1,15 +1,12 @@
 import React, { useState, useEffect, useRef } from 'react';
 import api, { API_BASE } from '../api';
+import { useLiveUpdates, applyChange, byDateDesc } from '../live';
 import theme from '../styles/theme';
 import * as c from '../styles/common';
-
-const METER_TYPES = [
-  { value: 'water', label: 'Wasser' },
-  { value: 'electricity_day', label: 'Strom (Tag)' },
-  { value: 'electricity_night', label: 'Strom (Nacht)' },
-];
+import { useMeterTypes } from '../meterTypes';
 
 export default function MeterReadings() {
+  const METER_TYPES = useMeterTypes().meter_types.map(m => ({ value: m.key, label: m.label }));
   const [properties, setProperties] = useState([]);
   const [selectedProp, setSelectedProp] = useState('');
   const [filterType, setFilterType] = useState('');
@@ -36,6 +33,18 @@ export default function MeterReadings() {
     api.get(`/api/properties/${selectedProp}/meters${params}`).then(r => setReadings(r.data));
   };
 
+  const live = useLiveUpdates((ev) => {
+    if (!selectedProp) return;
+    if (ev.action === 'resync' || (ev.entity_type === 'meter_reading' && ev.action === 'reload'
+        && (!ev.property_id || ev.property_id === Number(selectedProp)))) {
+      loadReadings();
+    } else if (ev.entity_type === 'meter_reading') {
+      setReadings(rs => applyChange(rs, ev,
+        r => r.property_id === Number(selectedProp) && (!filterType || r.meter_type === filterType),
+        byDateDesc('reading_date')));
+    }
+  });
+
   const handleScanPhoto = async (e) => {
     const file = e.target.files[0];
     if (!file || !selectedProp) return;
@@ -62,7 +71,7 @@ export default function MeterReadings() {
     setScanning(false);
   };
 
-  const save = async (e) => {
+  const save = async (e, force = false) => {
     e.preventDefault();
     const formData = new FormData();
     formData.append('meter_type', form.meter_type);
@@ -70,21 +79,30 @@ export default function MeterReadings() {
     formData.append('reading_date', form.reading_date);
     formData.append('notes', form.notes);
     if (photoFile) formData.append('photo', photoFile);
+    if (force) formData.append('force', '1');
 
-    await api.post(`/api/properties/${selectedProp}/meters`, formData, {
-      headers: { 'Content-Type': 'multipart/form-data' },
-    });
+    try {
+      await api.post(`/api/properties/${selectedProp}/meters`, formData, {
+        headers: { 'Content-Type': 'multipart/form-data' },
+      });
+    } catch (err) {
+      const anomalies = err.response?.status === 409 && err.response.data.anomalies;
+      if (!anomalies) throw err;
+      const msg = anomalies.map(a => a.message).join('\n');
+      if (window.confirm(`Zählerstand unplausibel:\n${msg}\n\nTrotzdem speichern?`)) save(e, true);
+      return;
+    }
     setForm({ meter_type: 'water', reading_value: '', reading_date: new Date().toISOString().split('T')[0], notes: '' });
     setPhotoFile(null);
     setPhotoPreview(null);
     setShowForm(false);
-    loadReadings();
+    if (!live) loadReadings();
   };
 
   const del = async (id) => {
     if (window.confirm('Wirklich löschen?')) {
       await api.delete(`/api/meters/${id}`);
-      loadReadings();
+      if (!live) loadReadings();
     }
   };
 
@@ -159,7 +177,7 @@ export default function MeterReadings() {
               <td style={c.td}>{r.reading_value.toLocaleString('de-DE')}</td>
               <td style={c.td}>{r.notes}</td>
               <td style={c.td}>
-                {r.photo_url && <span style={{ cursor: 'pointer', fontSize: 18, color: theme.colors.scan }} onClick={() => setViewPhoto(API_BASE + r.photo_url)} title="Foto anzeigen">&#128247;</span>}
+                {r.photo_url && <img src={API_BASE + (r.thumbnail_url || r.photo_url)} loading="lazy" alt="Zählerfoto" style={{ cursor: 'pointer', width: 48, height: 36, objectFit: 'cover', borderRadius: 4 }} onClick={() => setViewPhoto(API_BASE + (r.preview_url || r.photo_url))} title="Foto anzeigen" />}
               </td>
               <td style={c.td}><button style={c.btnDanger} onClick={() => del(r.id)}>Löschen</button></td>
             </tr>
@@ -1,8 +1,11 @@
 import React, { useState, useEffect, useRef } from 'react';
-import api, { API_BASE } from '../api';
+import api, { API_BASE, uploadAttachment } from '../api';
+import { useLiveUpdates, applyChange, byDateDesc } from '../live';
 import theme from '../styles/theme';
 import * as c from '../styles/common';
 
+const INTERVALS = { monthly: 'monatlich', quarterly: 'vierteljährlich', yearly: 'jährlich' };
+
 const fmt = (n) => n != null ? n.toLocaleString('de-DE', { minimumFractionDigits: 2, maximumFractionDigits: 2 }) + ' \u20AC' : '-';
 
 export default function RecurringCosts() {
@@ -10,7 +13,7 @@ export default function RecurringCosts() {
   const [selectedProp, setSelectedProp] = useState('');
   const [costs, setCosts] = useState([]);
   const [showForm, setShowForm] = useState(false);
-  const [form, setForm] = useState({ description: '', vendor: '', monthly_amount: '', vat_rate: '19', start_date: '', end_date: '', category: '', contact_id: '' });
+  const [form, setForm] = useState({ description: '', vendor: '', monthly_amount: '', vat_rate: '19', start_date: '', end_date: '', category: '', contact_id: '', billing_interval: 'monthly' });
   const [scanning, setScanning] = useState(false);
   const [contacts, setContacts] = useState([]);
   const [expandedAtts, setExpandedAtts] = useState({});
@@ -27,6 +30,18 @@ export default function RecurringCosts() {
 
   const load = () => api.get(`/api/properties/${selectedProp}/recurring-costs`).then(r => setCosts(r.data));
 
+  const live = useLiveUpdates((ev) => {
+    if (!selectedProp) return;
+    if (ev.action === 'resync' || (ev.entity_type === 'recurring_cost' && ev.action === 'reload'
+        && (!ev.property_id || ev.property_id === Number(selectedProp)))) {
+      load();
+    } else if (ev.entity_type === 'recurring_cost') {
+      setCosts(cs => applyChange(cs, ev, rc => rc.property_id === Number(selectedProp), byDateDesc('start_date')));
+    } else if (ev.entity_type === 'contact' && ev.action !== 'reload') {
+      setContacts(cs => applyChange(cs, ev, () => true, (a, b) => a.name.localeCompare(b.name)));
+    }
+  });
+
   const handleScan = async (e) => {
     const file = e.target.files[0];
     if (!file) return;
@@ -58,12 +73,12 @@ export default function RecurringCosts() {
       end_date: form.end_date || null,
       contact_id: form.contact_id ? parseInt(form.contact_id) : null,
     });
-    setForm({ description: '', vendor: '', monthly_amount: '', vat_rate: '19', start_date: '', end_date: '', category: '', contact_id: '' });
+    setForm({ description: '', vendor: '', monthly_amount: '', vat_rate: '19', start_date: '', end_date: '', category: '', contact_id: '', billing_interval: 'monthly' });
     setShowForm(false);
-    load();
+    if (!live) load();
   };
 
-  const del = async (id) => { if (window.confirm('Wirklich löschen?')) { await api.delete(`/api/recurring-costs/${id}`); load(); } };
+  const del = async (id) => { if (window.confirm('Wirklich löschen?')) { await api.delete(`/api/recurring-costs/${id}`); if (!live) load(); } };
 
   const toggleAtts = async (cid) => {
     if (expandedAtts[cid]) {
@@ -78,9 +93,7 @@ export default function RecurringCosts() {
   const addAtt = async (e) => {
     const file = e.target.files[0];
     if (!file || !attTarget) return;
-    const formData = new FormData();
-    formData.append('file', file);
-    await api.post(`/api/recurring-costs/${attTarget}/attachments`, formData, { headers: { 'Content-Type': 'multipart/form-data' } });
+    await uploadAttachment('recurring_cost', attTarget, file);
     const res = await api.get(`/api/recurring-costs/${attTarget}/attachments`);
     setAttachments(prev => ({ ...prev, [attTarget]: res.data }));
     load();
@@ -133,8 +146,14 @@ export default function RecurringCosts() {
             <div><label style={c.label}>Enddatum (leer = aktiv)</label>
               <input style={c.input} type="date" value={form.end_date} onChange={e => setForm({ ...form, end_date: e.target.value })} /></div>
           </div>
-          <label style={c.label}>Kategorie</label>
-          <input style={{ ...c.input, maxWidth: 300 }} value={form.category} onChange={e => setForm({ ...form, category: e.target.value })} />
+          <div style={c.row3}>
+            <div><label style={c.label}>Kategorie</label>
+              <input style={c.input} value={form.category} onChange={e => setForm({ ...form, category: e.target.value })} /></div>
+            <div><label style={c.label}>Abrechnung</label>
+              <select style={c.select} value={form.billing_interval} onChange={e => setForm({ ...form, billing_interval: e.target.value })}>
+                {Object.entries(INTERVALS).map(([k, v]) => <option key={k} value={k}>{v}</option>)}
+              </select></div>
+          </div>
           <button style={c.btn} type="submit">Speichern</button>
         </form>
       )}
@@ -146,7 +165,7 @@ export default function RecurringCosts() {
               <tr>
                 <td style={c.td}>{ct.description}</td>
                 <td style={c.td}>{ct.vendor}</td>
-                <td style={c.td}>{fmt(ct.monthly_amount)}</td>
+                <td style={c.td}>{fmt(ct.monthly_amount)}{ct.billing_interval && ct.billing_interval !== 'monthly' ? ` (${INTERVALS[ct.billing_interval]})` : ''}</td>
                 <td style={c.td}>{ct.category}</td>
                 <td style={c.td}>{new Date(ct.start_date).toLocaleDateString('de-DE')}</td>
                 <td style={c.td}>{ct.end_date ? new Date(ct.end_date).toLocaleDateString('de-DE') : 'Aktiv'}</td>
@@ -170,7 +189,9 @@ export default function RecurringCosts() {
                     <div style={c.attBox}>
                       {attachments[ct.id].map(a => (
                         <div key={a.id} style={c.attItem}>
-                          <span>{a.file_type === 'pdf' ? '\u{1F4C4}' : '\u{1F5BC}'}</span>
+                          {a.thumbnail_url
+                            ? <img src={API_BASE + a.thumbnail_url} loading="lazy" alt="" style={{ width: 32, height: 32, objectFit: 'cover', borderRadius: 4 }} />
+                            : <span>{a.file_type === 'pdf' ? '\u{1F4C4}' : '\u{1F5BC}'}</span>}
                           <a href={API_BASE + a.url} target="_blank" rel="noopener noreferrer" style={{ color: theme.colors.link }}>{a.original_filename}</a>
                         </div>
                       ))}
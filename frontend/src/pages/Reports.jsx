@@ -3,9 +3,9 @@ import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Legend, Responsive
 import api, { API_BASE } from '../api';
 import theme from '../styles/theme';
 import * as c from '../styles/common';
+import { useMeterTypes, typeLabels } from '../meterTypes';
 
 const fmt = (n) => n != null ? n.toLocaleString('de-DE', { minimumFractionDigits: 2, maximumFractionDigits: 2 }) + ' \u20AC' : '-';
-const METER_LABELS = { water: 'Wasser', electricity_day: 'Strom (Tag)', electricity_night: 'Strom (Nacht)', wastewater: 'Abwasser' };
 const MONTHS = ['Jan', 'Feb', 'Mär', 'Apr', 'Mai', 'Jun', 'Jul', 'Aug', 'Sep', 'Okt', 'Nov', 'Dez'];
 
 export default function Reports() {
@@ -18,6 +18,7 @@ export default function Reports() {
   const [forecast, setForecast] = useState({});
   const [monthly, setMonthly] = useState([]);
   const [annual, setAnnual] = useState(null);
+  const METER_LABELS = typeLabels(useMeterTypes());
 
   useEffect(() => {
     api.get('/api/properties').then(r => { setProperties(r.data); if (r.data.length > 0) setSelectedProp(r.data[0].id); });
@@ -56,6 +57,7 @@ export default function Reports() {
     name: METER_LABELS[key] || key, Ist: val.actual_consumption, Prognose: val.total_forecast,
   }));
 
+  const monthlyMeterTypes = [...new Set(monthly.flatMap(m => Object.keys(m.consumption || {})))];
   const monthlyChartData = monthly.map((m, i) => ({ name: MONTHS[i], 'Lfd. Kosten': m.recurring_costs, Ausgaben: m.expenses }));
 
   const tabs = [
@@ -103,7 +105,7 @@ export default function Reports() {
                 <thead><tr><th style={c.th}>Zählertyp</th><th style={c.th}>Verbrauch</th><th style={c.th}>Tage</th><th style={c.th}>&Oslash;/Tag</th></tr></thead>
                 <tbody>
                   {Object.entries(consumption).map(([key, val]) => (
-                    <tr key={key}><td style={c.td}>{METER_LABELS[key]}</td><td style={c.td}>{val.total.toLocaleString('de-DE')}</td><td style={c.td}>{val.days}</td><td style={c.td}>{val.daily_avg.toFixed(4)}</td></tr>
+                    <tr key={key}><td style={c.td}>{METER_LABELS[key] || key}</td><td style={c.td}>{val.total.toLocaleString('de-DE')}</td><td style={c.td}>{val.days}</td><td style={c.td}>{val.daily_avg.toFixed(4)}</td></tr>
                   ))}
                 </tbody>
               </table>
@@ -155,7 +157,7 @@ export default function Reports() {
                 <thead><tr><th style={c.th}>Zählertyp</th><th style={c.th}>Ist</th><th style={c.th}>&Oslash;/Tag</th><th style={c.th}>Restliche Tage</th><th style={c.th}>Prognose Gesamt</th></tr></thead>
                 <tbody>
                   {Object.entries(forecast).map(([key, val]) => (
-                    <tr key={key}><td style={c.td}>{METER_LABELS[key]}</td><td style={c.td}>{val.actual_consumption}</td><td style={c.td}>{val.daily_avg.toFixed(4)}</td><td style={c.td}>{val.remaining_days}</td><td style={c.td}><strong>{val.total_forecast}</strong></td></tr>
+                    <tr key={key}><td style={c.td}>{METER_LABELS[key] || key}</td><td style={c.td}>{val.actual_consumption}</td><td style={c.td}>{val.daily_avg.toFixed(4)}</td><td style={c.td}>{val.remaining_days}</td><td style={c.td}><strong>{val.total_forecast}</strong></td></tr>
                   ))}
                 </tbody>
               </table>
@@ -178,6 +180,16 @@ export default function Reports() {
               <Line type="monotone" dataKey="Ausgaben" stroke={theme.colors.danger} strokeWidth={2} />
             </LineChart>
           </ResponsiveContainer>
+          {monthlyMeterTypes.length > 0 && (
+            <table style={{ ...c.table, marginTop: 20 }}>
+              <thead><tr><th style={c.th}>Verbrauch</th>{MONTHS.map(m => <th key={m} style={c.th}>{m}</th>)}</tr></thead>
+              <tbody>
+                {monthlyMeterTypes.map(key => (
+                  <tr key={key}><td style={c.td}>{METER_LABELS[key] || key}</td>{monthly.map(m => <td key={m.month} style={c.td}>{m.consumption[key] != null ? m.consumption[key].toLocaleString('de-DE') : '-'}</td>)}</tr>
+                ))}
+              </tbody>
+            </table>
+          )}
         </div>
       )}
 
@@ -194,7 +206,7 @@ export default function Reports() {
                 <thead><tr><th style={c.th}>Typ</th><th style={c.th}>Verbrauch</th><th style={c.th}>Preis/Einheit</th><th style={c.th}>Verbrauchskosten</th><th style={c.th}>Grundkosten</th><th style={c.th}>Gesamt</th></tr></thead>
                 <tbody>
                   {Object.entries(annual.costs).map(([key, val]) => (
-                    <tr key={key}><td style={c.td}>{METER_LABELS[key]}</td><td style={c.td}>{val.consumption}</td><td style={c.td}>{val.price_per_unit} \u20AC</td><td style={c.td}>{fmt(val.usage_cost)}</td><td style={c.td}>{fmt(val.base_cost_total)}</td><td style={c.td}><strong>{fmt(val.total_cost)}</strong></td></tr>
+                    <tr key={key}><td style={c.td}>{METER_LABELS[key] || key}</td><td style={c.td}>{val.consumption}</td><td style={c.td}>{val.price_per_unit} \u20AC</td><td style={c.td}>{fmt(val.usage_cost)}</td><td style={c.td}>{fmt(val.base_cost_total)}</td><td style={c.td}><strong>{fmt(val.total_cost)}</strong></td></tr>
                   ))}
                 </tbody>
               </table>
@@ -2,27 +2,7 @@ import React, { useState, useEffect } from 'react';
 import api from '../api';
 import theme from '../styles/theme';
 import * as c from '../styles/common';
-
-const GROUPS = [
-  {
-    key: 'water',
-    label: 'Wasser',
-    types: [
-      { value: 'water', label: 'Wasser', unit: '\u20AC/m\u00B3' },
-      { value: 'wastewater', label: 'Abwasser', unit: '\u20AC/m\u00B3' },
-    ],
-  },
-  {
-    key: 'electricity',
-    label: 'Strom',
-    types: [
-      { value: 'electricity_day', label: 'Strom (Tag)', unit: '\u20AC/kWh' },
-      { value: 'electricity_night', label: 'Strom (Nacht)', unit: '\u20AC/kWh' },
-    ],
-  },
-];
-
-const ALL_TYPES = GROUPS.flatMap(g => g.types);
+import { useMeterTypes, tariffGroups } from '../meterTypes';
 
 const s = {
   formTitle: { fontSize: theme.fontSize.lg, fontWeight: theme.fontWeight.bold, color: theme.colors.primary, marginBottom: theme.spacing.lg },
@@ -39,6 +19,8 @@ export default function Tariffs() {
   const [validFrom, setValidFrom] = useState('');
   const [validTo, setValidTo] = useState('');
   const [prices, setPrices] = useState({});
+  const GROUPS = tariffGroups(useMeterTypes());
+  const ALL_TYPES = GROUPS.flatMap(g => g.types);
 
   useEffect(() => { api.get('/api/properties').then(r => { setProperties(r.data); if (r.data.length > 0) setSelectedProp(r.data[0].id); }); }, []);
   useEffect(() => { if (selectedProp) load(); }, [selectedProp]);
@@ -112,10 +94,9 @@ export default function Tariffs() {
           {activeForm ? (
             <button style={c.btn} onClick={() => setActiveForm(null)}>Abbrechen</button>
           ) : (
-            <>
-              <button style={c.btnOutline} onClick={() => openForm('water')}>Neue Wassertarife</button>
-              <button style={c.btn} onClick={() => openForm('electricity')}>Neue Stromtarife</button>
-            </>
+            GROUPS.map((g, i) => (
+              <button key={g.key} style={i === GROUPS.length - 1 ? c.btn : c.btnOutline} onClick={() => openForm(g.key)}>Neue {g.label}tarife</button>
+            ))
           )}
         </div>
       </div>